@@ -2,34 +2,56 @@ import argparse
 
 import os
 import time
-from protocol.stop_and_wait import StopAndWaitReceiver
-from protocol.selective_repeat import SelectiveRepeatReceiver
+from concurrent.futures import ThreadPoolExecutor
+from protocol.ack_policy import make_ack_policy
+from protocol.codec import make_packetizer
+from protocol.compression import ChunkCompressor, make_compressor
+from protocol.congestion_control import CONGESTION_CONTROLLERS, make_congestion_controller
+from protocol.pacer import parse_rate
+from protocol.ranges import RangeError, options_range
+from protocol.resume import ResumeState, receiver_resume
+from protocol.go_back_n import GoBackNProtocol, GoBackNReceiver
+from protocol.stop_and_wait import StopAndWaitProtocol, StopAndWaitReceiver
+from protocol.selective_repeat import SelectiveRepeatProtocol, SelectiveRepeatReceiver
 from protocol.server_listener import ServerManager
+from protocol.streams import REJECTED, StreamMultiplexer, request_listing
 from utils import VerbosityLevel, Logger, CustomHelpFormatter, ConnectionConfig
 
+def transfer_options(args):
+    """Lo que se propone en el handshake para cualquier descarga."""
+    # El servidor es quien envía: se le pide el control de congestión a usar
+    # Con --pmtu se propone el chunk máximo y el sondeo lo ajusta al camino
+    options = {"chunk": args.chunk_size or (ConnectionConfig.MAX_CHUNK_SIZE if args.pmtu else ConnectionConfig.CHUNK_SIZE)}
+    if args.congestion:
+        options["cc"] = args.congestion
+    if args.rate:
+        options["rate"] = args.rate
+    if args.compress:
+        options["compress"] = args.compress
+    return options
+
+
 def behaviour(args):
-    connection, mode, filename = ServerManager.connect_to_server((args.host, args.port), "download", args.name)
-    Logger.info(f"Handshake completado con servidor en {args.host}:{args.port}, com modo {mode}")
-    
-    udp_socket = connection.socket
-    file_path = args.dst
-    
+    options = transfer_options(args)
+    # Un archivo existente solo se completa si quedó su estado de una descarga cortada
     if os.path.isfile(args.dst):
-        raise SystemExit(f"El archivo {args.dst} ya existe. Por favor seleccione otra ruta.")
+        state = ResumeState.load(args.dst) if args.resume else None
+        if state is None:
+            raise SystemExit(f"El archivo {args.dst} ya existe. Por favor seleccione otra ruta.")
+        options["resume"] = state.token()
+
+    connection, mode, filename = ServerManager.connect_to_server((args.host, args.port), "download", args.name, options, args.pmtu)
+    Logger.info(f"Handshake completado con servidor en {args.host}:{args.port}, com modo {mode}")
     
-    if args.protocol == "sw":
-        protocol = StopAndWaitReceiver(
-            sock=udp_socket,
-            output_path=args.dst,
-            timeout=ConnectionConfig.TIMEOUT
-        )
-    else:
-        protocol = SelectiveRepeatReceiver(
-            sock=udp_socket,
-            output_path=args.dst,
-            timeout=ConnectionConfig.TIMEOUT,
-            window_size=ConnectionConfig.SR_WINDOW_SIZE
-        )
+    if "resume" in options and "resume" not in connection.options:
+        Logger.info("El servidor no aceptó retomar: se descarga el archivo completo")
+
+    # Si se corta, el estado queda junto al parcial para retomarlo con --resume
+    protocol = make_receiver(
+        args, connection, args.dst,
+        resume=receiver_resume(connection.options),
+        file_size=int(connection.options["size"]) if "size" in connection.options else None
+    )
 
     # Start the download process
     try:
@@ -38,6 +60,185 @@ def behaviour(args):
         connection.close()    
         Logger.info("Download completed and connection closed.")
 
+
+def download_many(args, files):
+    """
+    Baja varios archivos [(nombre en el servidor, ruta local)] por una sola conexión:
+    un handshake y un cierre para todos, y cada archivo en su propio stream.
+    """
+    for _, dst in files:
+        if os.path.exists(dst):
+            raise SystemExit(f"El archivo {dst} ya existe. Por favor seleccione otra ruta.")
+    options = transfer_options(args)
+    options["streams"] = ConnectionConfig.STREAM_WINDOW
+
+    connection, mode, _ = ServerManager.connect_to_server((args.host, args.port), "download", files[0][0], options, args.pmtu)
+    Logger.info(f"Handshake completado con servidor en {args.host}:{args.port}, com modo {mode}")
+    try:
+        if "streams" not in connection.options:
+            raise SystemExit("El servidor no acepta varios archivos por conexión")
+        answer = request_listing(
+            [(name, REJECTED) for name, _ in files],
+            lambda path: make_sender(args, connection, path).start(),
+            lambda path: make_receiver(args, connection, path).start()
+        )
+        jobs = []
+        for stream_id, ((name, dst), (_, size)) in enumerate(zip(files, answer), 1):
+            if size == REJECTED:
+                Logger.error(f"El servidor no tiene {name}")
+            else:
+                jobs.append((stream_id, lambda view, dst=dst, size=size: make_receiver(args, view, dst, file_size=size).start()))
+        mux = StreamMultiplexer(connection, make_packetizer(connection.options))
+        try:
+            failed = mux.run(jobs, int(connection.options["streams"]))
+        finally:
+            mux.stop()
+        Logger.info(f"Bajados {len(jobs) - failed} de {len(files)} archivos")
+    finally:
+        connection.close()
+        Logger.info("Download completed and connection closed.")
+
+
+def download_parallel(args, parts):
+    """
+    Baja un archivo por parts conexiones a la vez, cada una con su parte: el LOGIN pide
+    'range=i/parts', el servidor la corta en múltiplos del chunk y contesta el rango en
+    bytes, y cada receptor escribe directo en su offset del archivo de destino. Como el
+    servidor es quien conoce el tamaño, los handshakes salen todos juntos.
+    """
+    if os.path.exists(args.dst):
+        raise SystemExit(f"El archivo {args.dst} ya existe. Por favor seleccione otra ruta.")
+    # Los receptores escriben sobre el archivo sin truncarlo: tiene que existir de entrada
+    open(args.dst, 'wb').close()
+
+    def fetch(part):
+        options = transfer_options(args)
+        options["range"] = f"{part}/{parts}"
+        connection, _, _ = ServerManager.connect_to_server((args.host, args.port), "download", args.name, options, args.pmtu)
+        try:
+            file_range = options_range(connection.options)
+            if "size" not in connection.options:
+                raise RangeError(f"El servidor no tiene {args.name}")
+            if file_range is None:
+                raise RangeError("El servidor no acepta descargas por rangos")
+            start, end = file_range
+            Logger.info(f"Parte {part}: bytes [{start}, {end}) de {connection.options['size']}")
+            make_receiver(args, connection, args.dst, file_size=end - start, offset=start).start()
+            return int(connection.options["size"])
+        finally:
+            connection.close()
+
+    try:
+        with ThreadPoolExecutor(max_workers=parts, thread_name_prefix="part") as pool:
+            sizes = set(pool.map(fetch, range(parts)))
+        # Todas las partes tienen que haber cortado el mismo archivo
+        if len(sizes) != 1 or os.path.getsize(args.dst) != sizes.pop():
+            raise RangeError("El archivo cambió en el servidor durante la descarga")
+    except BaseException as e:
+        # Con una parte mal el archivo no sirve: no queda a medio armar
+        os.remove(args.dst)
+        if isinstance(e, RangeError):
+            raise SystemExit(str(e))
+        raise
+    Logger.info(f"Descarga en {parts} partes completada en {args.dst}")
+
+
+def download_files(names, destinations):
+    """Los pares (nombre en el servidor, ruta local) de los -n/-d; con un solo -d directorio, todo va ahí."""
+    if len(destinations) == 1 and os.path.isdir(destinations[0]):
+        return [(name, os.path.join(destinations[0], name)) for name in names]
+    if len(destinations) != len(names):
+        raise SystemExit(f"Se indicaron {len(destinations)} destinos para {len(names)} archivos")
+    return list(zip(names, destinations))
+
+
+def make_receiver(args, connection, output_path, resume=None, file_size=None, offset=None):
+    """
+    El motor que recibe en output_path (o en el rango que empieza en offset, de file_size
+    bytes); el receptor es local y la política de ACKs sale de los argumentos.
+    """
+    ack_policy = make_ack_policy(args.protocol, args.ack_every, args.ack_delay)
+    chunk_size = int(connection.options.get("chunk", ConnectionConfig.CHUNK_SIZE))
+    packetizer = make_packetizer(connection.options)
+    compressor = make_compressor(connection.options)
+    if args.protocol == "sw":
+        return StopAndWaitReceiver(
+            sock=connection.socket,
+            output_path=output_path,
+            timeout=ConnectionConfig.TIMEOUT,
+            ack_policy=ack_policy,
+            chunk_size=chunk_size,
+            packetizer=packetizer,
+            compressor=compressor,
+            resume=resume,
+            offset=offset
+        )
+    elif args.protocol == "gbn":
+        return GoBackNReceiver(
+            sock=connection.socket,
+            output_path=output_path,
+            timeout=ConnectionConfig.TIMEOUT,
+            ack_policy=ack_policy,
+            chunk_size=chunk_size,
+            packetizer=packetizer,
+            compressor=compressor,
+            resume=resume,
+            offset=offset
+        )
+    return SelectiveRepeatReceiver(
+        sock=connection.socket,
+        output_path=output_path,
+        timeout=ConnectionConfig.TIMEOUT,
+        window_size=ConnectionConfig.SR_WINDOW_SIZE,
+        ack_policy=ack_policy,
+        chunk_size=chunk_size,
+        packetizer=packetizer,
+        compressor=compressor,
+        file_size=file_size,
+        resume=resume,
+        offset=offset
+    )
+
+
+def make_sender(args, connection, file_path):
+    """El motor que manda el pedido de una descarga de varios archivos."""
+    chunk_size = int(connection.options.get("chunk", ConnectionConfig.CHUNK_SIZE))
+    packetizer = make_packetizer(connection.options)
+    congestion = args.congestion or ConnectionConfig.CONGESTION_CONTROL
+    if args.protocol == "sw":
+        return StopAndWaitProtocol(
+            sock=connection.socket,
+            dest=connection.destination_address,
+            file_path=file_path,
+            timeout=ConnectionConfig.TIMEOUT,
+            rtt=connection.rtt,
+            chunk_size=chunk_size,
+            packetizer=packetizer
+        )
+    elif args.protocol == "gbn":
+        return GoBackNProtocol(
+            sock=connection.socket,
+            dest=connection.destination_address,
+            file_path=file_path,
+            timeout=ConnectionConfig.TIMEOUT,
+            window_size=ConnectionConfig.GBN_WINDOW_SIZE,
+            rtt=connection.rtt,
+            congestion=make_congestion_controller(congestion, ConnectionConfig.GBN_WINDOW_SIZE),
+            chunk_size=chunk_size,
+            packetizer=packetizer
+        )
+    return SelectiveRepeatProtocol(
+        sock=connection.socket,
+        dest=connection.destination_address,
+        file_path=file_path,
+        timeout=ConnectionConfig.TIMEOUT,
+        window_size=ConnectionConfig.SR_WINDOW_SIZE,
+        rtt=connection.rtt,
+        congestion=make_congestion_controller(congestion, ConnectionConfig.SR_WINDOW_SIZE),
+        chunk_size=chunk_size,
+        packetizer=packetizer
+    )
+
 if __name__ == '__main__':
     # Custom help formatter to preserve manual spacing
     parser = argparse.ArgumentParser(
@@ -51,9 +252,18 @@ if __name__ == '__main__':
     parser.add_argument('-q', '--quiet'    , action='store_true', help="decrease output verbosity")
     parser.add_argument('-H', '--host'     , metavar='ADDR'     , type=str, default="127.0.0.1", help="Server IP address")
     parser.add_argument('-p', '--port'     , metavar='PORT'     , type=int, default=12345, help="Server port")
-    parser.add_argument('-d', '--dst'      , metavar='DIRPATH'  , type=str, default="", help="Destination file path")
-    parser.add_argument('-n', '--name'     , metavar='FILENAME' , type=str, default="", help="File name")
-    parser.add_argument('-r', '--protocol' , metavar='protocol' , choices=["sw","sr"], default="sw" ,help="error recovery protocol")
+    parser.add_argument('-d', '--dst'      , metavar='DIRPATH'  , type=str, action='append', default=[], help="Destination file path (one per name, or a directory for several files)")
+    parser.add_argument('-n', '--name'     , metavar='FILENAME' , type=str, action='append', default=[], help="File name (repeat to fetch several files over one connection)")
+    parser.add_argument('-r', '--protocol' , metavar='protocol' , choices=["sw","sr","gbn"], default="sw" ,help="error recovery protocol")
+    parser.add_argument('-c', '--congestion', metavar='ALGO'    , choices=list(CONGESTION_CONTROLLERS), default=None, help="congestion control the server uses for sr/gbn (none, reno, cubic)")
+    parser.add_argument('--rate'           , metavar='BYTES/S'  , type=parse_rate, default=None, help="rate limit the server sends at, e.g. 500K or 10M")
+    parser.add_argument('--ack-every'      , metavar='N'        , type=int, default=None, help="acknowledge every N packets (default 1 for sw, 4 for sr/gbn)")
+    parser.add_argument('--ack-delay'      , metavar='SECONDS'  , type=float, default=None, help="max delay before acknowledging a packet")
+    parser.add_argument('--chunk-size'     , metavar='BYTES'    , type=int, default=None, help=f"payload bytes per packet (default {ConnectionConfig.CHUNK_SIZE})")
+    parser.add_argument('--compress'       , metavar='ALGO'     , choices=ChunkCompressor.ALGORITHMS, default=None, help="ask the server to compress chunks on the fly (zlib, lzma)")
+    parser.add_argument('--pmtu'           , action='store_true', help="probe the path MTU and use the largest chunk that fits")
+    parser.add_argument('--resume'         , action='store_true', help="continue an interrupted download into the existing destination file")
+    parser.add_argument('--parallel'       , metavar='N'        , type=int, default=1, help="download one file over N connections, one byte range each")
 
     # Parse the arguments
     args = parser.parse_args()
@@ -67,6 +277,16 @@ if __name__ == '__main__':
     else:
         Logger.setup_verbosity(VerbosityLevel.NORMAL)
 
-    behaviour(args)
+    if len(args.name) <= 1 and len(args.dst) <= 1:
+        args.name = args.name[0] if args.name else ""
+        args.dst = args.dst[0] if args.dst else "."
+        if os.path.isdir(args.dst):
+            args.dst = os.path.join(args.dst, args.name)
+        if args.parallel > 1:
+            download_parallel(args, args.parallel)
+        else:
+            behaviour(args)
+    else:
+        download_many(args, download_files(args.name, args.dst))
 
 
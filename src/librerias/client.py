@@ -1,36 +1,361 @@
-import socket
+import asyncio
+import os
+import time
+from protocol.ack_policy import make_ack_policy
+from protocol.congestion_control import make_congestion_controller
+from protocol.codec import WireCodec, make_packetizer
+from protocol.compression import make_compressor
+from protocol.connection_closing import FinExchange
+from protocol.exchange import PENDING
+from protocol.handshake import Handshake
+from protocol.integrity import StreamDigest, TermExchange, check_received
+from protocol.multiplexer import tag, unframe
+from protocol.packet import DefaultPacketizer
+from protocol.pacer import TokenBucketPacer
+from protocol.rtt_estimator import RttEstimator
+from protocol.selective_repeat import SelectiveRepeatProtocol, SelectiveRepeatReceiver
+from protocol.stop_and_wait import StopAndWaitReceiver
+from protocol.udp_offload import payload_bytes, tune_socket_buffers
+from utils import Logger, ConnectionConfig
 
-class Client:
-    def __init__(self, host, port, algorithm):
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        if algorithm == "sw":
-            #here create protocol "stop and wait"
-            print("was chosen protocol stop and wait", algorithm)
-            print("host,", host, "port", port)
-        elif algorithm == "sr":
-            #here create protocol "selective repeat"
-            print("was chosen protocol selective repeat", algorithm)
-            print("host,", host, "port", port)
-
-    def upload(self, file_name, algorithm):
-        if algorithm == "sw":
-            #here start algorithm stop and wait
-            print("UPLOAD")
-            print("algorithm stop and wait", algorithm)
-        elif algorithm == "sr":
-            #here start algorithm selective repeat
-            print("UPLOAD")
-            print("algorithm selective repeat", algorithm)
-
-    def download(self, file_name, algorithm):
-        if algorithm == "sw":
-            #here start algorithm stop and wait
-            print("DOWNLOAD")
-            print("algorithm stop and wait", algorithm)
-        elif algorithm == "sr":
-            #here start algorithm selective repeat
-            print("DOWNLOAD")
-            print("algorithm selective repeat", algorithm)
+
+class DatagramEndpoint(asyncio.DatagramProtocol):
+    """
+    Puente entre el transporte UDP de asyncio y las corutinas: lo que llega queda
+    en una cola y se lee con `await recvfrom(timeout)`. También expone sendto y
+    getsockname para que los motores sincrónicos lo usen como socket al enviar.
+    """
+    def __init__(self):
+        self.transport = None
+        self.queue = asyncio.Queue()
+        # Connection ID asignado por un servidor de un solo puerto
+        self.cid = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.queue.put_nowait((unframe(data)[1] if self.cid is not None else data, addr))
+
+    def error_received(self, exc):
+        Logger.debug(who=self.getsockname(), message=f"Datagram error: {exc}")
+
+    def sendto(self, data, addr):
+        self.transport.sendto(tag(self.cid, data) if self.cid is not None else data, addr)
+
+    def getsockname(self):
+        return self.transport.get_extra_info('sockname')
+
+    def settimeout(self, timeout):
+        # Los timeouts se pasan a cada recvfrom
+        pass
+
+    async def recvfrom(self, timeout=None):
+        if timeout is None:
+            return await self.queue.get()
+        return await asyncio.wait_for(self.queue.get(), timeout)
 
     def close(self):
-        self.socket.close()
\ No newline at end of file
+        self.transport.close()
+
+
+class LoopScheduler:
+    """Misma interfaz que TimerScheduler, pero los timers son call_later del event loop."""
+    def __init__(self, loop):
+        self.loop = loop
+
+    def schedule(self, delay, callback, *args):
+        return self.loop.call_later(delay, callback, *args)
+
+
+class AsyncSelectiveRepeatSender(SelectiveRepeatProtocol):
+    """
+    El emisor SR sobre el event loop. Reusa la ventana, los SACK, el control de
+    congestión y las retransmisiones del motor sincrónico; cambia solo quién
+    espera: no hay hilo de ACKs ni hilo de timers.
+    """
+    def __init__(self, endpoint, dest, file_path, **kwargs):
+        super().__init__(endpoint, dest, file_path, scheduler=LoopScheduler(asyncio.get_running_loop()), **kwargs)
+        self.endpoint = endpoint
+        self.progress = asyncio.Event()
+
+    def _slide_window(self):
+        finished = super()._slide_window()
+        self.progress.set()
+        return finished
+
+    async def run(self):
+        Logger.info(f"[SR] Starting transfer to {self.dest}")
+        tune_socket_buffers(self.endpoint.transport.get_extra_info('socket'), self._estimated_bdp())
+        acks = asyncio.create_task(self._read_acks())
+        try:
+            if self.base < self.total:
+                await self._send_new_data_async()
+                while not self.send_event.is_set():
+                    self.progress.clear()
+                    await self.progress.wait()
+            self._hash_sent(self.total)
+        finally:
+            acks.cancel()
+            for timer in self.timers.values():
+                timer.cancel()
+            self.file.close()
+        await terminate(self.endpoint, self.dest, self.packetizer, self.rtt, self.digest)
+        Logger.info("[SR] Transfer completed.")
+
+    async def _read_acks(self):
+        while True:
+            packet, _ = await self.endpoint.recvfrom()
+            if self._on_ack(packet):
+                return
+
+    async def _send_new_data_async(self):
+        while True:
+            while not self._window_has_room():
+                if self.next_seq >= self.total:
+                    return
+                self.progress.clear()
+                await self.progress.wait()
+            packets, last = self._next_batch()
+            self.sender.send_vectored(packets, self.dest)
+            self._hash_sent(last)
+            delay = self.pacer.delay(payload_bytes(packets))
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+
+async def send_stop_and_wait(endpoint, dest, file_path, rtt, rate=None, chunk_size=None, packetizer=None, compressor=None):
+    """Emisor stop-and-wait como corutina: un DATA en vuelo, el RTO es el timeout de la espera."""
+    packetizer = packetizer or DefaultPacketizer()
+    pacer = TokenBucketPacer(rate)
+    chunk_size = chunk_size or ConnectionConfig.CHUNK_SIZE
+    loop = asyncio.get_running_loop()
+    digest = StreamDigest()
+    Logger.info(f"[SW] Starting transfer to {dest}")
+    with open(file_path, 'rb') as f:
+        seq = 0
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+            flags = packetizer.FLAG_ACK_NOW
+            payload = compressor.compress(chunk) if compressor is not None else None
+            if payload is None:
+                payload = chunk
+            else:
+                flags |= packetizer.FLAG_COMPRESSED
+            retransmission = False
+            while True:
+                # Karn: las retransmisiones van sin timestamp
+                timestamp = 0 if retransmission else RttEstimator.timestamp()
+                packet = packetizer.make_data_packet(seq, payload, timestamp, flags)
+                delay = pacer.delay(len(packet))
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                endpoint.sendto(packet, dest)
+                retransmission = True
+                deadline = loop.time() + rtt.rto
+                try:
+                    while True:
+                        reply, _ = await endpoint.recvfrom(max(0.0, deadline - loop.time()))
+                        if packetizer.is_ack(reply) and packetizer.extract_seq(reply) == seq:
+                            rtt.on_timestamp_echo(packetizer.extract_timestamp(reply))
+                            break
+                    break
+                except asyncio.TimeoutError:
+                    Logger.debug(who=endpoint.getsockname(), message=f"[SW] Timeout seq={seq}, resending")
+                    rtt.on_timeout()
+            seq += 1
+    await terminate(endpoint, dest, packetizer, rtt, digest)
+    Logger.info(f"[SW] Transfer completed to {dest}")
+
+
+async def run_exchange(endpoint, exchange):
+    """Exchange.run sin bloquear el loop: mismos intentos, mismo timeout, mismo veredicto."""
+    loop = asyncio.get_running_loop()
+    exchange.who = endpoint.getsockname()
+    for attempt in range(1, ConnectionConfig.MAX_RETRIES + 1):
+        endpoint.sendto(exchange.request, exchange.dest)
+        Logger.debug(who=exchange.who, message=f"{exchange.description} to {exchange.dest} (attempt {attempt})")
+        deadline = loop.time() + exchange.timeout
+        try:
+            while True:
+                packet, _ = await endpoint.recvfrom(max(0.0, deadline - loop.time()))
+                result = exchange.on_reply(packet)
+                if result is not PENDING:
+                    return result
+        except asyncio.TimeoutError:
+            exchange.on_timeout(attempt)
+    return exchange.give_up()
+
+
+async def terminate(endpoint, dest, packetizer, rtt, digest):
+    """integrity.terminate sin bloquear el loop: TERM con el digest hasta recibir el veredicto."""
+    return await run_exchange(endpoint, TermExchange(packetizer, dest, rtt, digest))
+
+
+async def receive(receiver, endpoint):
+    """Corre un receptor (SW o SR) leyendo del endpoint en lugar del socket."""
+    # w+b: el receptor SR relee del archivo los chunks que llegaron fuera de orden para hashearlos
+    with open(receiver.output_path, 'w+b') as f:
+        while receiver.running:
+            try:
+                packet, addr = await endpoint.recvfrom(receiver.ack_policy.time_left(receiver.timeout + 0.1))
+            except asyncio.TimeoutError:
+                receiver._on_idle()
+                continue
+            receiver._on_packet(packet, addr, f)
+    check_received(receiver.output_path, receiver.verified)
+    Logger.info(f"File saved to {receiver.output_path}")
+
+
+class AsyncConnection:
+    """Conexión ya negociada: endpoint propio, dirección del socket efímero del servidor y opciones acordadas."""
+    def __init__(self, endpoint, destination_address, rtt, options):
+        self.endpoint = endpoint
+        self.destination_address = destination_address
+        self.rtt = rtt
+        self.options = options
+
+    async def close(self):
+        """Mismo cierre que ConnectionClosingProtocol: FIN, esperar FIN del par, ACKFIN."""
+        packetizer = make_packetizer(self.options)
+        try:
+            if await run_exchange(self.endpoint, FinExchange(packetizer, self.destination_address, self.rtt)):
+                self.endpoint.sendto(packetizer.make_fin_ack_packet(), self.destination_address)
+                return True
+            Logger.error(who=self.endpoint.getsockname(), message="Closing handshake failed")
+            return False
+        finally:
+            self.endpoint.close()
+
+
+class Client:
+    """
+    Cliente asyncio: cada transferencia es una corutina con su propio socket UDP,
+    así un mismo proceso puede tener cientos en curso sin un hilo por transferencia.
+
+        client = Client("127.0.0.1", 8080, "sr")
+        await client.upload("local.bin", "remoto.bin")
+        await client.download("remoto.bin", "copia.bin")
+    """
+    def __init__(self, host, port, algorithm="sw", congestion=None, rate=None, chunk_size=None,
+                 ack_every=None, ack_delay=None, compress=None):
+        if algorithm not in ("sw", "sr"):
+            raise ValueError(f"Unknown protocol '{algorithm}'")
+        self.server_address = (host, port)
+        self.algorithm = algorithm
+        self.congestion = congestion
+        self.rate = rate
+        self.chunk_size = chunk_size or ConnectionConfig.CHUNK_SIZE
+        self.ack_every = ack_every
+        self.ack_delay = ack_delay
+        self.compress = compress
+
+    async def upload(self, src, name):
+        options = {"chunk": self.chunk_size, "size": os.path.getsize(src)}
+        if self.rate:
+            options["rate"] = self.rate
+        if self.ack_every is not None:
+            options["ack_every"] = self.ack_every
+        if self.ack_delay is not None:
+            options["ack_delay"] = self.ack_delay
+        if self.compress:
+            options["compress"] = self.compress
+        conn = await self._connect("upload", name, options)
+        rate = float(conn.options["rate"]) if "rate" in conn.options else None
+        chunk_size = int(conn.options.get("chunk", ConnectionConfig.CHUNK_SIZE))
+        packetizer = make_packetizer(conn.options)
+        compressor = make_compressor(conn.options)
+        try:
+            if self.algorithm == "sw":
+                await send_stop_and_wait(conn.endpoint, conn.destination_address, src, conn.rtt, rate, chunk_size,
+                                         packetizer, compressor)
+            else:
+                sender = AsyncSelectiveRepeatSender(
+                    conn.endpoint, conn.destination_address, src,
+                    timeout=ConnectionConfig.TIMEOUT,
+                    window_size=ConnectionConfig.SR_WINDOW_SIZE,
+                    rtt=conn.rtt,
+                    congestion=make_congestion_controller(
+                        self.congestion or ConnectionConfig.CONGESTION_CONTROL, ConnectionConfig.SR_WINDOW_SIZE
+                    ),
+                    rate=rate,
+                    chunk_size=chunk_size,
+                    packetizer=packetizer,
+                    compressor=compressor
+                )
+                await sender.run()
+        finally:
+            await conn.close()
+
+    async def download(self, name, dst):
+        options = {"chunk": self.chunk_size}
+        if self.congestion:
+            options["cc"] = self.congestion
+        if self.rate:
+            options["rate"] = self.rate
+        if self.compress:
+            options["compress"] = self.compress
+        conn = await self._connect("download", name, options)
+        chunk_size = int(conn.options.get("chunk", ConnectionConfig.CHUNK_SIZE))
+        packetizer = make_packetizer(conn.options)
+        compressor = make_compressor(conn.options)
+        ack_policy = make_ack_policy(self.algorithm, self.ack_every, self.ack_delay)
+        try:
+            if self.algorithm == "sw":
+                receiver = StopAndWaitReceiver(
+                    conn.endpoint, dst,
+                    timeout=ConnectionConfig.TIMEOUT,
+                    ack_policy=ack_policy,
+                    chunk_size=chunk_size,
+                    packetizer=packetizer,
+                    compressor=compressor
+                )
+            else:
+                receiver = SelectiveRepeatReceiver(
+                    conn.endpoint, dst,
+                    timeout=ConnectionConfig.TIMEOUT,
+                    window_size=ConnectionConfig.SR_WINDOW_SIZE,
+                    ack_policy=ack_policy,
+                    chunk_size=chunk_size,
+                    packetizer=packetizer,
+                    compressor=compressor,
+                    file_size=int(conn.options["size"]) if "size" in conn.options else None
+                )
+            await receive(receiver, conn.endpoint)
+        finally:
+            await conn.close()
+
+    async def _connect(self, mode, filename, options):
+        """El handshake de Handshake.client, sin bloquear el loop."""
+        loop = asyncio.get_running_loop()
+        _, endpoint = await loop.create_datagram_endpoint(DatagramEndpoint, local_addr=('0.0.0.0', 0))
+        rtt = RttEstimator()
+        options = dict(options, wire=WireCodec.VERSION)
+        msg = Handshake.encode("LOGIN", mode, filename, options)
+        for i in range(ConnectionConfig.MAX_RETRIES):
+            Logger.debug(who=endpoint.getsockname(), message=f"Sending {msg!r} to {self.server_address} (try {i+1})")
+            sent_at = time.monotonic()
+            endpoint.sendto(msg, self.server_address)
+            try:
+                resp, data_addr = await endpoint.recvfrom(rtt.rto)
+            except asyncio.TimeoutError:
+                rtt.on_timeout()
+                continue
+            # Karn: solo se mide el RTT si el LOGIN no fue retransmitido
+            if i == 0:
+                rtt.on_sample(time.monotonic() - sent_at)
+            try:
+                prefix, agreed_mode, agreed_filename, agreed_options = Handshake.decode(resp)
+            except ValueError:
+                continue
+            if prefix != "ACK":
+                continue
+            if agreed_mode != mode or agreed_filename != filename:
+                endpoint.close()
+                raise Exception(f"Inconsistent handshake reply {resp!r}")
+            if "cid" in agreed_options:
+                endpoint.cid = int(agreed_options["cid"])
+            endpoint.sendto(make_packetizer(agreed_options).make_confirm_packet(), data_addr)
+            return AsyncConnection(endpoint, data_addr, rtt, agreed_options)
+        endpoint.close()
+        raise Exception("Handshake failed (no ACK)")
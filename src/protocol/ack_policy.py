@@ -0,0 +1,53 @@
+import time
+from utils import ConnectionConfig
+
+
+class AckPolicy:
+    """
+    Decide cuándo el receptor manda un ACK: cada `every` paquetes o `delay`
+    segundos después del primer paquete sin confirmar, lo que ocurra primero.
+    Los paquetes fuera de orden o duplicados se confirman en el acto para que
+    el emisor detecte la pérdida cuanto antes. Con every=1 es un ACK por paquete.
+    """
+    def __init__(self, every: int = 1, delay: float = 0.0):
+        self.every = max(1, every)
+        self.delay = delay
+        self.pending = 0
+        self.deadline = None
+        self.timestamp = 0
+
+    def on_packet(self, timestamp: int = 0, immediate: bool = False) -> bool:
+        """Registra un paquete recibido; devuelve True si hay que confirmar ya."""
+        self.pending += 1
+        if not self.timestamp:
+            # Se devuelve el timestamp del paquete más viejo sin confirmar (RFC 7323)
+            self.timestamp = timestamp
+        if self.deadline is None:
+            self.deadline = time.monotonic() + self.delay
+        return immediate or self.pending >= self.every or self.due()
+
+    def due(self) -> bool:
+        return self.pending > 0 and time.monotonic() >= self.deadline
+
+    def time_left(self, default: float) -> float:
+        """Timeout para el próximo recv: lo que falta para el ACK demorado, o default."""
+        if not self.pending:
+            return default
+        return min(default, max(0.0001, self.deadline - time.monotonic()))
+
+    def on_ack_sent(self) -> int:
+        """Reinicia el estado y devuelve el timestamp a devolver en el ACK."""
+        timestamp = self.timestamp
+        self.pending = 0
+        self.deadline = None
+        self.timestamp = 0
+        return timestamp
+
+
+def make_ack_policy(protocol: str, every: int = None, delay: float = None) -> AckPolicy:
+    """Política del receptor para 'sw', 'sr' o 'gbn'; lo que no se indique sale de ConnectionConfig."""
+    if every is None:
+        every = ConnectionConfig.SW_ACK_EVERY if protocol == "sw" else ConnectionConfig.SR_ACK_EVERY
+    if delay is None:
+        delay = ConnectionConfig.ACK_DELAY
+    return AckPolicy(int(every), float(delay))
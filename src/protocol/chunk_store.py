@@ -0,0 +1,272 @@
+# protocol/chunk_store.py
+import os
+import sqlite3
+import struct
+import threading
+from protocol.delta import file_digest, strong_hash
+from protocol.integrity import IntegrityError
+from protocol.resume import ResumeState
+from utils.bitmap import Bitmap
+from utils.bloom import BloomFilter
+from utils.connection_config import ConnectionConfig
+
+
+class ManifestError(ValueError):
+    pass
+
+
+# Manifiesto de una subida con dedup: cabecera con el chunk, el tamaño y el digest del
+# archivo, después el hash de cada chunk en orden
+MANIFEST_HEADER = struct.Struct('!4sIQ32s')
+MANIFEST_MAGIC = b'MAN1'
+HASH_SIZE = 16
+
+
+class Manifest:
+    def __init__(self, chunk_size: int, size: int, digest: bytes, hashes: list):
+        self.chunk_size = chunk_size
+        self.size = size
+        self.digest = digest
+        self.hashes = hashes
+
+    def length(self, index: int) -> int:
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+
+def _chunks(f, chunk_size):
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_manifest(source_path: str, manifest_path: str, chunk_size: int) -> Manifest:
+    """Hashea cada chunk del archivo a subir; el manifiesto es lo único que viaja entero."""
+    digest = file_digest()
+    hashes = []
+    with open(source_path, 'rb') as source:
+        for chunk in _chunks(source, chunk_size):
+            digest.update(chunk)
+            hashes.append(strong_hash(chunk))
+        size = source.tell()
+    manifest = Manifest(chunk_size, size, digest.digest(), hashes)
+    with open(manifest_path, 'wb') as out:
+        out.write(MANIFEST_HEADER.pack(MANIFEST_MAGIC, chunk_size, size, manifest.digest))
+        out.write(b''.join(hashes))
+    return manifest
+
+
+def read_manifest(manifest_path: str) -> Manifest:
+    with open(manifest_path, 'rb') as f:
+        raw = f.read()
+    if len(raw) < MANIFEST_HEADER.size:
+        raise ManifestError("Truncated manifest")
+    magic, chunk_size, size, digest = MANIFEST_HEADER.unpack_from(raw)
+    if magic != MANIFEST_MAGIC or chunk_size <= 0:
+        raise ManifestError(f"Bad manifest header {magic!r}")
+    body = raw[MANIFEST_HEADER.size:]
+    count = (size + chunk_size - 1) // chunk_size
+    if len(body) != count * HASH_SIZE:
+        raise ManifestError(f"Manifest lists {len(body) // HASH_SIZE} chunks, expected {count}")
+    hashes = [body[i:i + HASH_SIZE] for i in range(0, len(body), HASH_SIZE)]
+    return Manifest(chunk_size, size, digest, hashes)
+
+
+def write_wanted(source_path: str, manifest: Manifest, wanted: Bitmap, data_path: str) -> int:
+    """Junta en data_path los chunks que el servidor pidió, en orden; devuelve cuántos bytes son."""
+    with open(source_path, 'rb') as source, open(data_path, 'wb') as out:
+        for index in range(len(manifest.hashes)):
+            if index in wanted:
+                out.write(os.pread(source.fileno(), manifest.length(index), index * manifest.chunk_size))
+        return out.tell()
+
+
+class ChunkStore:
+    """
+    Índice por contenido de los archivos del storage: hash de cada chunk -> (archivo,
+    offset, largo). Los chunks no se guardan aparte; el storage sigue siendo el mismo
+    directorio plano que sirven las descargas, y el índice (sqlite, en .chunks/) solo
+    dice dónde ya está cada contenido. Antes de consultar el índice se mira un filtro
+    de Bloom en memoria: un chunk nuevo, el caso común en una subida, se descarta sin
+    tocar el disco. El filtro se pone al día antes de cada consulta con las filas
+    nuevas del índice (el id solo crece), también las que agregaron otros workers.
+
+    Si un archivo indexado cambió o desapareció (se comparan tamaño y mtime) sus
+    entradas se descartan; al rearmar se vuelve a verificar el hash de cada chunk.
+    """
+    DIR = ".chunks"
+    INDEX = "index.sqlite3"
+
+    def __init__(self, storage: str):
+        self.storage = storage
+        os.makedirs(os.path.join(storage, self.DIR), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(storage, self.DIR, self.INDEX),
+                                  check_same_thread=False, isolation_level=None)
+        # WAL: varios workers pueden leer el índice mientras otro lo actualiza
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS files (name TEXT PRIMARY KEY, size INTEGER, mtime INTEGER)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS chunks (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                        "hash BLOB UNIQUE, name TEXT, offset INTEGER, length INTEGER)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS chunks_by_name ON chunks (name)")
+        self.lock = threading.Lock()
+        self.bloom = None
+        self.seen = 0
+        self._rebuild_bloom()
+
+    def close(self):
+        self.db.close()
+
+    def _rebuild_bloom(self):
+        (count,) = self.db.execute("SELECT COUNT(*) FROM chunks").fetchone()
+        self.bloom = BloomFilter(max(ConnectionConfig.DEDUP_BLOOM_CAPACITY, 2 * count))
+        self.seen = 0
+        self._refresh_bloom()
+
+    def _refresh_bloom(self):
+        for row_id, key in self.db.execute("SELECT id, hash FROM chunks WHERE id > ? ORDER BY id", (self.seen,)):
+            self.bloom.add(key)
+            self.seen = row_id
+        if self.bloom.full:
+            self._rebuild_bloom()
+
+    def _stat(self, name):
+        try:
+            st = os.stat(os.path.join(self.storage, name))
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def _fresh(self, name, cache) -> bool:
+        """Si el archivo sigue igual que cuando se indexó; si no, se olvidan sus entradas."""
+        if name not in cache:
+            row = self.db.execute("SELECT size, mtime FROM files WHERE name = ?", (name,)).fetchone()
+            cache[name] = row is not None and tuple(row) == self._stat(name)
+            if not cache[name]:
+                self._forget(name)
+        return cache[name]
+
+    def _forget(self, name):
+        self.db.execute("DELETE FROM chunks WHERE name = ?", (name,))
+        self.db.execute("DELETE FROM files WHERE name = ?", (name,))
+
+    def _locate(self, key, cache):
+        row = self.db.execute("SELECT name, offset, length FROM chunks WHERE hash = ?", (key,)).fetchone()
+        if row is None or not self._fresh(row[0], cache):
+            return None
+        return row
+
+    def missing(self, manifest: Manifest) -> Bitmap:
+        """Los chunks del manifiesto que el storage no tiene: los que hay que pedir."""
+        wanted = Bitmap(len(manifest.hashes))
+        cache = {}
+        with self.lock:
+            self._refresh_bloom()
+            for index, key in enumerate(manifest.hashes):
+                if key not in self.bloom or self._locate(key, cache) is None:
+                    wanted.add(index)
+        return wanted
+
+    def read(self, key: bytes, cache=None):
+        """Los bytes del chunk, verificados contra su hash, o None si ya no están."""
+        with self.lock:
+            row = self._locate(key, {} if cache is None else cache)
+        if row is None:
+            return None
+        name, offset, length = row
+        try:
+            with open(os.path.join(self.storage, name), 'rb') as f:
+                data = os.pread(f.fileno(), length, offset)
+        except OSError:
+            return None
+        if strong_hash(data) != key:
+            # Cambió sin que cambiaran tamaño ni mtime: no se confía más en ese archivo
+            with self.lock:
+                self._forget(name)
+            return None
+        return data
+
+    def add(self, name: str, manifest: Manifest = None):
+        """Indexa un archivo del storage; con el manifiesto de su subida no hace falta releerlo."""
+        path = os.path.join(self.storage, name)
+        stat = self._stat(name)
+        if stat is None:
+            return
+        if manifest is None:
+            manifest = Manifest(ConnectionConfig.DEDUP_CHUNK_SIZE, stat[0], b'', [])
+            with open(path, 'rb') as f:
+                manifest.hashes = [strong_hash(chunk) for chunk in _chunks(f, manifest.chunk_size)]
+        rows = [(key, name, index * manifest.chunk_size, manifest.length(index))
+                for index, key in enumerate(manifest.hashes)]
+        with self.lock:
+            self.db.execute("BEGIN")
+            self._forget(name)
+            self.db.execute("INSERT INTO files VALUES (?, ?, ?)", (name, *stat))
+            # Si el contenido ya está en otro archivo se conserva esa ubicación
+            self.db.executemany("INSERT OR IGNORE INTO chunks (hash, name, offset, length) VALUES (?, ?, ?, ?)", rows)
+            self.db.execute("COMMIT")
+
+    def index_storage(self):
+        """Indexa lo que ya había en el storage (o cambió) antes de habilitar el índice."""
+        for entry in os.scandir(self.storage):
+            name = entry.name
+            # Ocultos (temporales, el propio índice) y parciales a medio subir no cuentan
+            if name.startswith(".") or ResumeState.is_state_file(name) or not entry.is_file():
+                continue
+            if ResumeState.pending(entry.path):
+                continue
+            with self.lock:
+                row = self.db.execute("SELECT size, mtime FROM files WHERE name = ?", (name,)).fetchone()
+            if row is None or tuple(row) != self._stat(name):
+                self.add(name)
+
+    def assemble(self, manifest: Manifest, wanted: Bitmap, data_path: str, output_path: str):
+        """
+        Rearma el archivo subido: los chunks pedidos salen de data_path, el resto del
+        storage. Recién si el digest coincide con el del cliente aparece en output_path.
+        Si todo el archivo ya estaba, idéntico, en otro archivo, se enlaza en lugar de copiarse.
+        """
+        name = os.path.basename(output_path)
+        if not wanted.count and self._link_duplicate(manifest, output_path):
+            self.add(name, manifest)
+            return
+        tmp = os.path.join(os.path.dirname(output_path), "." + name + ".dedup.tmp")
+        cache = {}
+        try:
+            with open(data_path, 'rb') as data, open(tmp, 'wb') as out:
+                digest = file_digest()
+                for index, key in enumerate(manifest.hashes):
+                    if index in wanted:
+                        chunk = data.read(manifest.length(index))
+                    else:
+                        chunk = self.read(key, cache)
+                        if chunk is None:
+                            raise IntegrityError(f"Chunk {index} of {name} vanished from the store")
+                    out.write(chunk)
+                    digest.update(chunk)
+                if out.tell() != manifest.size or digest.digest() != manifest.digest:
+                    raise IntegrityError(f"Rebuilt {output_path} does not match the client's file")
+            os.replace(tmp, output_path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self.add(name, manifest)
+
+    def _link_duplicate(self, manifest: Manifest, output_path: str) -> bool:
+        """Si todos los chunks están en orden en un mismo archivo de igual tamaño, un hard link."""
+        if not manifest.hashes:
+            return False
+        with self.lock:
+            rows = [self._locate(key, {}) for key in manifest.hashes]
+        names = {row[0] for row in rows if row is not None}
+        if len(names) != 1 or any(row is None or row[1] != index * manifest.chunk_size
+                                  for index, row in enumerate(rows)):
+            return False
+        source = os.path.join(self.storage, names.pop())
+        if os.path.getsize(source) != manifest.size:
+            return False
+        try:
+            os.link(source, output_path)
+        except OSError:
+            return False
+        return True
@@ -0,0 +1,272 @@
+# protocol/codec.py
+import struct
+from collections import namedtuple
+from protocol.packet import Packetizer, DefaultPacketizer
+
+
+class CodecError(ValueError):
+    pass
+
+
+Message = namedtuple('Message', 'type flags cid seq timestamp options payload')
+
+
+class WireCodec:
+    """
+    Formato binario versionado, el mismo para datos y control:
+
+        magic|versión (1) tipo (1) flags (1) largo de cabecera en palabras de 4 bytes (1)
+        connection ID (4) seq (4) timestamp (4)
+        opciones TLV: clave (1) largo (1) valor, con relleno 0 hasta múltiplo de 4
+        payload
+
+    El primer byte tiene 0b11 en los bits altos: no coincide con la marca de
+    multiplexado (0x00), los tipos de DefaultPacketizer (1..5) ni el texto del handshake.
+    El LOGIN y su ACK siguen en texto porque negocian el formato; desde el ALL:OK todo
+    lo de la conexión (datos, confirmación, sondas de MTU y cierre) va con el codec.
+    En el servidor de un solo puerto el connection ID de la cabecera es el que
+    usa el despachador, sin la cabecera de multiplexado aparte.
+    """
+    VERSION = 1
+    MAGIC = 0xC0
+    VERSION_MASK = 0x3F
+
+    HEADER = struct.Struct('!BBBBIII')
+    OPTION = struct.Struct('!BB')
+    SACK_INFO = struct.Struct('!IB')
+    BLOCK = struct.Struct('!II')
+    U32 = struct.Struct('!I')
+
+    # Tipos de mensaje
+    DATA = 1
+    ACK = 2
+    SACK = 3
+    TERM = 4
+    CONFIRM = 7
+    FIN = 8
+    FIN_ACK = 9
+    PROBE = 10
+    PROBE_ACK = 11
+    TERM_ACK = 12
+
+    # Opciones acordadas con clave propia (las que el CONFIRM puede ajustar); las demás
+    # viajan como 'clave=valor' en OPT_EXTRA
+    OPT_PAD = 0
+    OPT_EXTRA = 255
+    OPTIONS = {3: 'chunk', 4: 'rate', 5: 'cc', 6: 'ack_every',
+               7: 'ack_delay', 8: 'size', 9: 'cid', 10: 'wire', 11: 'compress',
+               12: 'resume', 13: 'delta',
+               14: 'dedup', 15: 'streams', 16: 'range'}
+    OPTION_KINDS = {name: kind for kind, name in OPTIONS.items()}
+
+    @classmethod
+    def first_byte(cls, version: int = None) -> int:
+        return cls.MAGIC | (cls.VERSION if version is None else version)
+
+    @classmethod
+    def connection_id(cls, data):
+        """El connection ID de un mensaje del codec, sin decodificarlo; None si no es del codec."""
+        if len(data) >= cls.HEADER.size and data[0] == cls.first_byte():
+            return cls.U32.unpack_from(data, 4)[0]
+        return None
+
+    @classmethod
+    def encode(cls, msg_type: int, seq: int = 0, timestamp: int = 0, flags: int = 0, cid: int = 0,
+               options: dict = None, payload: bytes = b'') -> bytes:
+        extra = cls._encode_options(options) if options else b''
+        words = (cls.HEADER.size + len(extra)) // 4
+        if words > 0xFF:
+            raise CodecError(f"Options too long ({len(extra)} bytes)")
+        header = cls.HEADER.pack(cls.first_byte(), msg_type, flags, words, cid, seq, timestamp)
+        return header + extra + payload
+
+    @classmethod
+    def decode(cls, data) -> Message:
+        if len(data) < cls.HEADER.size:
+            raise CodecError(f"Short message ({len(data)} bytes)")
+        first, msg_type, flags, words, cid, seq, timestamp = cls.HEADER.unpack_from(data)
+        if first & cls.MAGIC != cls.MAGIC:
+            raise CodecError(f"Not a codec message (first byte {first:#04x})")
+        if first & cls.VERSION_MASK != cls.VERSION:
+            raise CodecError(f"Unsupported codec version {first & cls.VERSION_MASK}")
+        end = words * 4
+        if not cls.HEADER.size <= end <= len(data):
+            raise CodecError(f"Bad header length {end}")
+        options = cls._decode_options(data[cls.HEADER.size:end])
+        return Message(msg_type, flags, cid, seq, timestamp, options, data[end:])
+
+    @classmethod
+    def _encode_options(cls, options: dict) -> bytes:
+        out = bytearray()
+        for key, value in options.items():
+            kind = cls.OPTION_KINDS.get(key)
+            value = str(value) if kind is not None else f"{key}={value}"
+            raw = value.encode('utf-8')
+            if len(raw) > 0xFF:
+                raise CodecError(f"Option {key!r} too long ({len(raw)} bytes)")
+            out += cls.OPTION.pack(cls.OPT_EXTRA if kind is None else kind, len(raw)) + raw
+        out += bytes(-len(out) % 4)
+        return bytes(out)
+
+    @classmethod
+    def _decode_options(cls, data) -> dict:
+        options = {}
+        offset = 0
+        while offset + cls.OPTION.size <= len(data):
+            kind, length = cls.OPTION.unpack_from(data, offset)
+            if kind == cls.OPT_PAD:
+                break
+            offset += cls.OPTION.size
+            if offset + length > len(data):
+                raise CodecError(f"Truncated option {kind}")
+            value = bytes(data[offset:offset + length]).decode('utf-8')
+            offset += length
+            if kind == cls.OPT_EXTRA:
+                key, _, value = value.partition('=')
+                options[key] = value
+            elif kind in cls.OPTIONS:
+                options[cls.OPTIONS[kind]] = value
+            # Las claves desconocidas se ignoran: un par más nuevo puede mandar opciones que no entendemos
+        return options
+
+
+class CodecPacketizer(Packetizer):
+    """Packetizer sobre WireCodec: los motores SW/SR/GBN lo usan igual que DefaultPacketizer."""
+    FLAG_ACK_NOW = 0x01
+    FLAG_COMPRESSED = 0x02
+    MAX_SACK_BLOCKS = 32
+
+    HEADER_SIZE = WireCodec.HEADER.size
+    ACK_HEADER_SIZE = HEADER_SIZE
+    SACK_HEADER_SIZE = HEADER_SIZE + WireCodec.SACK_INFO.size
+
+    def __init__(self, cid: int = 0):
+        self.cid = cid
+        self.first = WireCodec.first_byte()
+        self.words = self.HEADER_SIZE // 4
+        # Métodos ligados de los structs precompilados: el camino de datos evita búsquedas de atributos
+        self._pack = WireCodec.HEADER.pack
+        self._pack_into = WireCodec.HEADER.pack_into
+        self._u32 = WireCodec.U32.unpack_from
+
+    def _header(self, msg_type, seq=0, timestamp=0, flags=0):
+        return self._pack(self.first, msg_type, flags, self.words, self.cid, seq, timestamp)
+
+    def make_data_packet(self, seq, data, timestamp=0, flags=0):
+        return self._pack(self.first, WireCodec.DATA, flags, self.words, self.cid, seq, timestamp) + data
+
+    def pack_data_header(self, buffer, offset, seq, timestamp=0, flags=0):
+        self._pack_into(buffer, offset, self.first, WireCodec.DATA, flags, self.words, self.cid, seq, timestamp)
+
+    def make_ack_packet(self, seq, timestamp=0):
+        return self._header(WireCodec.ACK, seq, timestamp)
+
+    def make_sack_packet(self, cum_ack, blocks, timestamp=0, window=0):
+        blocks = blocks[:self.MAX_SACK_BLOCKS]
+        packet = bytearray(self._header(WireCodec.SACK, cum_ack, timestamp))
+        packet += WireCodec.SACK_INFO.pack(window, len(blocks))
+        for start, end in blocks:
+            packet += WireCodec.BLOCK.pack(start, end)
+        return bytes(packet)
+
+    def make_terminate_packet(self, digest=b''):
+        return self._header(WireCodec.TERM) + digest
+
+    def make_terminate_ack_packet(self, ok):
+        return self._header(WireCodec.TERM_ACK) + bytes([1 if ok else 0])
+
+    def _type(self, packet):
+        if len(packet) >= self.HEADER_SIZE and packet[0] == self.first:
+            return packet[1]
+        return None
+
+    def is_ack(self, packet):
+        return self._type(packet) == WireCodec.ACK
+
+    def is_sack(self, packet):
+        return self._type(packet) == WireCodec.SACK and len(packet) >= self.SACK_HEADER_SIZE
+
+    def is_data(self, packet):
+        return self._type(packet) == WireCodec.DATA and len(packet) > packet[3] * 4
+
+    def is_terminate(self, packet):
+        return self._type(packet) == WireCodec.TERM
+
+    def is_terminate_ack(self, packet):
+        return self._type(packet) == WireCodec.TERM_ACK and len(packet) > packet[3] * 4
+
+    def extract_sack(self, packet):
+        _, count = WireCodec.SACK_INFO.unpack_from(packet, self.HEADER_SIZE)
+        # La cantidad viene del paquete: un SACK cortado no puede leer más allá del final
+        count = min(count, (len(packet) - self.SACK_HEADER_SIZE) // WireCodec.BLOCK.size)
+        offset = self.SACK_HEADER_SIZE
+        blocks = []
+        for _ in range(count):
+            blocks.append(WireCodec.BLOCK.unpack_from(packet, offset))
+            offset += WireCodec.BLOCK.size
+        return self.extract_seq(packet), blocks
+
+    def extract_window(self, packet):
+        return WireCodec.U32.unpack_from(packet, self.HEADER_SIZE)[0]
+
+    def extract_seq(self, packet):
+        return self._u32(packet, 8)[0] if len(packet) >= self.HEADER_SIZE else None
+
+    def extract_timestamp(self, packet):
+        return self._u32(packet, 12)[0] if len(packet) >= self.HEADER_SIZE else 0
+
+    def extract_flags(self, packet):
+        return packet[2] if len(packet) >= self.HEADER_SIZE else 0
+
+    def extract_data(self, packet):
+        return packet[packet[3] * 4:]
+
+    def extract_digest(self, packet):
+        return bytes(packet[packet[3] * 4:])
+
+    def extract_verdict(self, packet):
+        return bool(packet[packet[3] * 4])
+
+    def make_confirm_packet(self, options=None):
+        return WireCodec.encode(WireCodec.CONFIRM, cid=self.cid, options=options)
+
+    def extract_confirm(self, packet):
+        if self._type(packet) != WireCodec.CONFIRM:
+            return None
+        try:
+            return WireCodec.decode(packet).options
+        except CodecError:
+            return None
+
+    # PROBE: el seq lleva el largo de la sonda, rellenada con ceros; PROBE_ACK lo devuelve
+    def make_probe_packet(self, size):
+        return self._header(WireCodec.PROBE, size) + bytes(size - self.HEADER_SIZE)
+
+    def is_probe(self, packet):
+        return self._type(packet) == WireCodec.PROBE
+
+    def make_probe_ack_packet(self, size):
+        return self._header(WireCodec.PROBE_ACK, size)
+
+    def extract_probe_ack(self, packet):
+        return self.extract_seq(packet) if self._type(packet) == WireCodec.PROBE_ACK else None
+
+    def make_fin_packet(self):
+        return self._header(WireCodec.FIN)
+
+    def is_fin(self, packet):
+        return self._type(packet) == WireCodec.FIN
+
+    def make_fin_ack_packet(self):
+        return self._header(WireCodec.FIN_ACK)
+
+    def is_fin_ack(self, packet):
+        return self._type(packet) == WireCodec.FIN_ACK
+
+
+def make_packetizer(options: dict = None) -> Packetizer:
+    """El packetizer de la conexión: WireCodec si se acordó la opción 'wire', si no el formato original."""
+    options = options or {}
+    if int(options.get("wire", 0)) >= WireCodec.VERSION:
+        return CodecPacketizer(int(options.get("cid", 0)))
+    return DefaultPacketizer()
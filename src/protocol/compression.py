@@ -0,0 +1,131 @@
+# protocol/compression.py
+import lzma
+import zlib
+from utils.connection_config import ConnectionConfig
+
+
+class CompressionError(ValueError):
+    """Un DATA comprimido que no se puede descomprimir: el receptor lo descarta como si se hubiera perdido."""
+    pass
+
+
+class ChunkCompressor:
+    """
+    Compresión chunk por chunk, entre el archivo y el packetizer. Cada chunk se comprime
+    solo, sin estado compartido con los demás: se puede perder, llegar fuera de orden o
+    retransmitirse como cualquier DATA, y el receptor lo descomprime directo a su lugar
+    (seq * chunk_size). Los DATA comprimidos llevan FLAG_COMPRESSED en la cabecera.
+
+    Antes de comprimir se mira una muestra salteada del chunk: si casi todos sus bytes
+    son distintos es ruido (un archivo ya comprimido, cifrado) y sale crudo sin gastar
+    CPU. Si al comprimirlo no se ahorra lo suficiente, también. Tras cada chunk crudo
+    los siguientes salen crudos sin mirarlos, de a tramos que se duplican hasta
+    MAX_BACKOFF: un archivo incompresible casi no paga la muestra.
+    """
+    ALGORITHMS = ("zlib", "lzma")
+    SAMPLE = 256
+    # En 256 bytes al azar aparecen ~162 valores distintos; en texto rara vez más de 100
+    MAX_DISTINCT = 144
+    # Tiene que ahorrar al menos 1/MIN_SAVING del chunk para que valga descomprimirlo
+    MIN_SAVING = 8
+    MAX_BACKOFF = 32
+    LZMA_FILTERS = [{"id": lzma.FILTER_LZMA2, "preset": 0}]
+
+    def __init__(self, algorithm: str, chunk_size: int = None):
+        if algorithm not in self.ALGORITHMS:
+            raise ValueError(f"Unknown compression '{algorithm}'")
+        self.algorithm = algorithm
+        self.chunk_size = chunk_size or ConnectionConfig.CHUNK_SIZE
+        self.compressed = 0
+        self.raw = 0
+        self.backoff = 0
+        self.skip = 0
+
+    def compress(self, chunk):
+        """El chunk comprimido, o None si conviene mandarlo crudo."""
+        if self.skip:
+            self.skip -= 1
+            self.raw += 1
+            return None
+        stride = max(1, len(chunk) // self.SAMPLE)
+        if len(set(bytes(chunk[::stride]))) > self.MAX_DISTINCT:
+            return self._incompressible()
+        if self.algorithm == "zlib":
+            # Deflate crudo (wbits negativo): sin cabecera ni checksum por chunk
+            packed = zlib.compress(chunk, ConnectionConfig.COMPRESSION_LEVEL, -zlib.MAX_WBITS)
+        else:
+            packed = lzma.compress(chunk, format=lzma.FORMAT_RAW, filters=self.LZMA_FILTERS)
+        if len(packed) > len(chunk) - len(chunk) // self.MIN_SAVING:
+            return self._incompressible()
+        self.compressed += 1
+        self.backoff = 0
+        return packed
+
+    def _incompressible(self):
+        self.raw += 1
+        self.backoff = min(self.MAX_BACKOFF, self.backoff * 2 or 1)
+        self.skip = self.backoff
+        return None
+
+    def decompress(self, payload) -> bytes:
+        # Nunca se descomprime más de un chunk: un DATA malformado no puede inflar la memoria.
+        # Sin el fin del stream el chunk llegó cortado: se devolverían solo sus primeros bytes
+        try:
+            if self.algorithm == "zlib":
+                decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+                data = decompressor.decompress(payload, self.chunk_size)
+                too_long = bool(decompressor.unconsumed_tail)
+            else:
+                decompressor = lzma.LZMADecompressor(format=lzma.FORMAT_RAW, filters=self.LZMA_FILTERS)
+                data = decompressor.decompress(payload, self.chunk_size)
+                too_long = not decompressor.eof and not decompressor.needs_input
+        except (zlib.error, lzma.LZMAError) as e:
+            raise CompressionError(f"Corrupt compressed chunk: {e}") from e
+        if too_long:
+            raise CompressionError(f"Compressed chunk expands beyond {self.chunk_size} bytes")
+        if not decompressor.eof:
+            raise CompressionError("Truncated compressed chunk")
+        return data
+
+
+class PackedChunks:
+    """
+    Lo que decidió el compresor para cada chunk en vuelo. Una retransmisión reusa el
+    mismo payload (comprimido o crudo): no se vuelve a gastar CPU en un enlace con
+    pérdidas, ni se toca el backoff ni los contadores del compresor. El emisor suelta
+    cada chunk cuando se confirma.
+    """
+    def __init__(self, compressor: ChunkCompressor):
+        self.compressor = compressor
+        self.chunks = {}
+
+    def payload(self, seq: int, chunk) -> tuple:
+        """(payload, comprimido) para el DATA del chunk seq."""
+        if seq not in self.chunks:
+            self.chunks[seq] = self.compressor.compress(chunk)
+        packed = self.chunks[seq]
+        return (chunk, False) if packed is None else (packed, True)
+
+    def release(self, start: int, end: int = None):
+        """Suelta los chunks [start, end) (o solo start) ya confirmados."""
+        for seq in range(start, start + 1 if end is None else end):
+            self.chunks.pop(seq, None)
+
+
+def extract_payload(packet, packetizer, compressor: ChunkCompressor = None):
+    """Los datos del DATA tal como van al archivo: descomprimidos si traen FLAG_COMPRESSED."""
+    data = packetizer.extract_data(packet)
+    if packetizer.extract_flags(packet) & packetizer.FLAG_COMPRESSED:
+        if compressor is None:
+            raise CompressionError("Compressed DATA on a connection that did not negotiate compression")
+        return compressor.decompress(data)
+    return data
+
+
+def make_compressor(options: dict = None):
+    """El compresor acordado en el handshake (opción 'compress'), o None si no se acordó."""
+    options = options or {}
+    algorithm = options.get("compress")
+    if not algorithm:
+        return None
+    return ChunkCompressor(algorithm, int(options.get("chunk", ConnectionConfig.CHUNK_SIZE)))
@@ -0,0 +1,116 @@
+import time
+from abc import ABC, abstractmethod
+from utils import ConnectionConfig
+
+
+class CongestionController(ABC):
+    """
+    Define la ventana de congestión (cwnd, en paquetes) del emisor.
+    El protocolo avisa cada ACK nuevo y cada evento de pérdida; la ventana
+    efectiva es el mínimo entre cwnd y la ventana propia del protocolo.
+    """
+    def __init__(self, max_window: int, initial_window: int = None):
+        self.max_window = max_window
+        self.initial_window = initial_window or ConnectionConfig.INITIAL_CWND
+        self.cwnd = float(min(self.initial_window, max_window))
+        self.ssthresh = float(max_window)
+
+    @property
+    def window(self) -> int:
+        return max(1, min(self.max_window, int(self.cwnd)))
+
+    @abstractmethod
+    def on_ack(self, acked: int, rtt: float = None):
+        pass
+
+    @abstractmethod
+    def on_loss(self, timeout: bool = False):
+        pass
+
+
+class NoCongestionControl(CongestionController):
+    """Ventana fija: se comporta como el protocolo sin control de congestión."""
+    def __init__(self, max_window: int, initial_window: int = None):
+        super().__init__(max_window, max_window)
+
+    def on_ack(self, acked, rtt=None):
+        pass
+
+    def on_loss(self, timeout=False):
+        pass
+
+
+class RenoController(CongestionController):
+    """AIMD: slow start exponencial, +1 paquete por RTT en congestion avoidance y mitad por pérdida."""
+    def on_ack(self, acked, rtt=None):
+        if self.cwnd < self.ssthresh:
+            self.cwnd += acked
+        else:
+            self.cwnd += acked / self.cwnd
+        self.cwnd = min(self.cwnd, float(self.max_window))
+
+    def on_loss(self, timeout=False):
+        self.ssthresh = max(self.cwnd / 2, 2.0)
+        self.cwnd = float(self.initial_window) if timeout else self.ssthresh
+
+
+class CubicController(CongestionController):
+    """CUBIC (RFC 8312): la ventana crece como una cúbica del tiempo desde la última pérdida."""
+    C = 0.4
+    BETA = 0.7
+
+    def __init__(self, max_window: int, initial_window: int = None):
+        super().__init__(max_window, initial_window)
+        self.w_max = 0.0
+        self.k = 0.0
+        self.epoch_start = None
+        self.srtt = None
+
+    def on_ack(self, acked, rtt=None):
+        if rtt is not None:
+            self.srtt = rtt
+        if self.cwnd < self.ssthresh:
+            self.cwnd = min(self.cwnd + acked, float(self.max_window))
+            return
+
+        now = time.monotonic()
+        if self.epoch_start is None:
+            self.epoch_start = now
+            if self.cwnd < self.w_max:
+                self.k = ((self.w_max - self.cwnd) / self.C) ** (1 / 3)
+            else:
+                self.k = 0.0
+                self.w_max = self.cwnd
+        t = now - self.epoch_start
+        target = self.C * (t - self.k) ** 3 + self.w_max
+
+        # Región TCP-friendly: nunca crecer más lento que Reno
+        if self.srtt:
+            reno = self.w_max * self.BETA + 3 * (1 - self.BETA) / (1 + self.BETA) * (t / self.srtt)
+            target = max(target, reno)
+
+        if target > self.cwnd:
+            self.cwnd += (target - self.cwnd) / self.cwnd * acked
+        else:
+            self.cwnd += acked / (100 * self.cwnd)
+        self.cwnd = min(self.cwnd, float(self.max_window))
+
+    def on_loss(self, timeout=False):
+        self.epoch_start = None
+        self.w_max = self.cwnd
+        self.ssthresh = max(self.cwnd * self.BETA, 2.0)
+        self.cwnd = float(self.initial_window) if timeout else self.ssthresh
+
+
+CONGESTION_CONTROLLERS = {
+    'none': NoCongestionControl,
+    'reno': RenoController,
+    'cubic': CubicController,
+}
+
+
+def make_congestion_controller(name: str, max_window: int) -> CongestionController:
+    try:
+        return CONGESTION_CONTROLLERS[name](max_window)
+    except KeyError:
+        raise ValueError(f"Unknown congestion control '{name}'")
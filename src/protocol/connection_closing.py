@@ -1,46 +1,44 @@
 import socket
-from utils import Logger, RetryHandler, ConnectionConfig
+from protocol.exchange import Exchange, PENDING
+from protocol.packet import DefaultPacketizer
+from utils import Logger
+
+class FinExchange(Exchange):
+    """FIN hasta recibir el FIN del par; True si llegó, False si se agotaron los intentos."""
+    description = "Sending FIN"
+
+    def __init__(self, packetizer, dest: tuple, rtt=None):
+        super().__init__(packetizer.make_fin_packet(), dest, rtt)
+        self.packetizer = packetizer
+
+    def on_reply(self, packet):
+        # Un ACKFIN también cierra: el par ya recibió nuestro FIN aunque el suyo se haya perdido
+        if self.packetizer.is_fin(packet) or self.packetizer.is_fin_ack(packet):
+            Logger.debug(who=self.who, message=f"Received {bytes(packet)!r} from peer")
+            return True
+        return PENDING
+
+    def give_up(self):
+        return False
 
-retrier = RetryHandler(
-    retries=ConnectionConfig.MAX_RETRIES,
-)
 
 class ConnectionClosingProtocol:
-    FIN = b"FIN"
-    ACK = b"ACKFIN"
+    """FIN, esperar el FIN (o el ACKFIN) del par, ACKFIN; en el formato acordado de la conexión."""
 
     @classmethod
-    def start_closing_handshake(cls, sock: socket.socket, peer_address: tuple):
-        sock.settimeout(ConnectionConfig.TIMEOUT)
+    def start_closing_handshake(cls, sock: socket.socket, peer_address: tuple, rtt=None, packetizer=None):
+        packetizer = packetizer or DefaultPacketizer()
+        Logger.debug(who=sock.getsockname(), message=f"===== CLOSING to {peer_address}")
         return (
-            cls._send_fin_and_wait_peer(sock, peer_address) and
-            cls._send_final_ack(sock, peer_address)
-        )
-
-    @classmethod
-    def _send_fin_and_wait_peer(cls, sock, addr):
-        Logger.debug(who=sock.getsockname(), message=f"===== CLOSING _send_fin_and_wait_peer to {addr}")
-        def send_fin(attempt):
-            sock.sendto(cls.FIN, addr)
-            Logger.debug(who=sock.getsockname(), message=f"Sent FIN to {addr} (attempt {attempt})")
-            
-            data, _ = sock.recvfrom(1024)
-            if data != cls.FIN:
-                raise socket.timeout()
-            Logger.debug(who=sock.getsockname(), message="Received FIN from peer")
-            return True
-
-        return retrier.run(
-            action=send_fin,
-            logger_who=sock.getsockname(),
-            action_description="Sending FIN"
+            FinExchange(packetizer, peer_address, rtt).run(sock) and
+            cls._send_final_ack(sock, peer_address, packetizer)
         )
 
     @classmethod
-    def _send_final_ack(cls, sock, addr):
+    def _send_final_ack(cls, sock, addr, packetizer):
         Logger.debug(who=sock.getsockname(), message=f"===== CLOSING _send_final_ack to {addr}")
         try:
-            sock.sendto(cls.ACK, addr)
+            sock.sendto(packetizer.make_fin_ack_packet(), addr)
             Logger.debug(who=sock.getsockname(), message="Sent final ACKFIN")
             return True
         except Exception as e:
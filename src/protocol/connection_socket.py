@@ -1,13 +1,18 @@
 import socket
 from utils.logger import Logger
+from .codec import make_packetizer
 from .connection_closing import ConnectionClosingProtocol
+from .rtt_estimator import RttEstimator
 
 class ConnectionSocket:
-    def __init__(self, destination_address, source_address=None):
+    def __init__(self, destination_address, source_address=None, sock=None):
         self.destination_address = destination_address
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.rtt = RttEstimator()
+        self.options = {}
+        # sock: un socket ya abierto (p. ej. la vista multiplexada del servidor de un solo puerto)
+        self.socket = sock or socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         
-        if source_address is not None:
+        if source_address is not None and sock is None:
             self.socket.bind(source_address)
 
         self.source_address = self.socket.getsockname()
@@ -15,6 +20,13 @@ class ConnectionSocket:
 
 
 
+    @property
+    def packetizer(self):
+        """El formato acordado en el handshake; el control de la conexión (cierre) también lo usa."""
+        return make_packetizer(self.options)
+
+
+
     def send(self, data: bytes):
         self.socket.sendto(data, self.destination_address)
         
@@ -31,20 +43,20 @@ class ConnectionSocket:
 
 
 
-    def receive(self):
-        data, addr = self.socket.recvfrom(1024)
+    def receive(self, bufsize=1024):
+        data, addr = self.socket.recvfrom(bufsize)
 
         if addr != self.destination_address:
             Logger.debug(who=self.source_address, message=f"Received data from unexpected address: {addr}")
-            return self.receive()
+            return self.receive(bufsize)
 
-        if data == b'FIN':
+        if self.packetizer.is_fin(data):
             self.close()
             raise ConnectionClosedError("Connection closed by remote side")
 
         elif data == b'ACK':
             Logger.debug(who=self.source_address, message=f"ACK received from {addr}")
-            return self.receive()
+            return self.receive(bufsize)
 
         else:
             self.send(b'ACK')
@@ -59,7 +71,7 @@ class ConnectionSocket:
             return
         
         try:
-            if ConnectionClosingProtocol.start_closing_handshake(self.socket, self.destination_address):
+            if ConnectionClosingProtocol.start_closing_handshake(self.socket, self.destination_address, self.rtt, self.packetizer):
                 Logger.debug(who=self.source_address, message="Closing handshake completed")
             else:
                 Logger.error(who=self.source_address, message="Closing handshake failed")
@@ -75,11 +87,11 @@ class ConnectionSocket:
 
 
 
-    def get_message(self, timeout=2, max_retries=5):
+    def get_message(self, timeout=2, max_retries=5, bufsize=1024):
         self.socket.settimeout(timeout)
         for attempt in range(max_retries):
             try:
-                data, addr = self.receive()
+                data, addr = self.receive(bufsize)
                 return data
             except socket.timeout:
                 Logger.debug(who=self.source_address, message=f"[Attempt {attempt+1}] Timeout waiting for message, retrying...")
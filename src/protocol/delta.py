@@ -0,0 +1,243 @@
+# protocol/delta.py
+import hashlib
+import mmap
+import os
+import struct
+import zlib
+from collections import namedtuple
+from protocol.integrity import IntegrityError
+from utils.connection_config import ConnectionConfig
+
+
+class DeltaError(ValueError):
+    pass
+
+
+# Firmas de la copia del servidor: cabecera y, por cada bloque completo, adler32 + hash fuerte
+SIGNATURE_HEADER = struct.Struct('!4sIQ')
+SIGNATURE_ENTRY = struct.Struct('!I16s')
+SIGNATURE_MAGIC = b'SIG1'
+
+# Delta: cabecera con el tamaño y el digest del archivo nuevo, después las operaciones
+DELTA_HEADER = struct.Struct('!4sIQ32s')
+DELTA_MAGIC = b'DLT1'
+COPY = struct.Struct('!cQI')         # 'C', primer bloque de la copia, cantidad de bloques
+LITERAL = struct.Struct('!cI')       # 'L', largo; siguen los bytes
+MAX_LITERAL = 1 << 20
+
+ADLER_MOD = 65521
+
+DeltaStats = namedtuple('DeltaStats', 'copied literal')
+
+
+def strong_hash(block) -> bytes:
+    return hashlib.blake2b(block, digest_size=16).digest()
+
+
+def file_digest():
+    return hashlib.blake2b(digest_size=32)
+
+
+def _map(f, size):
+    # mmap no acepta archivos vacíos
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+
+def write_signatures(basis_path: str, signature_path: str, block_size: int):
+    """Firma cada bloque completo de la copia existente; el último bloque corto viaja como literal."""
+    with open(basis_path, 'rb') as basis, open(signature_path, 'wb') as out:
+        size = os.fstat(basis.fileno()).st_size
+        out.write(SIGNATURE_HEADER.pack(SIGNATURE_MAGIC, block_size, size))
+        data = _map(basis, size)
+        try:
+            with memoryview(data) as view:
+                for offset in range(0, size - block_size + 1, block_size):
+                    with view[offset:offset + block_size] as block:
+                        out.write(SIGNATURE_ENTRY.pack(zlib.adler32(block), strong_hash(block)))
+        finally:
+            if size:
+                data.close()
+
+
+def read_signatures(signature_path: str):
+    """(block_size, tabla adler32 -> [(hash fuerte, índice de bloque)])."""
+    with open(signature_path, 'rb') as f:
+        raw = f.read()
+    if len(raw) < SIGNATURE_HEADER.size:
+        raise DeltaError("Truncated signature file")
+    magic, block_size, _ = SIGNATURE_HEADER.unpack_from(raw)
+    if magic != SIGNATURE_MAGIC or block_size <= 0:
+        raise DeltaError(f"Bad signature header {magic!r}")
+    table = {}
+    for index, (weak, strong) in enumerate(SIGNATURE_ENTRY.iter_unpack(raw[SIGNATURE_HEADER.size:])):
+        table.setdefault(weak, []).append((strong, index))
+    return block_size, table
+
+
+class DeltaEncoder:
+    """
+    Recorre el archivo nuevo buscando bloques que el servidor ya tiene, en cualquier
+    offset: adler32 se calcula en C al principio de cada bloque y se desliza de a un
+    byte (en Python) solo mientras no hay coincidencia. Un hueco sin coincidencias
+    se salta de a tramos que se duplican hasta MAX_SKIP bloques, cada uno seguido de
+    un bloque deslizado entero (que cubre todos los corrimientos): un archivo muy
+    cambiado no se recorre byte a byte, y tras un cambio se pierden a lo sumo
+    MAX_SKIP bloques reutilizables.
+    """
+    MAX_SKIP = 16
+
+    def __init__(self, block_size: int, table: dict, out):
+        self.block_size = block_size
+        self.table = table
+        self.out = out
+        self.copy_from = None
+        self.copy_count = 0
+        self.copied = 0
+        self.literal = 0
+
+    def encode(self, data):
+        size, block = len(data), self.block_size
+        view = memoryview(data)
+        pos = literal_from = 0
+        weak = None
+        rolled = 0
+        skip = 0
+        while pos + block <= size:
+            if weak is None:
+                weak = zlib.adler32(view[pos:pos + block])
+                a, b = weak & 0xFFFF, weak >> 16
+            candidates = self.table.get(weak)
+            if candidates:
+                index = self._match(candidates, view[pos:pos + block])
+                if index is not None:
+                    self._literal(view[literal_from:pos])
+                    self._copy(index)
+                    pos += block
+                    literal_from = pos
+                    weak, rolled, skip = None, 0, 0
+                    continue
+            if rolled >= block:
+                # Se probaron todos los corrimientos de este bloque sin suerte: se salta
+                skip = min(self.MAX_SKIP, skip * 2 or 1)
+                pos += skip * block
+                weak, rolled = None, 0
+                continue
+            if pos + block < size:
+                out, new = data[pos], data[pos + block]
+                a = (a - out + new) % ADLER_MOD
+                b = (b - block * out + a - 1) % ADLER_MOD
+                weak = (b << 16) | a
+            pos += 1
+            rolled += 1
+        self._literal(view[literal_from:size])
+        self._flush_copy()
+        view.release()
+        return DeltaStats(self.copied, self.literal)
+
+    def _match(self, candidates, window):
+        strong = strong_hash(window)
+        found = None
+        for candidate, index in candidates:
+            if candidate == strong:
+                # El bloque que sigue a la copia en curso la extiende en lugar de abrir otra
+                if self.copy_from is not None and index == self.copy_from + self.copy_count:
+                    return index
+                if found is None:
+                    found = index
+        return found
+
+    def _copy(self, index):
+        if self.copy_from is not None and index == self.copy_from + self.copy_count:
+            self.copy_count += 1
+        else:
+            self._flush_copy()
+            self.copy_from, self.copy_count = index, 1
+        self.copied += self.block_size
+
+    def _flush_copy(self):
+        if self.copy_from is not None:
+            self.out.write(COPY.pack(b'C', self.copy_from, self.copy_count))
+            self.copy_from = None
+
+    def _literal(self, data):
+        if not len(data):
+            return
+        self._flush_copy()
+        for start in range(0, len(data), MAX_LITERAL):
+            piece = data[start:start + MAX_LITERAL]
+            self.out.write(LITERAL.pack(b'L', len(piece)))
+            self.out.write(piece)
+        self.literal += len(data)
+
+
+def write_delta(source_path: str, signature_path: str, delta_path: str) -> DeltaStats:
+    """Arma el delta del archivo nuevo contra las firmas de la copia del servidor."""
+    block_size, table = read_signatures(signature_path)
+    with open(source_path, 'rb') as source, open(delta_path, 'wb') as out:
+        size = os.fstat(source.fileno()).st_size
+        data = _map(source, size)
+        try:
+            digest = file_digest()
+            digest.update(data)
+            out.write(DELTA_HEADER.pack(DELTA_MAGIC, block_size, size, digest.digest()))
+            return DeltaEncoder(block_size, table, out).encode(data)
+        finally:
+            if size:
+                data.close()
+
+
+def apply_delta(basis_path: str, delta_path: str, output_path: str):
+    """
+    Rearma el archivo nuevo a partir de la copia vieja y el delta, y recién si su digest
+    coincide con el del cliente reemplaza output_path (que puede ser la misma copia vieja).
+    """
+    tmp = output_path + ".delta.tmp"
+    try:
+        with open(basis_path, 'rb') as basis, open(delta_path, 'rb') as delta, open(tmp, 'wb') as out:
+            header = delta.read(DELTA_HEADER.size)
+            if len(header) < DELTA_HEADER.size:
+                raise DeltaError("Truncated delta header")
+            magic, block_size, size, expected = DELTA_HEADER.unpack(header)
+            if magic != DELTA_MAGIC or block_size <= 0:
+                raise DeltaError(f"Bad delta header {magic!r}")
+            digest = file_digest()
+            while True:
+                kind = delta.read(1)
+                if not kind:
+                    break
+                if kind == b'C':
+                    _, first, count = COPY.unpack(kind + _read_exact(delta, COPY.size - 1))
+                    _copy_blocks(basis, out, digest, first * block_size, count * block_size)
+                elif kind == b'L':
+                    _, length = LITERAL.unpack(kind + _read_exact(delta, LITERAL.size - 1))
+                    data = delta.read(length)
+                    if len(data) != length:
+                        raise DeltaError("Truncated literal")
+                    out.write(data)
+                    digest.update(data)
+                else:
+                    raise DeltaError(f"Unknown delta operation {kind!r}")
+            if out.tell() != size or digest.digest() != expected:
+                raise IntegrityError(f"Rebuilt {output_path} does not match the client's file")
+        os.replace(tmp, output_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _read_exact(f, length):
+    data = f.read(length)
+    if len(data) != length:
+        raise DeltaError("Truncated delta operation")
+    return data
+
+
+def _copy_blocks(basis, out, digest, offset, length):
+    while length:
+        data = os.pread(basis.fileno(), min(length, ConnectionConfig.DIGEST_BLOCK), offset)
+        if not data:
+            raise DeltaError("Delta references blocks beyond the end of the basis file")
+        out.write(data)
+        digest.update(data)
+        offset += len(data)
+        length -= len(data)
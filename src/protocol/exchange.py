@@ -0,0 +1,69 @@
+# protocol/exchange.py
+import socket
+import time
+from abc import ABC, abstractmethod
+from utils import Logger, RetryHandler, ConnectionConfig
+
+# Lo que devuelve on_reply para un paquete que no contesta el pedido
+PENDING = object()
+
+
+class Exchange(ABC):
+    """
+    Un mensaje de control que se repite hasta que el par contesta (TERM, FIN). Acá
+    está todo lo que no depende de cómo se espera: qué se manda, cuánto dura cada
+    intento, qué respuesta cierra el intercambio y qué devuelve. run lo corre sobre
+    un socket bloqueante; el cliente asyncio lo corre igual sobre su endpoint.
+    """
+    description = "Control exchange"
+
+    def __init__(self, request: bytes, dest: tuple, rtt=None):
+        self.request = request
+        self.dest = dest
+        self.rtt = rtt
+        self.who = None
+
+    @property
+    def timeout(self) -> float:
+        return self.rtt.rto if self.rtt else ConnectionConfig.TIMEOUT
+
+    @abstractmethod
+    def on_reply(self, packet):
+        """El resultado si packet contesta el pedido; PENDING si es un rezagado de la transferencia."""
+        pass
+
+    def on_timeout(self, attempt: int):
+        if self.rtt:
+            self.rtt.on_timeout()
+
+    def give_up(self):
+        """Lo que se devuelve si el par nunca contestó."""
+        return None
+
+    def run(self, sock, recv_packet=None):
+        self.who = sock.getsockname()
+        recv_packet = recv_packet or (lambda: sock.recvfrom(65535))
+
+        def attempt_once(attempt):
+            sock.sendto(self.request, self.dest)
+            Logger.debug(who=self.who, message=f"{self.description} to {self.dest} (attempt {attempt})")
+            sock.settimeout(self.timeout)
+            # Los paquetes rezagados de la transferencia no consumen un intento,
+            # pero el intento sigue acotado por el timeout actual
+            deadline = time.monotonic() + self.timeout
+            while True:
+                if time.monotonic() > deadline:
+                    raise socket.timeout()
+                packet, _ = recv_packet()
+                result = self.on_reply(packet)
+                if result is not PENDING:
+                    # En una tupla: RetryHandler devuelve False cuando se agotan los intentos
+                    return (result,)
+
+        outcome = RetryHandler(retries=ConnectionConfig.MAX_RETRIES).run(
+            action=attempt_once,
+            on_timeout=self.on_timeout,
+            logger_who=self.who,
+            action_description=self.description
+        )
+        return outcome[0] if outcome else self.give_up()
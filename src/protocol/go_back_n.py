@@ -0,0 +1,374 @@
+# protocol/go_back_n.py
+import os
+import socket
+import threading
+from protocol.ack_policy import AckPolicy
+from protocol.compression import ChunkCompressor, CompressionError, PackedChunks, extract_payload
+from protocol.congestion_control import CongestionController, make_congestion_controller
+from protocol.integrity import StreamDigest, terminate, check_received
+from protocol.mapped_file import MappedFile
+from protocol.packet import Packetizer, DefaultPacketizer
+from protocol.pacer import TokenBucketPacer
+from protocol.resume import ResumeState, reopen_prefix
+from protocol.rtt_estimator import RttEstimator
+from protocol.udp_offload import BatchSender, BatchReceiver, payload_bytes, tune_socket_buffers
+from utils.connection_config import ConnectionConfig
+from utils.logger import Logger
+from utils.timer_scheduler import TimerScheduler
+
+
+class GoBackNProtocol:
+    """
+    Emisor Go-Back-N: ventana de envío con ACKs acumulativos (el ACK lleva el
+    próximo seq que espera el receptor) y un único timer para el paquete más viejo.
+    Ante un timeout o DUP_THRESHOLD ACKs repetidos se vuelve a enviar todo desde base.
+    No guarda chunks en memoria: las retransmisiones se vuelven a tomar del archivo mapeado.
+    """
+    # ACKs repetidos para dar por perdido el paquete base sin esperar el timeout
+    DUP_THRESHOLD = 3
+
+    def __init__(self, sock: socket.socket, dest: tuple, file_path: str,
+                 packetizer: Packetizer = None, timeout: float = 10.0, window_size: int = ConnectionConfig.GBN_WINDOW_SIZE,
+                 chunk_size: int = None, rtt: RttEstimator = None, congestion: CongestionController = None,
+                 rate: float = None, pacing: bool = True, offload: bool = None,
+                 scheduler: TimerScheduler = None, compressor: ChunkCompressor = None,
+                 resume: ResumeState = None, offset: int = 0, length: int = None):
+        self.sock = sock
+        self.dest = dest
+        self.file_path = file_path
+        self.timeout = timeout
+        self.window_size = window_size
+        chunk_size = chunk_size or ConnectionConfig.CHUNK_SIZE
+        self.chunk_size = chunk_size
+        self.rtt = rtt or RttEstimator(initial_rto=timeout)
+        self.congestion = congestion or make_congestion_controller(ConnectionConfig.CONGESTION_CONTROL, window_size)
+        # Las pérdidas por debajo de recovery_point pertenecen al mismo episodio
+        # y reducen la ventana una sola vez
+        self.recovery_point = 0
+        # base de la última vuelta atrás: los ACKs repetidos de los paquetes que
+        # ya estaban en vuelo cuando se volvió atrás no deben provocar otra
+        self.go_back_seq = -1
+        self.rate = rate
+        self.pacing = pacing
+        self.pacer = TokenBucketPacer(rate, burst=ConnectionConfig.PACING_BURST * chunk_size)
+        self.base = 0
+        self.next_seq = 0
+        # Mayor seq enviado + 1: lo que está por debajo y se vuelve a mandar es retransmisión
+        self.high_water = 0
+        self.dup_acks = 0
+        self.timer = None
+        self.timer_generation = 0
+        self.lock = threading.Lock()
+        self.window_open = threading.Condition(self.lock)
+        self.scheduler = scheduler or TimerScheduler.default()
+        self.packetizer = packetizer or DefaultPacketizer()
+        self.compressor = compressor
+        # Cada chunk se comprime una sola vez: las retransmisiones reusan el resultado
+        self.packed = PackedChunks(compressor) if compressor is not None else None
+        self.packet_size = chunk_size + self.packetizer.HEADER_SIZE
+        self.sender = BatchSender(sock, ConnectionConfig.UDP_OFFLOAD if offload is None else offload)
+        self.batch_limit = self.sender.batch_limit(self.packet_size)
+        # ACKs y SACKs se leen en buffers reutilizables y se parsean en el lugar
+        self.acks = BatchReceiver(sock, 2048, enabled=False)
+        # Con offset/length se manda solo ese rango del archivo (una parte de una descarga en paralelo)
+        self.file = MappedFile(file_path, chunk_size, offset, length)
+        self.file_size = self.file.size
+        self.total = self.file.total
+        # El receptor GBN escribe en orden: al retomar se arranca en su prefijo completo
+        if resume is not None:
+            if resume.size == self.file_size:
+                self.base = self.next_seq = self.high_water = resume.first_missing(chunk_size)
+            else:
+                Logger.error(who=self.sock.getsockname(), message=f"[GBN] Resume state is for a {resume.size} byte file, sending everything")
+        # Cada chunk se hashea la primera vez que sale (por encima de high_water)
+        self.digest = StreamDigest()
+        # Una cabecera por paquete de la tanda; el payload va como vista del archivo mapeado
+        self.headers = bytearray(self.packetizer.HEADER_SIZE * self.batch_limit)
+        self.header_views = [memoryview(self.headers)[i * self.packetizer.HEADER_SIZE:(i + 1) * self.packetizer.HEADER_SIZE]
+                             for i in range(self.batch_limit)]
+        self.send_event = threading.Event()
+        self.sock.settimeout(timeout + 0.1)
+        Logger.debug(who=self.sock.getsockname(), message=f"GBN init for {dest}, file:{file_path}, win:{window_size}")
+
+    @property
+    def rto(self):
+        return self.rtt.rto
+
+    @property
+    def rtt_samples(self):
+        return list(self.rtt.samples)
+
+    @property
+    def effective_window(self):
+        return max(1, min(self.window_size, self.congestion.window))
+
+    def start(self):
+        Logger.info(f"[GBN] Starting transfer to {self.dest}")
+        tune_socket_buffers(self.sock, self.window_size * self.packet_size)
+        if self.base:
+            Logger.info(f"[GBN] Resuming at chunk {self.base} of {self.total}")
+            # El prefijo que ya tiene el receptor entra igual al digest
+            self.digest.update(self.file.range(0, self.base))
+        if self.base >= self.total:
+            self.send_event.set()
+        else:
+            threading.Thread(target=self._receive_acks, daemon=True).start()
+            self._send_data()
+        self.send_event.wait()
+        self.file.close()
+        terminate(self.sock, self.dest, self.packetizer, self.acks.recv_packet, self.rtt, self.digest)
+        Logger.info("[GBN] Transfer completed.")
+
+    def _send_data(self):
+        # Todo DATA (nuevo o retransmitido) sale de este hilo. Volver atrás es solo
+        # mover next_seq a base: el reenvío respeta la ventana de congestión y el pacing.
+        while True:
+            with self.window_open:
+                while not self._window_has_room():
+                    if self.send_event.is_set():
+                        return
+                    self.window_open.wait()
+                packets = []
+                while self._window_has_room() and len(packets) < self.batch_limit:
+                    packets.append(self._packet(self.next_seq, slot=len(packets)))
+                    self.next_seq += 1
+                # Solo este hilo mueve high_water: lo nuevo de la tanda es [new_from, new_to)
+                new_from, new_to = self.high_water, max(self.high_water, self.next_seq)
+                self.high_water = new_to
+                self.sender.send_vectored(packets, self.dest)
+                if self.timer is None:
+                    self._start_timer()
+            # Un solo update por tanda, fuera del lock y con los paquetes ya en el kernel
+            self.digest.update(self.file.range(new_from, new_to))
+            self.pacer.wait(payload_bytes(packets))
+
+    def _window_has_room(self):
+        return self.next_seq < self.total and self.next_seq - self.base < self.effective_window
+
+    def _packet(self, seq, slot=0):
+        retransmission = seq < self.high_water
+        # Karn: las retransmisiones van sin timestamp para no medir RTTs ambiguos
+        timestamp = 0 if retransmission else RttEstimator.timestamp()
+        # Último del archivo, del reenvío o de la ventana: el receptor no debe demorar el ACK
+        ack_now = (seq + 1 >= self.total or seq + 1 == self.high_water or
+                   seq + 1 - self.base >= self.effective_window)
+        flags = self.packetizer.FLAG_ACK_NOW if ack_now else 0
+        payload = self.file.chunk(seq)
+        if self.packed is not None:
+            payload, compressed = self.packed.payload(seq, payload)
+            if compressed:
+                flags |= self.packetizer.FLAG_COMPRESSED
+        header = self.header_views[slot]
+        self.packetizer.pack_data_header(header, 0, seq, timestamp, flags)
+        Logger.debug(who=self.sock.getsockname(), message=f"[GBN] Sent seq={seq}{' (retx)' if retransmission else ''}")
+        return [header, payload]
+
+    def _start_timer(self):
+        self.timer_generation += 1
+        self.timer = self.scheduler.schedule(self.rtt.rto, self._timeout, self.timer_generation)
+
+    def _stop_timer(self):
+        self.timer_generation += 1
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def _timeout(self, generation):
+        with self.lock:
+            # Un timer que venció mientras otro hilo lo reemplazaba ya no vale
+            if generation != self.timer_generation or self.send_event.is_set():
+                return
+            Logger.debug(who=self.sock.getsockname(), message=f"[GBN] Timeout base={self.base}, going back {self.next_seq - self.base}")
+            self.timer = None
+            self.rtt.on_timeout()
+            self.congestion.on_loss(timeout=True)
+            self.recovery_point = self.high_water
+            self._go_back()
+
+    def _go_back(self):
+        self.go_back_seq = self.base
+        self.dup_acks = 0
+        self.next_seq = self.base
+        self._stop_timer()
+        self._update_pacing_rate()
+        self.window_open.notify()
+
+    def _receive_acks(self):
+        while True:
+            try:
+                packet, _ = self.acks.recv_packet()
+                if self._on_ack(packet):
+                    return
+            except socket.timeout:
+                continue
+
+    def _on_ack(self, packet):
+        """Procesa un ACK acumulativo; devuelve True cuando todo el archivo quedó confirmado."""
+        if not self.packetizer.is_ack(packet):
+            return False
+        ack = self.packetizer.extract_seq(packet)
+        Logger.debug(who=self.sock.getsockname(), message=f"[GBN] Received ACK next={ack}")
+        with self.lock:
+            self.rtt.on_timestamp_echo(self.packetizer.extract_timestamp(packet))
+            if ack > self.base:
+                acked = min(ack, self.high_water) - self.base
+                if self.packed is not None:
+                    self.packed.release(self.base, self.base + acked)
+                self.base += acked
+                # Tras volver atrás, el receptor puede confirmar más de lo reenviado
+                self.next_seq = max(self.next_seq, self.base)
+                self.dup_acks = 0
+                self.congestion.on_ack(acked, self.rtt.srtt)
+                self._update_pacing_rate()
+                self._stop_timer()
+                if self.base >= self.total:
+                    self.send_event.set()
+                    self.window_open.notify()
+                    return True
+                if self.base < self.next_seq:
+                    self._start_timer()
+                self.window_open.notify()
+            elif ack == self.base and self.base < self.next_seq:
+                self.dup_acks += 1
+                # Se puede volver a ir atrás si se perdió un paquete del reenvío anterior
+                if self.dup_acks == self.DUP_THRESHOLD and self.base > self.go_back_seq:
+                    Logger.debug(who=self.sock.getsockname(), message=f"[GBN] {self.DUP_THRESHOLD} duplicate ACKs for base={self.base}, going back")
+                    if self.base >= self.recovery_point:
+                        self.congestion.on_loss(timeout=False)
+                        self.recovery_point = self.high_water
+                    self._go_back()
+        return False
+
+    def _update_pacing_rate(self):
+        rate = self.rate
+        if self.pacing and self.rtt.srtt:
+            cwnd_rate = ConnectionConfig.PACING_GAIN * self.effective_window * self.chunk_size / self.rtt.srtt
+            rate = cwnd_rate if rate is None else min(rate, cwnd_rate)
+        self.pacer.set_rate(rate)
+
+    def close(self):
+        with self.lock:
+            self._stop_timer()
+        self.file.close()
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        Logger.debug(who=self.dest, message="Socket closed.")
+
+
+class GoBackNReceiver:
+    """
+    Receptor Go-Back-N: acepta solo el seq esperado y descarta el resto, sin buffer
+    de reordenamiento. El ACK es acumulativo y lleva el próximo seq que espera.
+    """
+    def __init__(self, sock: socket.socket, output_path: str,
+                 packetizer: Packetizer = None, timeout: float = 1.0,
+                 ack_policy: AckPolicy = None, chunk_size: int = None, offload: bool = None,
+                 compressor: ChunkCompressor = None, resume: ResumeState = None, offset: int = None):
+        self.sock = sock
+        self.output_path = output_path
+        # Con offset se recibe un rango dentro de un archivo que ya existe: se escribe
+        # en orden desde offset sin truncar lo que hay alrededor
+        self.offset = offset
+        self.packetizer = packetizer or DefaultPacketizer()
+        self.chunk_size = chunk_size or ConnectionConfig.CHUNK_SIZE
+        self.bufsize = self.chunk_size + self.packetizer.HEADER_SIZE
+        self.receiver = BatchReceiver(sock, self.bufsize, ConnectionConfig.UDP_OFFLOAD if offload is None else offload)
+        self.compressor = compressor
+        self.timeout = timeout
+        self.ack_policy = ack_policy or AckPolicy(ConnectionConfig.SR_ACK_EVERY, ConnectionConfig.ACK_DELAY)
+        self.expected_seq = 0
+        # Solo se escribe en orden: el hash avanza con cada escritura
+        self.digest = StreamDigest()
+        self.verified = None
+        # Al retomar se sigue desde el prefijo contiguo que quedó en disco
+        self.resume = resume
+        if resume is not None and os.path.exists(output_path):
+            self.expected_seq = resume.first_missing(self.chunk_size)
+        self.peer = None
+        self.running = True
+        self.sock.settimeout(timeout + 0.1)
+        Logger.debug(who=self.sock.getsockname(), message=f"GBN Receiver init, output:{output_path}")
+
+    def start(self):
+        Logger.info("[GBN-Receiver] Receiver started.")
+        tune_socket_buffers(self.sock, ConnectionConfig.GBN_WINDOW_SIZE * self.bufsize)
+        with open(self.output_path, 'r+b' if self.expected_seq or self.offset is not None else 'wb') as f:
+            if self.offset is not None:
+                f.seek(self.offset)
+            if self.expected_seq:
+                Logger.info(f"[GBN-Receiver] Resuming at chunk {self.expected_seq}")
+                reopen_prefix(f, min(self.expected_seq * self.chunk_size, self.resume.size), self.digest)
+            try:
+                while self.running:
+                    try:
+                        self.sock.settimeout(self.ack_policy.time_left(self.timeout + 0.1))
+                        packets, addr = self.receiver.recv()
+                        for packet in packets:
+                            self._on_packet(packet, addr, f)
+                    except socket.timeout:
+                        self._on_idle()
+            finally:
+                self._save_progress(f, final=True)
+        check_received(self.output_path, self.verified, self.offset)
+        Logger.info(f"[GBN-Receiver] File saved to {self.output_path}")
+
+    def _on_packet(self, packet, addr, f):
+        if self.packetizer.is_data(packet):
+            self._on_data(packet, addr, f)
+        elif self.packetizer.is_terminate(packet):
+            Logger.info("[GBN-Receiver] Received terminate.")
+            self.verified = self.digest.matches(self.packetizer.extract_digest(packet))
+            self.sock.sendto(self.packetizer.make_terminate_ack_packet(self.verified), addr)
+            self.running = False
+
+    def _on_idle(self):
+        if self.ack_policy.due():
+            self._send_ack(self.peer)
+
+    def _on_data(self, packet, addr, f):
+        seq = self.packetizer.extract_seq(packet)
+        self.peer = addr
+        in_order = seq == self.expected_seq
+        if in_order:
+            try:
+                data = extract_payload(packet, self.packetizer, self.compressor)
+            except CompressionError as e:
+                # Como si se hubiera perdido: el emisor lo retransmite
+                Logger.debug(who=self.sock.getsockname(), message=f"[GBN-Receiver] Dropped seq={seq}: {e}")
+                return
+            f.write(data)
+            self.digest.update(data)
+            Logger.debug(who=self.sock.getsockname(), message=f"[GBN-Receiver] Written seq={seq}")
+            self.expected_seq += 1
+            self._save_progress(f)
+        else:
+            Logger.debug(who=self.sock.getsockname(), message=f"[GBN-Receiver] Discarded seq={seq}, expected {self.expected_seq}")
+        # Fuera de orden o duplicado: ACK repetido en el acto para que el emisor vuelva atrás
+        immediate = not in_order or self.packetizer.extract_flags(packet) & self.packetizer.FLAG_ACK_NOW
+        if self.ack_policy.on_packet(self.packetizer.extract_timestamp(packet), immediate):
+            self._send_ack(addr)
+
+    def _send_ack(self, addr):
+        timestamp = self.ack_policy.on_ack_sent()
+        self.sock.sendto(self.packetizer.make_ack_packet(self.expected_seq, timestamp), addr)
+        Logger.debug(who=self.sock.getsockname(), message=f"[GBN-Receiver] Sent ACK next={self.expected_seq}")
+
+    def _save_progress(self, f, final=False):
+        if self.resume is None or not (final or self.resume.due()):
+            return
+        if final and not self.running:
+            ResumeState.discard(self.output_path)
+            return
+        # El estado no puede anunciar chunks que siguen en el buffer de Python
+        f.flush()
+        self.resume.record(self.chunk_size, self.expected_seq)
+        self.resume.save(self.output_path)
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        Logger.debug(message=f"[GBN-Receiver] Socket closed for {self.output_path}")
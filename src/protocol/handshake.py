@@ -1,27 +1,61 @@
 # protocol/handshake.py
 import socket
+import time
+from urllib.parse import quote, unquote
 from protocol.connection_socket import ConnectionSocket
+from protocol.multiplexer import ConnectionIdSocket, MUX_HEADER
+from protocol.codec import WireCodec, CodecPacketizer, make_packetizer
+from protocol.pmtu import PathMtuProbe
+from protocol.rtt_estimator import RttEstimator
 from utils import Logger, ConnectionConfig
 
 class Handshake:
     @staticmethod
-    def client(server_addr=('localhost',8080), mode='download', filename='file.file'):
+    def encode(prefix, mode, filename, options=None):
+        """
+        <prefix>:<mode>:<filename>[:<clave>=<valor>]*
+        Las opciones negociadas viajan al final; los valores van escapados.
+        """
+        fields = [prefix, mode, filename]
+        fields += [f"{key}={quote(str(value), safe='')}" for key, value in (options or {}).items()]
+        return ':'.join(fields).encode()
+
+    @staticmethod
+    def decode(msg):
+        prefix, mode, filename, *extra = msg.decode().split(':')
+        options = {}
+        for field in extra:
+            key, value = field.split('=', 1)
+            options[key] = unquote(value)
+        return prefix, mode, filename, options
+
+    @staticmethod
+    def client(server_addr=('localhost',8080), mode='download', filename='file.file', options=None, probe_mtu=False):
         """
         mode: 'upload' (cliente envía al servidor) o 'download' (cliente recibe del servidor)
+        options: parámetros propuestos al servidor; los acordados quedan en conn.options
+        probe_mtu: sondear el camino y bajar el chunk acordado al mayor que no se fragmenta
         """
         skt = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         skt.bind(('',0))
-        skt.settimeout(ConnectionConfig.TIMEOUT)
         own = skt.getsockname()
+        rtt = RttEstimator()
         Logger.debug(who=own, message=f"Client handshake to {server_addr} with mode '{mode}' and filename '{filename}'")
 
-        msg = f"LOGIN:{mode}:{filename}".encode()
+        # Se propone el formato binario para los datos; el servidor puede no aceptarlo
+        options = dict(options or {}, wire=WireCodec.VERSION)
+        msg = Handshake.encode("LOGIN", mode, filename, options)
         for i in range(ConnectionConfig.MAX_RETRIES):
-            Logger.debug(who=own, message=f"Sending {msg!r} to {server_addr} (try {i+1})")
+            Logger.debug(who=own, message=f"Sending {msg!r} to {server_addr} (try {i+1}, rto {rtt.rto:.3f}s)")
+            skt.settimeout(rtt.rto)
+            sent_at = time.monotonic()
             skt.sendto(msg, server_addr)
             try:
                 resp, data_addr = skt.recvfrom(1024)
-                prefix, agreed_mode, agreed_filename = resp.decode().split(':')
+                # Karn: solo se mide el RTT si el LOGIN no fue retransmitido
+                if i == 0:
+                    rtt.on_sample(time.monotonic() - sent_at)
+                prefix, agreed_mode, agreed_filename, agreed_options = Handshake.decode(resp)
 
                 if prefix != "ACK":
                     continue
@@ -32,10 +66,27 @@ class Handshake:
                     raise Exception(f"Inconsistent filename. recieved '{agreed_filename}' instead of '{filename}'")
                 skt.close()
                 conn = ConnectionSocket(data_addr, own)
+                conn.rtt = rtt
+                conn.options = agreed_options
+                # Desde acá el control va en el formato acordado (ALL:OK, sondas, FIN)
+                packetizer = make_packetizer(agreed_options)
+                header_size = packetizer.HEADER_SIZE
+                if "cid" in agreed_options:
+                    # Servidor de un solo puerto: todo lo que sigue lleva el connection ID;
+                    # el codec lo trae en su cabecera y no suma la de multiplexado
+                    conn.socket = ConnectionIdSocket(conn.socket, int(agreed_options["cid"]))
+                    if not isinstance(packetizer, CodecPacketizer):
+                        header_size += MUX_HEADER.size
+                confirmed = {}
+                if probe_mtu and "chunk" in agreed_options:
+                    probe = PathMtuProbe(conn.socket, data_addr, rtt.rto, header_size, packetizer)
+                    confirmed["chunk"] = probe.probe(int(agreed_options["chunk"]))
+                    conn.options["chunk"] = str(confirmed["chunk"])
                 # confirm final
-                conn.send(b"ALL:OK")
+                conn.send(packetizer.make_confirm_packet(confirmed))
                 return conn, agreed_mode, agreed_filename
             except socket.timeout:
+                rtt.on_timeout()
                 Logger.debug(who=own, message="Timeout waiting ACK, retrying…")
             except Exception as e:
                 Logger.error(who=own, message=f"{e}")
@@ -44,34 +95,77 @@ class Handshake:
         raise Exception("Handshake failed (no ACK)")
 
     @staticmethod
-    def server(own_addr=('localhost',8080), client_addr=None, login_msg=b''):
+    def server(own_addr=('localhost',8080), client_addr=None, login_msg=b'', negotiate=None, mux=None):
         Logger.debug(f"Loggin msg recibido: {login_msg!r} from {client_addr}")
         """
         Devuelve (ConnectionSocket, mode) o lanza.
+        negotiate(mode, filename, options) decide las opciones acordadas, que
+        quedan en conn.options; por defecto se aceptan las del cliente.
+        mux: ConnectionMultiplexer del servidor de un solo puerto; la conexión usa
+        el socket de escucha y el cliente recibe su connection ID en la opción 'cid'.
         """
         Logger.debug(who=own_addr, message=f"server handshake from {client_addr} with {login_msg!r}")
         # login_msg == b"LOGIN:<mode>"
         try:
-            text = login_msg.decode()
-            prefix, mode, filename = text.split(':')
+            prefix, mode, filename, options = Handshake.decode(login_msg)
 
             if prefix!='LOGIN' or mode not in ('upload','download'):
                 raise
         except:
             raise Exception(f"Bad handshake msg {login_msg!r}")
 
-        # abrimos nuevo socket efímero
-        conn = ConnectionSocket(client_addr)
-        # devolvemos ACK:<mode>
-        ack = f"ACK:{mode}:{filename}".encode()
-        Logger.debug(who=conn.source_address, message=f"Sending {ack!r} to {client_addr}")
-        conn.send(ack)
+        if negotiate:
+            options = negotiate(mode, filename, options)
+
+        if mux:
+            # La conexión comparte el socket de escucha; el ACK sale sin cabecera
+            # porque el cliente todavía no conoce su connection ID
+            conn = ConnectionSocket(client_addr, sock=mux.open(client_addr))
+            options = dict(options, cid=conn.socket.cid)
+
+            def send_ack(data):
+                mux.sock.sendto(data, client_addr)
+        else:
+            # abrimos nuevo socket efímero
+            conn = ConnectionSocket(client_addr)
+            send_ack = conn.send
+        conn.options = options
+        try:
+            # devolvemos ACK:<mode>
+            ack = Handshake.encode("ACK", mode, filename, options)
+            Logger.debug(who=conn.source_address, message=f"Sending {ack!r} to {client_addr}")
+            sent_at = time.monotonic()
+            send_ack(ack)
 
-        # ahora recibimos el ALL:OK
-        resp = conn.get_message()
-        if resp!=b"ALL:OK":
-            conn.close()
-            raise Exception(f"Expected ALL:OK, got {resp!r}")
+            # ahora recibimos el ALL:OK, respondiendo antes las sondas de MTU si las hay;
+            # ya en el formato acordado, como todo lo que sigue del lado del cliente
+            packetizer = conn.packetizer
+            bufsize = ConnectionConfig.MAX_CHUNK_SIZE + CodecPacketizer.HEADER_SIZE
+            resp = conn.get_message(bufsize=bufsize)
+            while packetizer.is_probe(resp) or resp == login_msg:
+                if resp == login_msg:
+                    # El cliente no recibió el ACK y repitió el LOGIN
+                    send_ack(ack)
+                    sent_at = None
+                else:
+                    PathMtuProbe.answer(conn.socket, resp, client_addr, packetizer)
+                resp = conn.get_message(bufsize=bufsize)
+            confirmed = packetizer.extract_confirm(resp)
+            if confirmed is None:
+                conn.close()
+                raise Exception(f"Expected ALL:OK, got {resp[:64]!r}")
+            # El cliente solo puede achicar el chunk acordado, nunca agrandarlo
+            if "chunk" in confirmed and "chunk" in options:
+                conn.options["chunk"] = str(min(int(confirmed["chunk"]), int(options["chunk"])))
+        except Exception:
+            # Sin ALL:OK la conexión no existe: con mux, un LOGIN posterior del mismo par
+            # iría a esta cola muerta si no se la saca de la tabla
+            if conn.socket is not None:
+                conn.socket.close()
+            raise
+        # Karn: solo se mide si el ACK no se reenvió
+        if sent_at is not None:
+            conn.rtt.on_sample(time.monotonic() - sent_at)
         
         Logger.debug(f"Handshake server enviando conn, mode, filename: {conn}, {mode}, {filename}")
         return conn, mode, filename
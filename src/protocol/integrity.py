@@ -0,0 +1,102 @@
+# protocol/integrity.py
+import hashlib
+import hmac
+import os
+import zlib
+from protocol.exchange import Exchange, PENDING
+from utils.connection_config import ConnectionConfig
+from utils.logger import Logger
+
+
+class IntegrityError(Exception):
+    pass
+
+
+class Crc32:
+    """zlib.crc32 con la interfaz de hashlib: detecta corrupción accidental a varios GB/s."""
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def digest(self) -> bytes:
+        return self.value.to_bytes(4, byteorder='big')
+
+
+class StreamDigest:
+    """
+    Hash incremental del archivo en orden de seq. El emisor lo alimenta con cada chunk
+    la primera vez que lo manda y el receptor a medida que crece el prefijo contiguo
+    escrito, así ninguno de los dos vuelve a leer el archivo al terminar. Conviene pasarle
+    rangos grandes: hashlib y zlib sueltan el GIL y el hash corre a la par de los otros hilos.
+    """
+    def __init__(self, algorithm: str = None):
+        algorithm = ConnectionConfig.DIGEST if algorithm is None else algorithm
+        if not algorithm:
+            self.hash = None
+        elif algorithm == "crc32":
+            self.hash = Crc32()
+        else:
+            self.hash = hashlib.new(algorithm)
+
+    def update(self, data):
+        if self.hash is not None:
+            self.hash.update(data)
+
+    def digest(self) -> bytes:
+        return self.hash.digest() if self.hash is not None else b''
+
+    def matches(self, remote) -> bool:
+        # Si alguno de los dos lados no calculó digest no hay nada que comparar
+        if not remote or self.hash is None:
+            return True
+        return hmac.compare_digest(bytes(remote), self.digest())
+
+
+class TermExchange(Exchange):
+    """
+    TERM con el digest del emisor hasta que el receptor conteste TERM_ACK con su
+    veredicto. Devuelve True si coincidieron, None si no llegó respuesta, y lanza
+    IntegrityError si el receptor calculó otro digest.
+    """
+    description = "Sending TERM"
+
+    def __init__(self, packetizer, dest: tuple, rtt, digest: StreamDigest):
+        super().__init__(packetizer.make_terminate_packet(digest.digest()), dest, rtt)
+        self.packetizer = packetizer
+
+    def on_reply(self, packet):
+        if self.packetizer.is_terminate_ack(packet):
+            return check_verdict(self.packetizer.extract_verdict(packet), self.dest)
+        if self.packetizer.is_fin(packet):
+            # El receptor ya está cerrando: respondió TERM pero se perdió el TERM_ACK
+            Logger.error(who=self.who, message=f"Peer {self.dest} closed before confirming the digest")
+            return None
+        return PENDING
+
+    def give_up(self):
+        Logger.error(who=self.who, message=f"Peer {self.dest} never confirmed the digest")
+        return None
+
+
+def terminate(sock, dest: tuple, packetizer, recv_packet, rtt, digest: StreamDigest):
+    return TermExchange(packetizer, dest, rtt, digest).run(sock, recv_packet)
+
+
+def check_verdict(ok: bool, dest: tuple) -> bool:
+    if not ok:
+        raise IntegrityError(f"Peer {dest} reports a digest mismatch: the file arrived corrupted")
+    return True
+
+
+def check_received(path: str, verified: bool, offset: int = None):
+    """
+    Un archivo que no coincide con el del emisor no se deja como si estuviera completo.
+    Si se recibió solo un rango (desde offset) el archivo es compartido: lo borra quien lo armó.
+    """
+    if verified is False:
+        if offset is not None:
+            raise IntegrityError(f"Digest mismatch for the range at {offset} of {path}")
+        os.remove(path)
+        raise IntegrityError(f"Digest mismatch for {path}: file removed")
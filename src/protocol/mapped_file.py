@@ -0,0 +1,47 @@
+# protocol/mapped_file.py
+import mmap
+import os
+
+
+class MappedFile:
+    """
+    Archivo de origen mapeado en memoria y dividido en chunks de tamaño fijo.
+    chunk(seq) devuelve un memoryview sobre el mapeo: el payload llega al
+    sendmsg sin copiarse en Python, y el kernel lo lee de la page cache.
+    Con offset/length se ve solo ese rango del archivo: el chunk 0 empieza en offset.
+    """
+    def __init__(self, path: str, chunk_size: int, offset: int = 0, length: int = None):
+        self.chunk_size = chunk_size
+        self.file = open(path, 'rb')
+        file_size = os.fstat(self.file.fileno()).st_size
+        offset = min(offset, file_size)
+        self.size = file_size - offset if length is None else min(length, file_size - offset)
+        self.total = (self.size + chunk_size - 1) // chunk_size
+        # mmap no acepta archivos vacíos
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if file_size else None
+        self.mapped = memoryview(self.map) if self.map is not None else memoryview(b'')
+        self.view = self.mapped[offset:offset + self.size]
+        if hasattr(self.map, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+            self.map.madvise(mmap.MADV_SEQUENTIAL)
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def chunk(self, seq: int) -> memoryview:
+        offset = seq * self.chunk_size
+        return self.view[offset:offset + self.chunk_size]
+
+    def range(self, start: int, end: int) -> memoryview:
+        """Los chunks [start, end) como una sola vista contigua."""
+        return self.view[start * self.chunk_size:end * self.chunk_size]
+
+    def close(self):
+        self.view.release()
+        self.mapped.release()
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                # Queda algún chunk referenciado: el mapeo se libera cuando se suelte
+                pass
+        self.file.close()
@@ -0,0 +1,189 @@
+# protocol/multiplexer.py
+import queue
+import random
+import socket
+import struct
+import threading
+from protocol.codec import WireCodec
+from protocol.udp_offload import BatchReceiver, tune_socket_buffers
+from utils import Logger, ConnectionConfig
+
+# Cabecera de multiplexado: marca (1) + connection ID (4). La marca 0x00 no es el
+# primer byte de ningún otro mensaje (tipos de paquete 1..5, WireCodec o texto del handshake).
+MUX_MARKER = 0x00
+MUX_HEADER = struct.Struct('!BI')
+
+
+def frame(cid: int, payload: bytes) -> bytes:
+    return MUX_HEADER.pack(MUX_MARKER, cid) + payload
+
+
+def unframe(data: bytes) -> tuple:
+    """Devuelve (cid, payload), o (None, data) si el datagrama no está multiplexado."""
+    if len(data) >= MUX_HEADER.size and data[0] == MUX_MARKER:
+        _, cid = MUX_HEADER.unpack_from(data)
+        return cid, data[MUX_HEADER.size:]
+    return None, data
+
+
+def tag(cid: int, payload: bytes) -> bytes:
+    """Lo que sale por el puerto compartido: un mensaje del codec ya lleva su connection ID."""
+    return payload if WireCodec.connection_id(payload) is not None else frame(cid, payload)
+
+
+def untag(data: bytes) -> tuple:
+    """(cid, payload) de lo que llega al puerto compartido, del codec o de la cabecera de multiplexado."""
+    cid = WireCodec.connection_id(data)
+    return (cid, data) if cid is not None else unframe(data)
+
+
+class MuxSocket:
+    """
+    La vista de una conexión sobre el socket compartido del servidor: sendto agrega
+    la cabecera con su connection ID (si el codec no lo trae) y recvfrom lee de la cola que llena el despachador.
+    Tiene la misma interfaz que un socket UDP para los motores SW/SR. La cola es acotada:
+    si el motor se atrasa lo que no entra se pierde, y lo recupera su retransmisión.
+    """
+    def __init__(self, mux, cid: int, peer: tuple):
+        self.mux = mux
+        self.cid = cid
+        self.peer = peer
+        self.queue = queue.Queue(maxsize=ConnectionConfig.MUX_QUEUE_SIZE)
+        self.timeout = None
+
+    def deliver(self, data, addr) -> bool:
+        """Lo usa el despachador: nunca se bloquea, con la cola llena descarta."""
+        try:
+            self.queue.put_nowait((data, addr))
+            return True
+        except queue.Full:
+            return False
+
+    def sendto(self, data, addr):
+        self.mux.sock.sendto(tag(self.cid, data), addr)
+
+    def recvfrom(self, bufsize):
+        try:
+            return self.queue.get(timeout=self.timeout)
+        except queue.Empty:
+            raise socket.timeout()
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def getsockname(self):
+        return self.mux.sock.getsockname()
+
+    def close(self):
+        self.mux.unregister(self)
+
+
+class ConnectionMultiplexer:
+    """
+    Un solo hilo lee el socket de escucha y reparte: los datagramas con connection ID
+    (en la cabecera del codec o en la de multiplexado) van a la cola de su MuxSocket, los LOGIN de clientes nuevos a la cola de aceptación.
+    Un LOGIN repetido de un cliente que ya tiene conexión va a esa conexión, para que el
+    handshake reenvíe el ACK en lugar de abrir otra. El connection ID no alcanza para
+    entregar: el datagrama tiene que venir del par de la conexión, así otro host que
+    adivine un ID no puede meter datos en una transferencia ajena.
+    """
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.connections = {}
+        self.by_peer = {}
+        self.logins = queue.Queue()
+        self.lock = threading.Lock()
+        self.running = True
+        # Todas las conexiones comparten este socket: se le da el buffer máximo
+        tune_socket_buffers(sock, ConnectionConfig.MAX_SOCKET_BUFFER)
+        self.receiver = BatchReceiver(sock, 65535)
+        self.thread = threading.Thread(target=self._run, name="mux-dispatcher", daemon=True)
+        self.thread.start()
+
+    def open(self, peer: tuple) -> MuxSocket:
+        with self.lock:
+            cid = random.getrandbits(32)
+            while cid in self.connections:
+                cid = random.getrandbits(32)
+            conn = MuxSocket(self, cid, peer)
+            self.connections[cid] = conn
+            self.by_peer[peer] = conn
+        Logger.debug(who=self.sock.getsockname(), message=f"Mux open cid={cid:#010x} for {peer}")
+        return conn
+
+    def unregister(self, conn: MuxSocket):
+        with self.lock:
+            self.connections.pop(conn.cid, None)
+            if self.by_peer.get(conn.peer) is conn:
+                del self.by_peer[conn.peer]
+
+    def accept(self, timeout: float):
+        """Próximo LOGIN nuevo como (data, addr), o None si no llegó ninguno."""
+        try:
+            return self.logins.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _run(self):
+        while self.running:
+            try:
+                packets, addr = self.receiver.recv()
+            except socket.timeout:
+                continue
+            except OSError:
+                # El socket de escucha se cerró: se termina el despachador
+                break
+            # Los paquetes se encolan para otros hilos: se copian fuera del buffer del receptor
+            for data in packets:
+                self._dispatch(bytes(data), addr)
+
+    def _dispatch(self, data, addr):
+        cid, payload = untag(data)
+        with self.lock:
+            conn = self.connections.get(cid) if cid is not None else self.by_peer.get(addr)
+        if conn is not None and conn.peer != addr:
+            Logger.debug(who=self.sock.getsockname(), message=f"Mux dropped datagram for cid={conn.cid:#010x} from {addr}, not its peer")
+        elif conn is not None:
+            if not conn.deliver(payload, addr):
+                Logger.debug(who=self.sock.getsockname(), message=f"Mux queue full for cid={conn.cid:#010x}, datagram dropped")
+        elif cid is None:
+            self.logins.put((data, addr))
+        else:
+            Logger.debug(who=self.sock.getsockname(), message=f"Mux dropped datagram for unknown cid={cid:#010x} from {addr}")
+
+    def stop(self):
+        # El despachador sale en su próximo timeout; hasta entonces retiene el puerto
+        self.running = False
+        self.thread.join()
+
+
+class ConnectionIdSocket:
+    """
+    Lado cliente: envuelve su socket UDP agregando y quitando la cabecera con el
+    connection ID. Los mensajes del codec salen tal cual: ya lo llevan.
+    """
+    def __init__(self, sock: socket.socket, cid: int):
+        self.sock = sock
+        self.cid = cid
+
+    def sendto(self, data, addr):
+        self.sock.sendto(tag(self.cid, data), addr)
+
+    def recvfrom(self, bufsize):
+        data, addr = self.sock.recvfrom(bufsize + MUX_HEADER.size)
+        return unframe(data)[1], addr
+
+    def settimeout(self, timeout):
+        self.sock.settimeout(timeout)
+
+    def getsockname(self):
+        return self.sock.getsockname()
+
+    def getsockopt(self, *args):
+        return self.sock.getsockopt(*args)
+
+    def setsockopt(self, *args):
+        self.sock.setsockopt(*args)
+
+    def close(self):
+        self.sock.close()
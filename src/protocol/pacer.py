@@ -0,0 +1,58 @@
+import threading
+import time
+
+RATE_SUFFIXES = {'': 1, 'K': 10**3, 'M': 10**6, 'G': 10**9}
+
+
+def parse_rate(text: str) -> float:
+    """'500K', '10M', '1.5G' -> bytes por segundo (para usar como type= de argparse)."""
+    text = text.strip().upper().removesuffix('B')
+    suffix = text[-1:] if text[-1:] in RATE_SUFFIXES else ''
+    try:
+        rate = float(text[:len(text) - len(suffix)]) * RATE_SUFFIXES[suffix]
+    except ValueError:
+        raise ValueError(f"Invalid rate '{text}'")
+    if rate <= 0:
+        raise ValueError(f"Rate must be positive, got '{text}'")
+    return rate
+
+
+class TokenBucketPacer:
+    """
+    Token bucket en bytes: se acumulan `rate` bytes por segundo hasta `burst`.
+    delay(n) descuenta n bytes y devuelve cuánto esperar antes del próximo envío,
+    de modo que los paquetes se reparten en el tiempo en lugar de salir en ráfaga.
+    Con rate None no se limita nada.
+    """
+    def __init__(self, rate: float = None, burst: int = 8192):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def set_rate(self, rate: float):
+        with self.lock:
+            self._refill()
+            self.rate = rate
+
+    def delay(self, nbytes: int) -> float:
+        with self.lock:
+            if self.rate is None:
+                return 0.0
+            self._refill()
+            self.tokens -= nbytes
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def wait(self, nbytes: int):
+        delay = self.delay(nbytes)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate is not None:
+            self.tokens = min(float(self.burst), self.tokens + (now - self.last) * self.rate)
+        self.last = now
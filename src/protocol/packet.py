@@ -1,25 +1,60 @@
+import struct
+from urllib.parse import quote, unquote
 from abc import ABC, abstractmethod
 
 class Packetizer(ABC):
     @abstractmethod
-    def make_data_packet(self, seq: int, data: bytes) -> bytes:
+    def make_data_packet(self, seq: int, data: bytes, timestamp: int = 0, flags: int = 0) -> bytes:
         pass
 
     @abstractmethod
-    def make_ack_packet(self, seq: int) -> bytes:
+    def pack_data_header(self, buffer, offset: int, seq: int, timestamp: int = 0, flags: int = 0):
         pass
 
     @abstractmethod
-    def make_terminate_packet(self) -> bytes:
+    def make_ack_packet(self, seq: int, timestamp: int = 0) -> bytes:
+        pass
+
+    @abstractmethod
+    def make_sack_packet(self, cum_ack: int, blocks: list, timestamp: int = 0, window: int = 0) -> bytes:
+        pass
+
+    @abstractmethod
+    def make_terminate_packet(self, digest: bytes = b'') -> bytes:
+        pass
+
+    @abstractmethod
+    def make_terminate_ack_packet(self, ok: bool) -> bytes:
         pass
 
     @abstractmethod
     def is_ack(self, packet: bytes) -> bool:
         pass
 
+    @abstractmethod
+    def is_sack(self, packet: bytes) -> bool:
+        pass
+
+    @abstractmethod
+    def extract_sack(self, packet: bytes) -> tuple:
+        pass
+
+    @abstractmethod
+    def extract_window(self, packet: bytes) -> int:
+        pass
+
     @abstractmethod
     def extract_seq(self, packet: bytes) -> int:
         pass
+
+    @abstractmethod
+    def extract_timestamp(self, packet: bytes) -> int:
+        pass
+
+    @abstractmethod
+    def extract_flags(self, packet: bytes) -> int:
+        pass
+
     @abstractmethod
     def is_data(self, packet: bytes) -> bool:
         pass
@@ -32,32 +67,222 @@ class Packetizer(ABC):
     def is_terminate(self, packet: bytes) -> bool:
         pass
 
+    @abstractmethod
+    def extract_digest(self, packet: bytes) -> bytes:
+        pass
+
+    @abstractmethod
+    def is_terminate_ack(self, packet: bytes) -> bool:
+        pass
+
+    @abstractmethod
+    def extract_verdict(self, packet: bytes) -> bool:
+        pass
+
+    # Control después de la negociación: confirmación, sondas de MTU y cierre
+    @abstractmethod
+    def make_confirm_packet(self, options: dict = None) -> bytes:
+        pass
+
+    @abstractmethod
+    def extract_confirm(self, packet: bytes):
+        pass
+
+    @abstractmethod
+    def make_probe_packet(self, size: int) -> bytes:
+        pass
+
+    @abstractmethod
+    def is_probe(self, packet: bytes) -> bool:
+        pass
+
+    @abstractmethod
+    def make_probe_ack_packet(self, size: int) -> bytes:
+        pass
+
+    @abstractmethod
+    def extract_probe_ack(self, packet: bytes):
+        pass
+
+    @abstractmethod
+    def make_fin_packet(self) -> bytes:
+        pass
+
+    @abstractmethod
+    def is_fin(self, packet: bytes) -> bool:
+        pass
+
+    @abstractmethod
+    def make_fin_ack_packet(self) -> bytes:
+        pass
+
+    @abstractmethod
+    def is_fin_ack(self, packet: bytes) -> bool:
+        pass
+
 class DefaultPacketizer(Packetizer):
 
     TYPE_DATA = 0x01
     TYPE_ACK = 0x02
     TYPE_TERM = 0x03
+    TYPE_SACK = 0x04
+    TYPE_TERM_ACK = 0x05
+
+    # Los mensajes de control de este formato son texto
+    CONFIRM = b"ALL:OK"
+    PROBE = b"PROBE:"
+    PROBE_ACK = b"PROBE:OK:"
+    FIN = b"FIN"
+    FIN_ACK = b"ACKFIN"
+
+    # Cantidad máxima de rangos [start, end) que entran en un SACK
+    MAX_SACK_BLOCKS = 32
+
+    # El emisor pide que este paquete se confirme sin demora (ventana llena, fin de ráfaga)
+    FLAG_ACK_NOW = 0x01
+    # El payload viaja comprimido con el algoritmo acordado en el handshake
+    FLAG_COMPRESSED = 0x02
+
+    # ACK/SACK: type (1) + seq (4) + timestamp (4)
+    ACK_HEADER_SIZE = 9
+    # DATA: type (1) + seq (4) + timestamp (4) + flags (1)
+    HEADER_SIZE = 10
+    DATA_HEADER = struct.Struct('!BIIB')
+    # SACK: ACK header + ventana anunciada (4) + cantidad de bloques (1)
+    SACK_HEADER_SIZE = 14
 
-    def make_data_packet(self, seq, data):
-        return bytes([self.TYPE_DATA]) + seq.to_bytes(4, byteorder='big') + data
+    # El timestamp de DATA lo pone el emisor; ACK y SACK devuelven (eco)
+    # el del paquete que los generó. 0 significa 'sin timestamp'.
+    def make_data_packet(self, seq, data, timestamp=0, flags=0):
+        return self.DATA_HEADER.pack(self.TYPE_DATA, seq, timestamp, flags) + data
 
-    def make_ack_packet(self, seq):
-        return bytes([self.TYPE_ACK]) + seq.to_bytes(4, byteorder='big')
+    def pack_data_header(self, buffer, offset, seq, timestamp=0, flags=0):
+        """Escribe la cabecera DATA en buffer[offset:offset + HEADER_SIZE], para enviarla junto al payload sin concatenar."""
+        self.DATA_HEADER.pack_into(buffer, offset, self.TYPE_DATA, seq, timestamp, flags)
 
-    def make_terminate_packet(self):
-        return bytes([self.TYPE_TERM])
+    def make_ack_packet(self, seq, timestamp=0):
+        return bytes([self.TYPE_ACK]) + seq.to_bytes(4, byteorder='big') + timestamp.to_bytes(4, byteorder='big')
+
+    def make_sack_packet(self, cum_ack, blocks, timestamp=0, window=0):
+        """
+        cum_ack: próximo seq esperado (todo lo anterior fue recibido)
+        blocks: rangos [start, end) recibidos por encima de cum_ack
+        window: paquetes que el receptor todavía puede guardar en su buffer
+        """
+        blocks = blocks[:self.MAX_SACK_BLOCKS]
+        packet = bytearray([self.TYPE_SACK])
+        packet += cum_ack.to_bytes(4, byteorder='big')
+        packet += timestamp.to_bytes(4, byteorder='big')
+        packet += window.to_bytes(4, byteorder='big')
+        packet.append(len(blocks))
+        for start, end in blocks:
+            packet += start.to_bytes(4, byteorder='big')
+            packet += end.to_bytes(4, byteorder='big')
+        return bytes(packet)
+
+    # TERM: type (1) + digest del emisor; TERM_ACK: type (1) + veredicto (1)
+    def make_terminate_packet(self, digest=b''):
+        return bytes([self.TYPE_TERM]) + digest
+
+    def make_terminate_ack_packet(self, ok):
+        return bytes([self.TYPE_TERM_ACK, 1 if ok else 0])
 
     def is_ack(self, packet):
         return bool(packet) and packet[0] == self.TYPE_ACK
 
+    def is_sack(self, packet):
+        return bool(packet) and packet[0] == self.TYPE_SACK and len(packet) >= self.SACK_HEADER_SIZE
+
+    def extract_sack(self, packet):
+        cum_ack = int.from_bytes(packet[1:5], byteorder='big')
+        blocks = []
+        offset = self.SACK_HEADER_SIZE
+        # La cantidad viene del paquete: un SACK cortado no puede leer más allá del final
+        count = min(packet[self.SACK_HEADER_SIZE - 1], (len(packet) - self.SACK_HEADER_SIZE) // 8)
+        for _ in range(count):
+            start = int.from_bytes(packet[offset:offset + 4], byteorder='big')
+            end = int.from_bytes(packet[offset + 4:offset + 8], byteorder='big')
+            blocks.append((start, end))
+            offset += 8
+        return cum_ack, blocks
+
+    def extract_window(self, packet):
+        return int.from_bytes(packet[9:13], byteorder='big')
+
     def extract_seq(self, packet):
         return int.from_bytes(packet[1:5], byteorder='big') if len(packet) > 1 else None
 
+    def extract_timestamp(self, packet):
+        return int.from_bytes(packet[5:9], byteorder='big') if len(packet) >= self.ACK_HEADER_SIZE else 0
+
+    def extract_flags(self, packet):
+        return packet[9] if len(packet) >= self.HEADER_SIZE else 0
+
     def is_data(self, packet):
-        return bool(packet) and packet[0] == self.TYPE_DATA and len(packet) > 5
+        return bool(packet) and packet[0] == self.TYPE_DATA and len(packet) > self.HEADER_SIZE
 
     def extract_data(self, packet):
-        return packet[5:]
+        return packet[self.HEADER_SIZE:]
 
     def is_terminate(self, packet):
-        return bool(packet) and packet[0] == self.TYPE_TERM
\ No newline at end of file
+        return bool(packet) and packet[0] == self.TYPE_TERM
+
+    def extract_digest(self, packet):
+        return bytes(packet[1:])
+
+    def is_terminate_ack(self, packet):
+        return len(packet) >= 2 and packet[0] == self.TYPE_TERM_ACK
+
+    def extract_verdict(self, packet):
+        return bool(packet[1])
+
+    def make_confirm_packet(self, options=None):
+        """ALL:OK[:<clave>=<valor>]*: el cliente puede ajustar opciones acordadas (p. ej. tras sondear el MTU)."""
+        fields = [self.CONFIRM.decode()]
+        fields += [f"{key}={quote(str(value), safe='')}" for key, value in (options or {}).items()]
+        return ':'.join(fields).encode()
+
+    def extract_confirm(self, packet):
+        """Devuelve las opciones de un ALL:OK, o None si el mensaje no es una confirmación."""
+        prefix, _, rest = bytes(packet).partition(self.CONFIRM)
+        if prefix or (rest and not rest.startswith(b":")):
+            return None
+        options = {}
+        for field in rest.decode().split(':')[1:]:
+            key, value = field.split('=', 1)
+            options[key] = unquote(value)
+        return options
+
+    # PROBE:<largo>: con relleno hasta largo bytes; el par contesta PROBE:OK:<largo recibido>
+    def make_probe_packet(self, size):
+        header = self.PROBE + str(size).encode() + b":"
+        return header + bytes(size - len(header))
+
+    def is_probe(self, packet):
+        return bytes(packet[:len(self.PROBE_ACK)]).startswith(self.PROBE) and not self.is_probe_ack(packet)
+
+    def is_probe_ack(self, packet):
+        return bytes(packet[:len(self.PROBE_ACK)]) == self.PROBE_ACK
+
+    def make_probe_ack_packet(self, size):
+        return self.PROBE_ACK + str(size).encode()
+
+    def extract_probe_ack(self, packet):
+        if not self.is_probe_ack(packet):
+            return None
+        try:
+            return int(bytes(packet[len(self.PROBE_ACK):]))
+        except ValueError:
+            return None
+
+    def make_fin_packet(self):
+        return self.FIN
+
+    def is_fin(self, packet):
+        return packet == self.FIN
+
+    def make_fin_ack_packet(self):
+        return self.FIN_ACK
+
+    def is_fin_ack(self, packet):
+        return packet == self.FIN_ACK
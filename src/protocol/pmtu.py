@@ -0,0 +1,89 @@
+# protocol/pmtu.py
+import errno
+import socket
+import sys
+from utils import Logger, ConnectionConfig
+
+# Python no expone estas constantes en todas las plataformas; en Linux valen esto
+IP_MTU_DISCOVER = getattr(socket, 'IP_MTU_DISCOVER', 10 if sys.platform.startswith('linux') else None)
+IP_PMTUDISC_DO = getattr(socket, 'IP_PMTUDISC_DO', 2)
+
+# Cabeceras IPv4 (20) + UDP (8)
+IP_UDP_OVERHEAD = 28
+
+
+class PathMtuProbe:
+    """
+    Descubre el chunk más grande que llega al par sin fragmentarse.
+    Se mandan sondas con DF de tamaño creciente (un datagrama DATA completo para
+    cada MTU candidato) y el par responde con el largo de las que recibe. Las sondas
+    van en el formato acordado en el handshake (el packetizer de la conexión).
+    La primera que se pierde o que el kernel rechaza con EMSGSIZE corta la búsqueda.
+    Donde no se puede poner DF las sondas igual detectan pérdidas por tamaño.
+    """
+    TRIES = 2
+
+    def __init__(self, sock: socket.socket, peer: tuple, timeout: float, header_size: int, packetizer):
+        self.sock = sock
+        self.peer = peer
+        self.timeout = timeout
+        self.header_size = header_size
+        self.packetizer = packetizer
+
+    def chunk_for_mtu(self, mtu: int) -> int:
+        return mtu - IP_UDP_OVERHEAD - self.header_size
+
+    def probe(self, max_chunk: int) -> int:
+        """Devuelve el chunk acordado: el de la mayor sonda confirmada, o CHUNK_SIZE si ninguna."""
+        candidates = [self.chunk_for_mtu(mtu) for mtu in ConnectionConfig.PMTU_CANDIDATES]
+        candidates = sorted({c for c in candidates if c < max_chunk} | {max_chunk})
+        best = None
+        previous = self._set_dont_fragment()
+        try:
+            for chunk in candidates:
+                if not self._probe_size(chunk + self.header_size):
+                    break
+                best = chunk
+        finally:
+            self._restore_fragment(previous)
+        chunk = best or min(max_chunk, ConnectionConfig.CHUNK_SIZE)
+        Logger.debug(who=self.sock.getsockname(), message=f"PMTU probe to {self.peer}: chunk {chunk}")
+        return chunk
+
+    def _probe_size(self, size: int) -> bool:
+        probe = self.packetizer.make_probe_packet(size)
+        self.sock.settimeout(self.timeout)
+        for _ in range(self.TRIES):
+            try:
+                self.sock.sendto(probe, self.peer)
+            except OSError as e:
+                if e.errno == errno.EMSGSIZE:
+                    # El kernel ya sabe que el camino no soporta este tamaño
+                    return False
+                raise
+            try:
+                while True:
+                    data, addr = self.sock.recvfrom(1024)
+                    if addr == self.peer and self.packetizer.extract_probe_ack(data) == size:
+                        return True
+            except socket.timeout:
+                continue
+        return False
+
+    def _set_dont_fragment(self):
+        if IP_MTU_DISCOVER is None:
+            return None
+        try:
+            previous = self.sock.getsockopt(socket.IPPROTO_IP, IP_MTU_DISCOVER)
+            self.sock.setsockopt(socket.IPPROTO_IP, IP_MTU_DISCOVER, IP_PMTUDISC_DO)
+            return previous
+        except OSError:
+            return None
+
+    def _restore_fragment(self, previous):
+        if previous is not None:
+            self.sock.setsockopt(socket.IPPROTO_IP, IP_MTU_DISCOVER, previous)
+
+    @staticmethod
+    def answer(sock: socket.socket, data: bytes, addr: tuple, packetizer):
+        sock.sendto(packetizer.make_probe_ack_packet(len(data)), addr)
@@ -0,0 +1,58 @@
+# protocol/ranges.py
+
+
+class RangeError(ValueError):
+    pass
+
+
+def split_range(size: int, chunk_size: int, part: int, parts: int) -> tuple:
+    """
+    La parte part (desde 0) de parts del archivo, como (inicio, fin) en bytes. Los cortes
+    caen en múltiplos del chunk: ninguna parte termina con un chunk corto salvo la última.
+    """
+    if parts <= 0 or not 0 <= part < parts:
+        raise RangeError(f"Part {part} of {parts} does not exist")
+    total = (size + chunk_size - 1) // chunk_size
+    start = min(size, total * part // parts * chunk_size)
+    end = min(size, total * (part + 1) // parts * chunk_size)
+    return start, end
+
+
+def format_range(start: int, end: int) -> str:
+    return f"{start}-{end}"
+
+
+def parse_range(value: str) -> tuple:
+    """'inicio-fin' en bytes, fin excluido."""
+    start, sep, end = value.partition('-')
+    try:
+        start, end = int(start), int(end)
+    except ValueError:
+        raise RangeError(f"Bad range {value!r}") from None
+    if not sep or start < 0 or end < start:
+        raise RangeError(f"Bad range {value!r}")
+    return start, end
+
+
+def agreed_range(value: str, size: int, chunk_size: int) -> tuple:
+    """
+    El rango que pidió el cliente, contra un archivo de size bytes: 'parte/partes' lo
+    corta el servidor (que conoce el tamaño, así el cliente no tiene que averiguarlo
+    antes), 'inicio-fin' se acota al final del archivo.
+    """
+    if '/' in value:
+        part, _, parts = value.partition('/')
+        try:
+            return split_range(size, chunk_size, int(part), int(parts))
+        except ValueError as e:
+            raise RangeError(f"Bad range {value!r}") from e
+    start, end = parse_range(value)
+    if start > size:
+        raise RangeError(f"Range {value!r} starts past the end of a {size} byte file")
+    return start, min(end, size)
+
+
+def options_range(options: dict = None):
+    """El rango acordado en el handshake (opción 'range'), o None si va el archivo entero."""
+    value = (options or {}).get("range")
+    return parse_range(value) if value else None
@@ -0,0 +1,159 @@
+# protocol/resume.py
+import base64
+import os
+import time
+from utils.bitmap import Bitmap
+from utils.connection_config import ConnectionConfig
+
+
+class ResumeState:
+    """
+    Qué chunks del archivo ya están en disco del lado receptor, para retomar una
+    transferencia cortada. Se guarda en un archivo chico al lado del parcial
+    (<archivo>.resume) y viaja en el handshake como token:
+
+        tamaño:chunk:prefijo:bits
+
+    El prefijo son los chunks contiguos completos desde el principio; los bits (base64)
+    marcan los chunks completos de la ventana que sigue: el bit i es el chunk prefijo+i.
+    Fuera del prefijo solo puede haber chunks dentro de una ventana, así el token entra
+    en el LOGIN aunque el archivo tenga millones de chunks.
+    """
+    SUFFIX = ".resume"
+    # Lo que manda el cliente al subir: pregunta si el servidor tiene un parcial
+    ASK = "?"
+
+    def __init__(self, size: int, chunk_size: int, prefix: int = 0, bits: bytes = b''):
+        self.size = size
+        self.chunk_size = chunk_size
+        self.prefix = prefix
+        self.bits = bits
+        self.saved_at = time.monotonic()
+
+    def token(self) -> str:
+        bits = base64.urlsafe_b64encode(self.bits.rstrip(b'\x00')).decode('ascii')
+        return f"{self.size}:{self.chunk_size}:{self.prefix}:{bits}"
+
+    @classmethod
+    def from_token(cls, token: str):
+        size, chunk_size, prefix, bits = token.split(":")
+        state = cls(int(size), int(chunk_size), int(prefix), base64.urlsafe_b64decode(bits))
+        if state.size < 0 or state.chunk_size <= 0 or state.prefix < 0:
+            raise ValueError(f"Bad resume token {token!r}")
+        return state
+
+    @classmethod
+    def load(cls, output_path: str):
+        """El estado guardado junto a output_path, o None si no hay uno válido."""
+        try:
+            with open(output_path + cls.SUFFIX) as f:
+                return cls.from_token(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def save(self, output_path: str):
+        # Escritura atómica: un corte a mitad de camino deja el estado anterior, nunca uno roto
+        tmp = output_path + self.SUFFIX + ".tmp"
+        with open(tmp, 'w') as f:
+            f.write(self.token())
+        os.replace(tmp, output_path + self.SUFFIX)
+        self.saved_at = time.monotonic()
+
+    @classmethod
+    def pending(cls, output_path: str) -> bool:
+        """Si output_path es un parcial: tiene estado al lado, aunque esté roto."""
+        return os.path.exists(output_path + cls.SUFFIX)
+
+    @classmethod
+    def is_state_file(cls, name: str) -> bool:
+        return name.endswith(cls.SUFFIX) or name.endswith(cls.SUFFIX + ".tmp")
+
+    @classmethod
+    def discard(cls, output_path: str):
+        try:
+            os.remove(output_path + cls.SUFFIX)
+        except FileNotFoundError:
+            pass
+
+    def due(self) -> bool:
+        return time.monotonic() - self.saved_at >= ConnectionConfig.RESUME_SAVE_INTERVAL
+
+    def record(self, chunk_size: int, prefix: int, received: Bitmap = None, highest: int = -1):
+        """Toma el progreso del receptor, en su tamaño de chunk."""
+        window = Bitmap()
+        if received is not None:
+            for start, end in received.runs(prefix, highest + 1):
+                for seq in range(start, end):
+                    window.add(seq - prefix)
+        self.chunk_size = chunk_size
+        self.prefix = prefix
+        self.bits = bytes(window.bits)
+
+    def _has(self, seq: int) -> bool:
+        if seq < self.prefix:
+            return True
+        index = seq - self.prefix
+        return index // 8 < len(self.bits) and bool(self.bits[index // 8] & (1 << (index % 8)))
+
+    def completed(self, chunk_size: int) -> Bitmap:
+        """
+        Los chunks de chunk_size bytes que ya están enteros en disco. Si el chunk cambió
+        entre intentos (otro --chunk-size, PMTU) un chunk nuevo cuenta solo si todos los
+        bytes que cubre estaban en chunks viejos completos.
+        """
+        total = (self.size + chunk_size - 1) // chunk_size
+        done = Bitmap(total)
+        prefix_bytes = min(self.prefix * self.chunk_size, self.size)
+        full = total if prefix_bytes >= self.size else prefix_bytes // chunk_size
+        done.fill(full)
+        end_bytes = min((self.prefix + len(self.bits) * 8) * self.chunk_size, self.size)
+        for seq in range(full, (end_bytes + chunk_size - 1) // chunk_size):
+            first = seq * chunk_size // self.chunk_size
+            last = (min((seq + 1) * chunk_size, self.size) - 1) // self.chunk_size
+            if all(self._has(old) for old in range(first, last + 1)):
+                done.add(seq)
+        return done
+
+    def first_missing(self, chunk_size: int) -> int:
+        """El primer chunk que falta: los motores que solo retoman un prefijo (SW, GBN) arrancan ahí."""
+        total = (self.size + chunk_size - 1) // chunk_size
+        return min(self.completed(chunk_size).first_missing(), total)
+
+
+def agreed_resume(options: dict = None):
+    """El estado acordado en el handshake (opción 'resume'), o None si se arranca de cero."""
+    token = (options or {}).get("resume")
+    if not token or token == ResumeState.ASK:
+        return None
+    return ResumeState.from_token(token)
+
+
+def receiver_resume(options: dict = None):
+    """El receptor siempre lleva la cuenta si conoce el tamaño: así un corte se puede retomar."""
+    options = options or {}
+    state = agreed_resume(options)
+    if state is None and "size" in options:
+        state = ResumeState(int(options["size"]), int(options.get("chunk", ConnectionConfig.CHUNK_SIZE)))
+    return state
+
+
+def hash_prefix(f, length: int, digest):
+    """Pasa por digest los primeros length bytes de f, de a DIGEST_BLOCK; deja f en length."""
+    f.seek(0)
+    remaining = length
+    while remaining:
+        block = f.read(min(remaining, ConnectionConfig.DIGEST_BLOCK))
+        if not block:
+            break
+        digest.update(block)
+        remaining -= len(block)
+
+
+def reopen_prefix(f, length: int, digest):
+    """
+    Retoma un archivo que se escribe en orden (SW, GBN): hashea los primeros length
+    bytes, corta lo que haya después y deja f listo para seguir escribiendo ahí.
+    """
+    hash_prefix(f, length, digest)
+    f.truncate(length)
+    f.seek(length)
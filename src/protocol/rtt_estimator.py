@@ -0,0 +1,59 @@
+import time
+from collections import deque
+from utils import ConnectionConfig
+
+
+class RttEstimator:
+    """
+    Estimador de RTO según RFC 6298 (SRTT/RTTVAR con backoff exponencial).
+    Los tiempos se miden con el timestamp que el emisor escribe en el header
+    y que el receptor devuelve en el ACK. Por la regla de Karn, los paquetes
+    retransmitidos viajan sin timestamp y no producen muestras.
+    """
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+    CLOCK_GRANULARITY = 0.001
+    TIMESTAMP_MASK = 0xFFFFFFFF
+
+    def __init__(self, initial_rto: float = None, min_rto: float = None, max_rto: float = None, history: int = 64):
+        self.min_rto = min_rto if min_rto is not None else ConnectionConfig.MIN_RTO
+        self.max_rto = max_rto if max_rto is not None else ConnectionConfig.MAX_RTO
+        self.srtt = None
+        self.rttvar = None
+        self.base_rto = initial_rto if initial_rto is not None else ConnectionConfig.TIMEOUT
+        self.backoff = 1
+        self.samples = deque(maxlen=history)
+
+    @property
+    def rto(self) -> float:
+        return min(self.max_rto, self.base_rto * self.backoff)
+
+    def on_sample(self, rtt: float):
+        self.samples.append(rtt)
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+        rto = self.srtt + max(self.CLOCK_GRANULARITY, self.K * self.rttvar)
+        self.base_rto = min(self.max_rto, max(self.min_rto, rto))
+        self.backoff = 1
+
+    def on_timeout(self):
+        if self.base_rto * self.backoff < self.max_rto:
+            self.backoff *= 2
+
+    def on_timestamp_echo(self, timestamp: int):
+        if timestamp:
+            self.on_sample(self.elapsed_since(timestamp))
+
+    @classmethod
+    def timestamp(cls) -> int:
+        """Reloj en microsegundos truncado a 32 bits (0 se reserva para 'sin timestamp')."""
+        return (int(time.monotonic() * 1_000_000) & cls.TIMESTAMP_MASK) or 1
+
+    @classmethod
+    def elapsed_since(cls, timestamp: int) -> float:
+        return ((cls.timestamp() - timestamp) & cls.TIMESTAMP_MASK) / 1_000_000
@@ -1,91 +1,312 @@
 # protocol/selective_repeat.py
+import heapq
+import os
 import socket
 import threading
+import time
+from protocol.ack_policy import AckPolicy
+from protocol.compression import ChunkCompressor, CompressionError, PackedChunks, extract_payload
+from protocol.congestion_control import CongestionController, make_congestion_controller
+from protocol.integrity import StreamDigest, terminate, check_received
+from protocol.mapped_file import MappedFile
 from protocol.packet import Packetizer, DefaultPacketizer
+from protocol.pacer import TokenBucketPacer
+from protocol.resume import ResumeState
+from protocol.rtt_estimator import RttEstimator
+from protocol.udp_offload import BatchSender, BatchReceiver, payload_bytes, tune_socket_buffers
+from utils.bitmap import Bitmap
+from utils.connection_config import ConnectionConfig
 from utils.logger import Logger
+from utils.timer_scheduler import TimerScheduler
 
 class SelectiveRepeatProtocol:
+    # Cantidad de seqs confirmados por SACK por encima de un hueco
+    # para darlo por perdido y retransmitirlo sin esperar el timeout
+    DUP_THRESHOLD = 3
+
     def __init__(self, sock: socket.socket, dest: tuple, file_path: str,
-                 packetizer: Packetizer = None, timeout: float = 10.0, window_size: int = 1000):
+                 packetizer: Packetizer = None, timeout: float = 10.0, window_size: int = 1000,
+                 chunk_size: int = None, rtt: RttEstimator = None, congestion: CongestionController = None,
+                 rate: float = None, pacing: bool = True, offload: bool = None,
+                 scheduler: TimerScheduler = None, compressor: ChunkCompressor = None,
+                 resume: ResumeState = None, offset: int = 0, length: int = None):
         self.sock = sock
         self.dest = dest
         self.file_path = file_path
         self.timeout = timeout
         self.window_size = window_size
+        chunk_size = chunk_size or ConnectionConfig.CHUNK_SIZE
+        self.chunk_size = chunk_size
+        self.rtt = rtt or RttEstimator(initial_rto=timeout)
+        self.last_backoff = 0.0
+        self.congestion = congestion or make_congestion_controller(ConnectionConfig.CONGESTION_CONTROL, window_size)
+        # Las pérdidas por debajo de recovery_point pertenecen al mismo episodio
+        # y reducen la ventana una sola vez
+        self.recovery_point = 0
+        # Ventana anunciada por el receptor (espacio libre en su buffer, en paquetes)
+        self.peer_window = window_size
+        # Pacing: tope fijo (rate, bytes/s) y/o ritmo derivado de cwnd/SRTT
+        self.rate = rate
+        self.pacing = pacing
+        self.pacer = TokenBucketPacer(rate, burst=ConnectionConfig.PACING_BURST * chunk_size)
         self.base = 0
         self.next_seq = 0
         self.timers = {}              
         self.acked = {}               
+        self.fast_retransmitted = set()
+        # Los DUP_THRESHOLD seqs confirmados más altos (heap de mínimos: el umbral es el
+        # primero) y hasta dónde ya se buscaron huecos: cada SACK no recorre toda la ventana
+        self.highest_acked = []
+        self.gap_scan = 0
         self.lock = threading.Lock()
+        self.window_open = threading.Condition(self.lock)
+        self.scheduler = scheduler or TimerScheduler.default()
         self.packetizer = packetizer or DefaultPacketizer()
-        self.packets = list(self._file_reader())
-        self.total = len(self.packets)
+        self.compressor = compressor
+        # Cada chunk se comprime una sola vez: las retransmisiones reusan el resultado
+        self.packed = PackedChunks(compressor) if compressor is not None else None
+        # Con GSO los datos nuevos salen en tandas de hasta batch_limit paquetes por syscall
+        self.packet_size = chunk_size + self.packetizer.HEADER_SIZE
+        self.sender = BatchSender(sock, ConnectionConfig.UDP_OFFLOAD if offload is None else offload)
+        self.batch_limit = self.sender.batch_limit(self.packet_size)
+        # ACKs y SACKs se leen en buffers reutilizables y se parsean en el lugar
+        self.acks = BatchReceiver(sock, 2048, enabled=False)
+        # Los payloads son vistas del archivo mapeado: no hay copias ni caché de chunks.
+        # Con offset/length se manda solo ese rango (una parte de una descarga en paralelo)
+        self.file = MappedFile(file_path, chunk_size, offset, length)
+        self.file_size = self.file.size
+        self.total = self.file.total
+        # Al retomar, los chunks que el receptor ya tiene no se mandan: se arranca en el
+        # primero que le falta y los demás se dan por confirmados al pasar por ellos
+        self.completed = Bitmap()
+        if resume is not None:
+            if resume.size == self.file_size:
+                self.completed = resume.completed(chunk_size)
+                self.base = self.next_seq = min(self.completed.first_missing(), self.total)
+            else:
+                Logger.error(who=self.sock.getsockname(), message=f"[SR] Resume state is for a {resume.size} byte file, sending everything")
+        # Los datos nuevos salen en orden de seq: cada tanda se hashea una vez, al mandarla
+        self.digest = StreamDigest()
+        self.hashed = 0
+        # Una cabecera por paquete de la tanda, reescritas en cada envío
+        # (todos los envíos ocurren con el lock tomado)
+        self.headers = bytearray(self.packetizer.HEADER_SIZE * self.batch_limit)
+        self.header_views = [memoryview(self.headers)[i * self.packetizer.HEADER_SIZE:(i + 1) * self.packetizer.HEADER_SIZE]
+                             for i in range(self.batch_limit)]
         self.send_event = threading.Event()
         self.sock.settimeout(timeout + 0.1)
         Logger.debug(who=self.sock.getsockname(), message=f"SR init for {dest}, file:{file_path}, win:{window_size}")
 
-    def _file_reader(self, chunk_size=1024):
-        with open(self.file_path, 'rb') as f:
-            while True:
-                data = f.read(chunk_size)
-                if not data:
-                    break
-                yield data
+    @property
+    def rto(self):
+        return self.rtt.rto
+
+    @property
+    def rtt_samples(self):
+        return list(self.rtt.samples)
+
+    @property
+    def effective_window(self):
+        return max(1, min(self.window_size, self.congestion.window, self.peer_window))
+
+    def _estimated_bdp(self):
+        # Lo máximo que puede estar en vuelo: la ventana, o lo que permite la tasa en un RTT
+        bdp = self.window_size * self.packet_size
+        if self.rate and self.rtt.srtt:
+            bdp = min(bdp, self.rate * self.rtt.srtt)
+        return bdp
 
     def start(self):
         Logger.info(f"[SR] Starting transfer to {self.dest}")
-        threading.Thread(target=self._receive_acks, daemon=True).start()
-        with self.lock:
-            while self.next_seq < self.base + self.window_size and self.next_seq < self.total:
-                self._send(self.next_seq)
-                self.next_seq += 1
+        tune_socket_buffers(self.sock, self._estimated_bdp())
+        if self.base:
+            Logger.info(f"[SR] Resuming at chunk {self.base} of {self.total}")
+        if self.base >= self.total:
+            self.send_event.set()
+        else:
+            threading.Thread(target=self._receive_acks, daemon=True).start()
+            self._send_new_data()
         self.send_event.wait()
-        term = self.packetizer.make_terminate_packet()
-        self.sock.sendto(term, self.dest)
+        # Lo que no salió por estar ya del otro lado entra igual al digest
+        self._hash_sent(self.total)
+        self.file.close()
+        terminate(self.sock, self.dest, self.packetizer, self.acks.recv_packet, self.rtt, self.digest)
         Logger.info("[SR] Transfer completed.")
 
-    def _send(self, seq):
-        packet = self.packetizer.make_data_packet(seq, self.packets[seq])
-        self.sock.sendto(packet, self.dest)
+    def _send_new_data(self):
+        # Los datos nuevos salen solo desde este hilo; el de ACKs avisa cuando
+        # se abre la ventana. La espera del pacing se hace fuera del lock.
+        while True:
+            with self.window_open:
+                while not self._window_has_room():
+                    if self.next_seq >= self.total:
+                        return
+                    self.window_open.wait()
+                packets, last = self._next_batch()
+                self.sender.send_vectored(packets, self.dest)
+            self._hash_sent(last)
+            self.pacer.wait(payload_bytes(packets))
+
+    def _next_batch(self):
+        """Los próximos DATA nuevos que entran en la ventana, y hasta dónde llegó next_seq."""
+        packets = []
+        while self._window_has_room() and len(packets) < self.batch_limit:
+            if self.next_seq in self.completed:
+                self.acked[self.next_seq] = True
+                self._raise_highest(self.next_seq)
+            else:
+                packets.append(self._packet(self.next_seq, slot=len(packets)))
+            self.next_seq += 1
+        return packets, self.next_seq
+
+    def _hash_sent(self, last):
+        # La tanda es contigua en el mapeo: un solo update, con los paquetes ya en el kernel.
+        # Desde hashed: incluye los chunks salteados al retomar
+        self.digest.update(self.file.range(self.hashed, last))
+        self.hashed = last
+
+    def _window_has_room(self):
+        # En vuelo: enviados y todavía no confirmados (ni acumulativa ni selectivamente)
+        return (self.next_seq < self.total and
+                self.next_seq < self.base + self.window_size and
+                self.next_seq - self.base - len(self.acked) < self.effective_window)
+
+    def _update_pacing_rate(self):
+        rate = self.rate
+        if self.pacing and self.rtt.srtt:
+            cwnd_rate = ConnectionConfig.PACING_GAIN * self.effective_window * self.chunk_size / self.rtt.srtt
+            rate = cwnd_rate if rate is None else min(rate, cwnd_rate)
+        self.pacer.set_rate(rate)
+
+    def _send(self, seq, retransmission=False):
+        self.sender.send_vectored([self._packet(seq, retransmission)], self.dest)
+
+    def _packet(self, seq, retransmission=False, slot=0):
+        """Los buffers del DATA: la cabecera en su lugar de la tanda y el payload sin copiar."""
+        # Karn: las retransmisiones van sin timestamp para no medir RTTs ambiguos
+        timestamp = 0 if retransmission else RttEstimator.timestamp()
+        # Si después de este paquete no se puede enviar más, el receptor no debe demorar el ACK
+        ack_now = retransmission or seq + 1 >= self.total or seq + 1 - self.base - len(self.acked) >= self.effective_window
+        flags = self.packetizer.FLAG_ACK_NOW if ack_now else 0
+        payload = self.file.chunk(seq)
+        if self.packed is not None:
+            payload, compressed = self.packed.payload(seq, payload)
+            if compressed:
+                flags |= self.packetizer.FLAG_COMPRESSED
+        header = self.header_views[slot]
+        self.packetizer.pack_data_header(header, 0, seq, timestamp, flags)
         Logger.debug(who=self.sock.getsockname(), message=f"[SR] Sent seq={seq}")
-        timer = threading.Timer(self.timeout, self._timeout, args=(seq,))
-        self.timers[seq] = timer
-        timer.start()
+        self.timers[seq] = self.scheduler.schedule(self.rtt.rto, self._timeout, seq)
+        return [header, payload]
 
     def _timeout(self, seq):
         with self.lock:
-            if not self.acked.get(seq, False):
+            if seq >= self.base and not self.acked.get(seq, False):
                 Logger.debug(who=self.sock.getsockname(), message=f"[SR] Timeout seq={seq}, retransmitting")
-                self._send(seq)
+                # Como con un único timer, el RTO se duplica a lo sumo una vez por RTO
+                # aunque venzan muchos seqs de la ventana a la vez
+                now = time.monotonic()
+                if now - self.last_backoff >= self.rtt.rto:
+                    self.rtt.on_timeout()
+                    self.congestion.on_loss(timeout=True)
+                    self.recovery_point = self.next_seq
+                    self.last_backoff = now
+                self.pacer.delay(self.chunk_size)
+                self._send(seq, retransmission=True)
 
     def _receive_acks(self):
         while True:
             try:
-                packet, _ = self.sock.recvfrom(2048)
-                if self.packetizer.is_ack(packet):
-                    seq = self.packetizer.extract_seq(packet)
-                    Logger.debug(who=self.sock.getsockname(), message=f"[SR] Received ACK seq={seq}")
-                    with self.lock:
-                        if self.base <= seq < self.base + self.window_size:
-                            self.acked[seq] = True
-                            if seq in self.timers:
-                                self.timers[seq].cancel()
-                                del self.timers[seq]
-                            while self.acked.get(self.base, False):
-                                del self.acked[self.base]
-                                self.base += 1
-                                if self.next_seq < self.total:
-                                    self._send(self.next_seq)
-                                    self.next_seq += 1
-                            if self.base == self.total:
-                                self.send_event.set()
-                                return
+                packet, _ = self.acks.recv_packet()
+                if self._on_ack(packet):
+                    return
             except socket.timeout:
                 continue
 
+    def _on_ack(self, packet):
+        """Procesa un ACK o SACK; devuelve True cuando todo el archivo quedó confirmado."""
+        if self.packetizer.is_sack(packet):
+            cum_ack, blocks = self.packetizer.extract_sack(packet)
+            Logger.debug(who=self.sock.getsockname(), message=f"[SR] Received SACK cum={cum_ack} blocks={blocks}")
+            with self.lock:
+                self.rtt.on_timestamp_echo(self.packetizer.extract_timestamp(packet))
+                self.peer_window = self.packetizer.extract_window(packet)
+                acked = self._mark_acked(range(self.base, min(cum_ack, self.next_seq)))
+                for start, end in blocks:
+                    acked += self._mark_acked(range(max(start, self.base), min(end, self.next_seq)))
+                if acked:
+                    self.congestion.on_ack(acked, self.rtt.srtt)
+                    self._update_pacing_rate()
+                self._fast_retransmit()
+                return self._slide_window()
+        elif self.packetizer.is_ack(packet):
+            seq = self.packetizer.extract_seq(packet)
+            Logger.debug(who=self.sock.getsockname(), message=f"[SR] Received ACK seq={seq}")
+            with self.lock:
+                self.rtt.on_timestamp_echo(self.packetizer.extract_timestamp(packet))
+                if self.base <= seq < self.base + self.window_size:
+                    if self._mark_acked((seq,)):
+                        self.congestion.on_ack(1, self.rtt.srtt)
+                        self._update_pacing_rate()
+                    return self._slide_window()
+        return False
+
+    def _mark_acked(self, seqs):
+        acked = 0
+        for seq in seqs:
+            if self.acked.get(seq, False):
+                continue
+            acked += 1
+            self.acked[seq] = True
+            self._raise_highest(seq)
+            self.fast_retransmitted.discard(seq)
+            if self.packed is not None:
+                self.packed.release(seq)
+            if seq in self.timers:
+                self.timers[seq].cancel()
+                del self.timers[seq]
+        return acked
+
+    def _raise_highest(self, seq):
+        if len(self.highest_acked) < self.DUP_THRESHOLD:
+            heapq.heappush(self.highest_acked, seq)
+        elif seq > self.highest_acked[0]:
+            heapq.heapreplace(self.highest_acked, seq)
+
+    def _fast_retransmit(self):
+        if len(self.highest_acked) < self.DUP_THRESHOLD:
+            return
+        threshold = self.highest_acked[0]
+        # Lo que ya se revisó quedó confirmado o retransmitido, y así sigue hasta el ACK
+        start = max(self.base, self.gap_scan)
+        self.gap_scan = max(self.gap_scan, threshold)
+        for seq in range(start, threshold):
+            if not self.acked.get(seq, False) and seq not in self.fast_retransmitted:
+                Logger.debug(who=self.sock.getsockname(), message=f"[SR] SACK gap at seq={seq}, fast retransmit")
+                if seq >= self.recovery_point:
+                    self.congestion.on_loss(timeout=False)
+                    self.recovery_point = self.next_seq
+                self.fast_retransmitted.add(seq)
+                self.pacer.delay(self.chunk_size)
+                self._send(seq, retransmission=True)
+
+    def _slide_window(self):
+        # Los chunks que el receptor ya tenía al retomar cuentan como confirmados
+        # aunque el hilo de envío todavía no haya pasado por ellos
+        while self.acked.get(self.base, False) or self.base in self.completed:
+            self.acked.pop(self.base, None)
+            self.base += 1
+        self.next_seq = max(self.next_seq, self.base)
+        self.window_open.notify()
+        if self.base == self.total:
+            self.send_event.set()
+            return True
+        return False
+
     def close(self):
         for t in self.timers.values():
             t.cancel()
+        self.file.close()
         try:
             self.sock.close()
         except OSError:
@@ -95,56 +316,176 @@ class SelectiveRepeatProtocol:
 
 
 class SelectiveRepeatReceiver:
+    """
+    Receptor SR con ubicación directa: como el chunk es fijo, cada DATA se escribe
+    con pwrite en seq * chunk_size apenas llega, en orden o no. No hay buffer de
+    reordenamiento; solo un bitmap de los seqs recibidos para los SACK.
+    """
     def __init__(self, sock: socket.socket, output_path: str,
-                 packetizer: Packetizer = None, timeout: float = 1.0, window_size: int = 1000):
+                 packetizer: Packetizer = None, timeout: float = 1.0, window_size: int = 1000,
+                 ack_policy: AckPolicy = None, chunk_size: int = None, offload: bool = None,
+                 file_size: int = None, compressor: ChunkCompressor = None,
+                 resume: ResumeState = None, offset: int = None):
         self.sock = sock
         self.output_path = output_path
+        # Con offset se recibe un rango dentro de un archivo que ya existe: el seq 0 va
+        # en offset, file_size es el largo del rango y no se trunca lo que hay alrededor
+        self.offset = offset
+        self.base_offset = offset or 0
         self.packetizer = packetizer or DefaultPacketizer()
+        self.chunk_size = chunk_size or ConnectionConfig.CHUNK_SIZE
+        # El buffer de recepción alcanza justo para un DATA con el chunk acordado
+        self.bufsize = self.chunk_size + self.packetizer.HEADER_SIZE
+        self.receiver = BatchReceiver(sock, self.bufsize, ConnectionConfig.UDP_OFFLOAD if offload is None else offload)
+        self.compressor = compressor
         self.timeout = timeout
         self.window_size = window_size
+        self.ack_policy = ack_policy or AckPolicy(ConnectionConfig.SR_ACK_EVERY, ConnectionConfig.ACK_DELAY)
+        # Con el tamaño anunciado en el handshake se reserva el archivo completo de entrada
+        self.file_size = file_size
+        self.allocated = file_size is None
+        total = (file_size + self.chunk_size - 1) // self.chunk_size if file_size else 0
+        self.received = Bitmap(total)
+        # Se hashea el prefijo contiguo ya escrito, releyéndolo de la page cache de a
+        # DIGEST_BLOCK bytes: da igual si los chunks llegaron en orden o no
+        self.digest = StreamDigest()
+        self.hashed_seq = 0
+        self.hash_run = max(1, ConnectionConfig.DIGEST_BLOCK // self.chunk_size)
+        self.verified = None
         self.expected_seq = 0
-        self.buffer = {}  
+        self.highest_seq = -1
+        # Lo que ya está en disco de un intento anterior cuenta como recibido; el estado
+        # se guarda cada RESUME_SAVE_INTERVAL para poder retomar si este intento se corta
+        self.resume = resume
+        self.resuming = False
+        if resume is not None and resume.size == file_size and os.path.exists(output_path):
+            self.received = resume.completed(self.chunk_size)
+            self.resuming = len(self.received) > 0
+            self.expected_seq = self.received.first_missing()
+            runs = self.received.runs(self.expected_seq, len(self.received.bits) * 8)
+            self.highest_seq = runs[-1][1] - 1 if runs else self.expected_seq - 1
+        self.peer = None
         self.running = True
         self.sock.settimeout(timeout + 0.1)
         Logger.debug(who=self.sock.getsockname(), message=f"SR Receiver init, output:{output_path}, win:{window_size}")
 
     def start(self):
         Logger.info("[SR-Receiver] Receiver started.")
-        with open(self.output_path, 'wb') as f:
-            while self.running:
-                try:
-                    packet, addr = self.sock.recvfrom(2048)
-                    if self.packetizer.is_data(packet):
-                        seq = self.packetizer.extract_seq(packet)
-                        Logger.debug(who=self.sock.getsockname(), message=f"[SR-Receiver] Recv DATA seq={seq} from {addr}")
-
-                        if self.expected_seq <= seq < self.expected_seq + self.window_size:
-
-                            ack = self.packetizer.make_ack_packet(seq)
-                            self.sock.sendto(ack, addr)
-                            Logger.debug(who=self.sock.getsockname(), message=f"[SR-Receiver] Sent ACK seq={seq}")
-
-                            if seq not in self.buffer:
-                                self.buffer[seq] = self.packetizer.extract_data(packet)
-
-                            while self.expected_seq in self.buffer:
-                                f.write(self.buffer.pop(self.expected_seq))
-                                Logger.debug(who=self.sock.getsockname(), message=f"[SR-Receiver] Written seq={self.expected_seq}")
-                                self.expected_seq += 1
-                        else:
-
-                            last_ack = self.expected_seq - 1
-                            if seq >= 0:
-                                nak = self.packetizer.make_ack_packet(seq)
-                                self.sock.sendto(nak, addr)
-                                Logger.debug(who=self.sock.getsockname(), message=f"[SR-Receiver] Resent ACK seq={seq}")
-                    elif self.packetizer.is_terminate(packet):
-                        Logger.info("[SR-Receiver] Received terminate.")
-                        self.running = False
-                except socket.timeout:
-                    continue
+        tune_socket_buffers(self.sock, self.window_size * self.bufsize)
+        with open(self.output_path, 'r+b' if self.resuming or self.offset is not None else 'w+b') as f:
+            if self.resuming:
+                Logger.info(f"[SR-Receiver] Resuming with {len(self.received)} chunks already on disk")
+                self._hash_prefix(f)
+            try:
+                while self.running:
+                    try:
+                        self.sock.settimeout(self.ack_policy.time_left(self.timeout + 0.1))
+                        # Con GRO una sola lectura puede traer varios DATA pegados
+                        packets, addr = self.receiver.recv()
+                        for packet in packets:
+                            self._on_packet(packet, addr, f)
+                    except socket.timeout:
+                        self._on_idle()
+            finally:
+                self._save_progress(final=True)
+        check_received(self.output_path, self.verified, self.offset)
         Logger.info(f"[SR-Receiver] File saved to {self.output_path}")
 
+    def _on_packet(self, packet, addr, f):
+        if self.packetizer.is_data(packet):
+            self._on_data(packet, addr, f)
+        elif self.packetizer.is_terminate(packet):
+            Logger.info("[SR-Receiver] Received terminate.")
+            self._hash_prefix(f)
+            self.verified = self.digest.matches(self.packetizer.extract_digest(packet))
+            self.sock.sendto(self.packetizer.make_terminate_ack_packet(self.verified), addr)
+            self.running = False
+
+    def _on_idle(self):
+        # Venció la espera: si hay un ACK demorado pendiente, se manda ahora
+        if self.ack_policy.due():
+            self._send_sack(self.peer)
+
+    def _on_data(self, packet, addr, f):
+        seq = self.packetizer.extract_seq(packet)
+        Logger.debug(who=self.sock.getsockname(), message=f"[SR-Receiver] Recv DATA seq={seq} from {addr}")
+        self.peer = addr
+        if not self.allocated:
+            self._preallocate(f)
+
+        # Fuera de orden, duplicado, con huecos pendientes o pedido por el emisor: se confirma ya
+        immediate = (seq != self.expected_seq or self.out_of_order > 0 or
+                     self.packetizer.extract_flags(packet) & self.packetizer.FLAG_ACK_NOW)
+
+        if self.expected_seq <= seq < self.expected_seq + self.window_size and seq not in self.received:
+            # Primero se descomprime: un chunk que no se pudo escribir no se marca ni se confirma
+            try:
+                data = extract_payload(packet, self.packetizer, self.compressor)
+            except CompressionError as e:
+                Logger.debug(who=self.sock.getsockname(), message=f"[SR-Receiver] Dropped seq={seq}: {e}")
+                return
+            self.received.add(seq)
+            os.pwrite(f.fileno(), data, self.base_offset + seq * self.chunk_size)
+            Logger.debug(who=self.sock.getsockname(), message=f"[SR-Receiver] Written seq={seq}")
+            self.highest_seq = max(self.highest_seq, seq)
+            if seq == self.expected_seq:
+                self.expected_seq = self.received.first_missing(seq)
+                if self.expected_seq - self.hashed_seq >= self.hash_run:
+                    self._hash_prefix(f)
+            self._save_progress()
+
+        if self.ack_policy.on_packet(self.packetizer.extract_timestamp(packet), immediate):
+            self._send_sack(addr)
+
+    def _hash_prefix(self, f):
+        # Todo lo anterior a expected_seq ya está escrito; si es el final, pread corta en EOF
+        # (o en el fin del rango: lo que sigue es de otra parte). De a hash_run chunks:
+        # al retomar el prefijo puede ser casi todo el archivo
+        while self.expected_seq > self.hashed_seq:
+            run = min(self.expected_seq - self.hashed_seq, self.hash_run)
+            start = self.hashed_seq * self.chunk_size
+            length = run * self.chunk_size
+            if self.offset is not None:
+                length = min(length, self.file_size - start)
+            self.digest.update(os.pread(f.fileno(), length, self.base_offset + start))
+            self.hashed_seq += run
+
+    def _save_progress(self, final=False):
+        if self.resume is None or not (final or self.resume.due()):
+            return
+        if final and not self.running:
+            # Terminó (bien o mal): no queda nada para retomar
+            ResumeState.discard(self.output_path)
+            return
+        self.resume.record(self.chunk_size, self.expected_seq, self.received, self.highest_seq)
+        self.resume.save(self.output_path)
+
+    def _preallocate(self, f):
+        # Reservar de entrada evita fragmentar el archivo con escrituras fuera de orden;
+        # si el sistema de archivos no lo soporta, pwrite igual lo extiende
+        self.allocated = True
+        if self.file_size and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(f.fileno(), self.base_offset, self.file_size)
+            except OSError as e:
+                Logger.debug(who=self.sock.getsockname(), message=f"[SR-Receiver] posix_fallocate failed ({e})")
+
+    @property
+    def out_of_order(self):
+        # Todo lo anterior a expected_seq está marcado: el resto llegó fuera de orden
+        return len(self.received) - self.expected_seq
+
+    @property
+    def free_space(self):
+        return max(0, self.window_size - self.out_of_order)
+
+    def _send_sack(self, addr):
+        blocks = self.received.runs(self.expected_seq, self.highest_seq + 1, self.packetizer.MAX_SACK_BLOCKS)
+        timestamp = self.ack_policy.on_ack_sent()
+        sack = self.packetizer.make_sack_packet(self.expected_seq, blocks, timestamp, self.free_space)
+        self.sock.sendto(sack, addr)
+        Logger.debug(who=self.sock.getsockname(), message=f"[SR-Receiver] Sent SACK cum={self.expected_seq} blocks={blocks} rwnd={self.free_space}")
+
     def close(self):
         try:
             self.sock.close()
@@ -1,24 +1,33 @@
 import socket
 from protocol.connection_socket import ConnectionSocket
 from protocol.handshake import Handshake
+from protocol.multiplexer import ConnectionMultiplexer
 from utils import Logger, ConnectionConfig
 
 
 class ServerManager:
     @staticmethod
-    def start_server(host='localhost', port=8080):
-        server = ServerListener(host, port)
+    def start_server(host='localhost', port=8080, negotiate=None, single_port=False, reuse_port=False):
+        server = ServerListener(host, port, negotiate, single_port, reuse_port)
         server.start()
         return server
 
     @staticmethod
-    def connect_to_server(server_addr=('localhost', 8080), mode = "download", filename="file.file"):
-        return Handshake.client(server_addr, mode, filename)
+    def connect_to_server(server_addr=('localhost', 8080), mode = "download", filename="file.file", options=None, probe_mtu=False):
+        return Handshake.client(server_addr, mode, filename, options, probe_mtu)
 
 class ServerListener:
-    def __init__(self, host='localhost', port=8080):
+    def __init__(self, host='localhost', port=8080, negotiate=None, single_port=False, reuse_port=False):
         self.door_address = (host, port)
+        self.negotiate = negotiate
+        # Con single_port todas las conexiones usan el socket de escucha y se
+        # distinguen por connection ID; si no, cada una abre un socket efímero
+        self.single_port = single_port
+        self.mux = None
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if reuse_port:
+            # Varios procesos comparten el puerto y el kernel reparte por dirección de origen
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         self.socket.bind(self.door_address)
         self.socket.settimeout(ConnectionConfig.TIMEOUT)
         self.connections = {}
@@ -27,6 +36,8 @@ class ServerListener:
 
     def start(self):
         self.running = True
+        if self.single_port:
+            self.mux = ConnectionMultiplexer(self.socket)
         Logger.debug(who=self.door_address, message=f"Server started on {self.door_address}")
             
     def get_client(self):
@@ -37,7 +48,13 @@ class ServerListener:
         # Create a new socket for the client
         # Wait for incoming data
         try:
-            data, addr = self.socket.recvfrom(1024)
+            if self.mux:
+                item = self.mux.accept(ConnectionConfig.TIMEOUT)
+                if item is None:
+                    raise socket.timeout()
+                data, addr = item
+            else:
+                data, addr = self.socket.recvfrom(1024)
             Logger.debug(f"get:client recibe de socket: {data}, addr: {addr}")
         except socket.timeout:
             Logger.debug(who=self.door_address, message="Timeout waiting for new connection")
@@ -47,7 +64,7 @@ class ServerListener:
             return None
 
         try:
-            valid_connection, mode, filename = Handshake.server(self.door_address, addr, data)
+            valid_connection, mode, filename = Handshake.server(self.door_address, addr, data, self.negotiate, self.mux)
             self.connections[addr] = valid_connection
 
             Logger.debug(who=self.door_address, message=f"New connection established with [{addr}, {mode}, '{filename}'] using {valid_connection.source_address}")
@@ -58,12 +75,14 @@ class ServerListener:
     
     def stop(self):
         self.running = False
-        self.socket.close()
-        Logger.debug(who=self.door_address, message=f"Server stopped on {self.door_address}")
-        
+        # Las conexiones se cierran primero: en modo single_port su cierre
+        # todavía necesita el socket de escucha y el despachador
         for conn in self.connections.values():
             conn.close()
-        
-        
         self.connections.clear()
 
+        if self.mux:
+            self.mux.stop()
+        self.socket.close()
+        Logger.debug(who=self.door_address, message=f"Server stopped on {self.door_address}")
+
@@ -1,7 +1,15 @@
 from abc import ABC, abstractmethod
+import os
 import socket
-import threading
+from protocol.ack_policy import AckPolicy
+from protocol.compression import ChunkCompressor, CompressionError, extract_payload
+from protocol.integrity import StreamDigest, terminate, check_received
 from protocol.packet import Packetizer, DefaultPacketizer
+from protocol.pacer import TokenBucketPacer
+from protocol.resume import ResumeState, hash_prefix, reopen_prefix
+from protocol.rtt_estimator import RttEstimator
+from protocol.udp_offload import BatchReceiver
+from utils.connection_config import ConnectionConfig
 from utils.logger import Logger
 
 class SWState(ABC):
@@ -19,28 +27,47 @@ class IdleState(SWState):
 
 class SendingState(SWState):
     def on_enter(self):
-        try:
-            chunk = next(self.ctx.reader)
-        except StopIteration:
-            self.ctx.transition('completed')
-            return
-        packet = self.ctx.packetizer.make_data_packet(self.ctx.seq, chunk)
+        # El chunk actual se conserva (ya comprimido) hasta recibir su ACK para poder
+        # retransmitirlo tal cual, sin volver a comprimirlo
+        if self.ctx.chunk is None:
+            try:
+                self.ctx.chunk = next(self.ctx.reader)
+            except StopIteration:
+                self.ctx.transition('completed')
+                return
+            self.ctx.compressed = False
+            if self.ctx.compressor is not None:
+                packed = self.ctx.compressor.compress(self.ctx.chunk)
+                if packed is not None:
+                    self.ctx.chunk, self.ctx.compressed = packed, True
+            self.ctx.retransmission = False
+        chunk = self.ctx.chunk
+        # Karn: las retransmisiones van sin timestamp para no medir RTTs ambiguos
+        timestamp = 0 if self.ctx.retransmission else RttEstimator.timestamp()
+        # Con un solo paquete en vuelo, cada uno agota la ventana: se pide ACK inmediato
+        flags = self.ctx.packetizer.FLAG_ACK_NOW
+        if self.ctx.compressed:
+            flags |= self.ctx.packetizer.FLAG_COMPRESSED
+        packet = self.ctx.packetizer.make_data_packet(self.ctx.seq, chunk, timestamp, flags)
+        self.ctx.pacer.wait(len(packet))
         self.ctx.sock.sendto(packet, self.ctx.dest)
+        self.ctx.retransmission = True
         Logger.debug(who=self.ctx.sock.getsockname(), message=f"[SW] sent seq={self.ctx.seq}, {len(chunk)} bytes")
         self.ctx.transition('waiting_ack')
 
 class WaitingAckState(SWState):
     def on_enter(self):
-        timer = threading.Timer(self.ctx.timeout, self._on_timeout)
-        timer.start()
+        # El timeout del socket es el timer de retransmisión: no hace falta otro hilo
+        self.ctx.sock.settimeout(self.ctx.rtt.rto)
         try:
-            packet, _ = self.ctx.sock.recvfrom(2048)
-            timer.cancel()
+            packet, _ = self.ctx.acks.recv_packet()
             if self.ctx.packetizer.is_ack(packet):
                 ack_seq = self.ctx.packetizer.extract_seq(packet)
                 Logger.debug(who=self.ctx.sock.getsockname(), message=f"[SW] received ACK seq={ack_seq}")
                 if ack_seq == self.ctx.seq:
+                    self.ctx.rtt.on_timestamp_echo(self.ctx.packetizer.extract_timestamp(packet))
                     self.ctx.seq = self.ctx.seq + 1
+                    self.ctx.chunk = None
                     self.ctx.transition('sending')
                 else:
                     Logger.debug(who=self.ctx.sock.getsockname(), message="[SW] unexpected ACK, resending")
@@ -49,32 +76,51 @@ class WaitingAckState(SWState):
                 Logger.debug(who=self.ctx.sock.getsockname(), message="[SW] non-ACK packet received, ignored")
                 self.ctx.transition('waiting_ack')
         except socket.timeout:
-            # recv timeout handled by timer
-            pass
+            self._on_timeout()
 
     def _on_timeout(self):
         Logger.debug(who=self.ctx.sock.getsockname(), message=f"[SW] Timeout seq={self.ctx.seq}, resending")
+        self.ctx.rtt.on_timeout()
         self.ctx.transition('sending')
 
 class CompletedState(SWState):
     def on_enter(self):
-        terminator = self.ctx.packetizer.make_terminate_packet()
-        self.ctx.sock.sendto(terminator, self.ctx.dest)
+        terminate(self.ctx.sock, self.ctx.dest, self.ctx.packetizer, self.ctx.acks.recv_packet, self.ctx.rtt, self.ctx.digest)
         Logger.info(f"[SW] Transfer completed to {self.ctx.dest}")
         self.ctx.completed = True
         return 
 
 class StopAndWaitProtocol:
     def __init__(self, sock: socket.socket, dest: tuple, file_path: str,
-                 packetizer: Packetizer = None, timeout: float = 10.0):
+                 packetizer: Packetizer = None, timeout: float = 10.0, rtt: RttEstimator = None,
+                 rate: float = None, chunk_size: int = None, compressor: ChunkCompressor = None,
+                 resume: ResumeState = None, offset: int = 0, length: int = None):
         self.completed = False
         self.sock = sock
         self.dest = dest
         self.file_path = file_path
         self.timeout = timeout
+        self.chunk_size = chunk_size or ConnectionConfig.CHUNK_SIZE
+        self.rtt = rtt or RttEstimator(initial_rto=timeout)
+        self.pacer = TokenBucketPacer(rate)
         self.seq = 0
-        self.reader = self._file_reader()
+        # Con offset/length se manda solo ese rango del archivo; un rango no se retoma
+        self.offset = offset
+        self.length = length
+        # El receptor SW escribe en orden: al retomar se arranca en su prefijo completo
+        if resume is not None:
+            if resume.size == os.path.getsize(file_path):
+                self.seq = resume.first_missing(self.chunk_size)
+            else:
+                Logger.error(who=self.sock.getsockname(), message=f"[SW] Resume state is for a {resume.size} byte file, sending everything")
+        self.chunk = None
+        self.compressed = False
+        self.retransmission = False
+        self.digest = StreamDigest()
+        self.reader = self._file_reader(self.chunk_size, self.seq)
         self.packetizer = packetizer or DefaultPacketizer()
+        self.compressor = compressor
+        self.acks = BatchReceiver(sock, 2048, enabled=False)
         self.states = {
             'idle': IdleState(self),
             'sending': SendingState(self),
@@ -85,12 +131,28 @@ class StopAndWaitProtocol:
         self.sock.settimeout(self.timeout + 0.1)
         Logger.debug(who=self.sock.getsockname(), message=f"StopAndWaitProtocol initialized for {dest}, file: {file_path}")
 
-    def _file_reader(self, chunk_size: int = 1024):
+    @property
+    def rto(self):
+        return self.rtt.rto
+
+    @property
+    def rtt_samples(self):
+        return list(self.rtt.samples)
+
+    def _file_reader(self, chunk_size: int, start: int = 0):
         with open(self.file_path, 'rb') as f:
-            while True:
-                data = f.read(chunk_size)
+            # Lo que ya tiene el receptor no se manda, pero entra igual al digest
+            hash_prefix(f, start * chunk_size, self.digest)
+            if self.offset:
+                f.seek(self.offset)
+            remaining = self.length
+            while remaining is None or remaining > 0:
+                data = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
                 if not data:
                     break
+                if remaining is not None:
+                    remaining -= len(data)
+                self.digest.update(data)
                 yield data
 
     def start(self):
@@ -111,55 +173,117 @@ class StopAndWaitProtocol:
         Logger.debug(who=self.dest, message="Socket closed.")
 
 class StopAndWaitReceiver:
-    def __init__(self, sock: socket.socket, output_path: str, packetizer: Packetizer = None, timeout: float = 1.0):
+    def __init__(self, sock: socket.socket, output_path: str, packetizer: Packetizer = None, timeout: float = 1.0,
+                 ack_policy: AckPolicy = None, chunk_size: int = None, compressor: ChunkCompressor = None,
+                 resume: ResumeState = None, offset: int = None):
         self.sock = sock
         self.output_path = output_path
+        # Con offset se recibe un rango dentro de un archivo que ya existe: se escribe
+        # en orden desde offset sin truncar lo que hay alrededor
+        self.offset = offset
         self.packetizer = packetizer or DefaultPacketizer()
+        self.chunk_size = chunk_size or ConnectionConfig.CHUNK_SIZE
+        # El buffer de recepción alcanza justo para un DATA con el chunk acordado
+        self.bufsize = self.chunk_size + self.packetizer.HEADER_SIZE
+        # Un DATA por vez: sin GRO, pero leyendo en buffers reutilizables
+        self.receiver = BatchReceiver(sock, self.bufsize, enabled=False)
+        self.compressor = compressor
         self.timeout = timeout
+        self.ack_policy = ack_policy or AckPolicy(ConnectionConfig.SW_ACK_EVERY, ConnectionConfig.ACK_DELAY)
         self.expected_seq = 0
+        self.digest = StreamDigest()
+        self.verified = None
+        # Al retomar se sigue desde el prefijo contiguo que quedó en disco
+        self.resume = resume
+        if resume is not None and os.path.exists(output_path):
+            self.expected_seq = resume.first_missing(self.chunk_size)
+        self.peer = None
         self.running = True
         self.sock.settimeout(timeout + 0.1)
         Logger.debug(who=self.sock.getsockname(), message=f"StopAndWaitReceiver initialized, output: {output_path}")
 
     def start(self):
         Logger.info("[SW-Receiver] Receiver started.")
-        with open(self.output_path, 'wb') as f:
-            while self.running:
-                try:
-                    packet, addr = self.sock.recvfrom(2048)
-                    Logger.debug(
-                        who=self.sock.getsockname(),
-                        message=f"[SW-Receiver] Raw packet received from {addr}: {packet!r}"
-                    )
-                    if self.packetizer.is_data(packet):
-                        seq = self.packetizer.extract_seq(packet)
-                        Logger.debug(who=self.sock.getsockname(), message=f"[SW-Receiver] Received DATA seq={seq} from {addr}")
-
-                        if seq == self.expected_seq:
-                            data = self.packetizer.extract_data(packet)
-                            Logger.debug(who=self.sock.getsockname(), message=f"[SW-Receiver] data extracted={data}")
-                            test = f.write(data)
-                            Logger.debug(who=self.sock.getsockname(), message=f"[SW-Receiver] data written gil={test}")
-                            self.expected_seq = self.expected_seq + 1
-                            Logger.debug(who=self.sock.getsockname(), message=f"[SW-Receiver] data written self.expected_seq={self.expected_seq}")
-                            
-                            Logger.debug(who=self.sock.getsockname(), message=f"[SW-Receiver] Written DATA seq={seq}")
-                        else:
-                            Logger.debug(who=self.sock.getsockname(), message="[SW-Receiver] Duplicate/out-of-order packet ignored.")
-
-                        ack = self.packetizer.make_ack_packet(seq)
-                        self.sock.sendto(ack, addr)
-                        Logger.debug(who=self.sock.getsockname(), message=f"[SW-Receiver] Sent ACK seq={seq} to {addr}")
-
-                    elif self.packetizer.is_terminate(packet):
-                        Logger.info("[SW-Receiver] Received terminate signal.")
-                        self.running = False
-
-                except socket.timeout:
-                    continue
+        with open(self.output_path, 'r+b' if self.expected_seq or self.offset is not None else 'wb') as f:
+            if self.offset is not None:
+                f.seek(self.offset)
+            if self.expected_seq:
+                Logger.info(f"[SW-Receiver] Resuming at chunk {self.expected_seq}")
+                reopen_prefix(f, min(self.expected_seq * self.chunk_size, self.resume.size), self.digest)
+            try:
+                while self.running:
+                    try:
+                        self.sock.settimeout(self.ack_policy.time_left(self.timeout + 0.1))
+                        packet, addr = self.receiver.recv_packet()
+                        self._on_packet(packet, addr, f)
+                    except socket.timeout:
+                        self._on_idle()
+            finally:
+                self._save_progress(f, final=True)
 
+        check_received(self.output_path, self.verified, self.offset)
         Logger.info(f"[SW-Receiver] File received and saved to {self.output_path}")
-        
+
+    def _on_packet(self, packet, addr, f):
+        Logger.debug(
+            who=self.sock.getsockname(),
+            message=f"[SW-Receiver] Raw packet received from {addr}: {packet!r}"
+        )
+        if self.packetizer.is_data(packet):
+            seq = self.packetizer.extract_seq(packet)
+            Logger.debug(who=self.sock.getsockname(), message=f"[SW-Receiver] Received DATA seq={seq} from {addr}")
+            self.peer = addr
+            in_order = seq == self.expected_seq
+
+            if in_order:
+                try:
+                    data = extract_payload(packet, self.packetizer, self.compressor)
+                except CompressionError as e:
+                    # Sin ACK: el emisor lo retransmite al vencer el RTO
+                    Logger.debug(who=self.sock.getsockname(), message=f"[SW-Receiver] Dropped seq={seq}: {e}")
+                    return
+                Logger.debug(who=self.sock.getsockname(), message=f"[SW-Receiver] data extracted={data}")
+                test = f.write(data)
+                self.digest.update(data)
+                Logger.debug(who=self.sock.getsockname(), message=f"[SW-Receiver] data written gil={test}")
+                self.expected_seq = self.expected_seq + 1
+                Logger.debug(who=self.sock.getsockname(), message=f"[SW-Receiver] data written self.expected_seq={self.expected_seq}")
+                
+                Logger.debug(who=self.sock.getsockname(), message=f"[SW-Receiver] Written DATA seq={seq}")
+                self._save_progress(f)
+            else:
+                Logger.debug(who=self.sock.getsockname(), message="[SW-Receiver] Duplicate/out-of-order packet ignored.")
+
+            immediate = not in_order or self.packetizer.extract_flags(packet) & self.packetizer.FLAG_ACK_NOW
+            if self.ack_policy.on_packet(self.packetizer.extract_timestamp(packet), immediate):
+                self._send_ack(seq, addr)
+
+        elif self.packetizer.is_terminate(packet):
+            Logger.info("[SW-Receiver] Received terminate signal.")
+            self.verified = self.digest.matches(self.packetizer.extract_digest(packet))
+            self.sock.sendto(self.packetizer.make_terminate_ack_packet(self.verified), addr)
+            self.running = False
+
+    def _on_idle(self):
+        if self.ack_policy.due():
+            self._send_ack(self.expected_seq - 1, self.peer)
+
+    def _send_ack(self, seq, addr):
+        ack = self.packetizer.make_ack_packet(seq, self.ack_policy.on_ack_sent())
+        self.sock.sendto(ack, addr)
+        Logger.debug(who=self.sock.getsockname(), message=f"[SW-Receiver] Sent ACK seq={seq} to {addr}")
+
+    def _save_progress(self, f, final=False):
+        if self.resume is None or not (final or self.resume.due()):
+            return
+        if final and not self.running:
+            ResumeState.discard(self.output_path)
+            return
+        # El estado no puede anunciar chunks que siguen en el buffer de Python
+        f.flush()
+        self.resume.record(self.chunk_size, self.expected_seq)
+        self.resume.save(self.output_path)
+
     def close(self):
         try:
             self.sock.close()
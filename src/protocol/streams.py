@@ -0,0 +1,198 @@
+# protocol/streams.py
+import os
+import socket
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, unquote
+from protocol.connection_socket import ConnectionSocket
+from protocol.multiplexer import MuxSocket, frame, unframe
+from protocol.rtt_estimator import RttEstimator
+from protocol.udp_offload import BatchReceiver
+from utils import Logger, ConnectionConfig
+
+# Tamaño con el que el servidor rechaza una entrada del pedido
+REJECTED = -1
+
+
+def write_listing(path: str, entries):
+    """Una línea por archivo: tamaño y nombre escapado, como en el handshake."""
+    with open(path, 'w', encoding='ascii') as f:
+        for name, size in entries:
+            f.write(f"{size}\t{quote(name, safe='')}\n")
+
+
+def read_listing(path: str) -> list:
+    with open(path, encoding='ascii') as f:
+        entries = []
+        for line in f:
+            size, _, name = line.rstrip('\n').partition('\t')
+            entries.append((unquote(name), int(size)))
+        return entries
+
+
+def _temp_path(directory, suffix):
+    fd, path = tempfile.mkstemp(dir=directory, prefix=".", suffix=suffix)
+    os.close(fd)
+    return path
+
+
+def request_listing(entries, send, receive) -> list:
+    """
+    Cliente: manda el pedido [(nombre, tamaño)] con send(path) y devuelve la respuesta
+    del servidor, que llega con receive(path): las entradas en el mismo orden, con el
+    tamaño acordado o REJECTED. La entrada i viaja después en el stream i + 1.
+    """
+    request, reply = _temp_path(None, ".request"), _temp_path(None, ".reply")
+    try:
+        write_listing(request, entries)
+        send(request)
+        receive(reply)
+        return read_listing(reply)
+    finally:
+        os.remove(request)
+        os.remove(reply)
+
+
+def answer_listing(receive, send, decide, directory) -> list:
+    """Servidor: recibe el pedido, contesta decide(nombre, tamaño) por entrada y devuelve la respuesta."""
+    request, reply = _temp_path(directory, ".request"), _temp_path(directory, ".reply")
+    try:
+        receive(request)
+        answer = [(name, decide(name, size)) for name, size in read_listing(request)]
+        write_listing(reply, answer)
+        send(reply)
+        return answer
+    finally:
+        os.remove(request)
+        os.remove(reply)
+
+
+class StreamSocket(MuxSocket):
+    """
+    Un stream dentro de la conexión: como MuxSocket, pero el id va en la cabecera de
+    multiplexado sobre el socket de la conexión. Recuerda lo último que mandó (el
+    TERM_ACK de un receptor) para contestar un TERM repetido después de cerrarse.
+    Si el par cierra la conexión le llega el FIN y después recvfrom falla: un motor
+    que espera datos que ya no van a venir no queda colgado.
+    """
+    def __init__(self, mux, stream_id: int, peer: tuple):
+        super().__init__(mux, stream_id, peer)
+        self.last_sent = None
+        self.aborted = False
+
+    def sendto(self, data, addr):
+        self.last_sent = data
+        # El id del stream va siempre en la cabecera: el del codec es el de la conexión
+        self.mux.sock.sendto(frame(self.cid, data), addr)
+
+    def recvfrom(self, bufsize):
+        if self.aborted and self.queue.empty():
+            raise ConnectionResetError(f"Connection closed by the peer during stream {self.cid}")
+        return super().recvfrom(bufsize)
+
+    def abort(self):
+        # Si la cola está llena el FIN no entra, pero con aborted recvfrom falla al vaciarla
+        self.aborted = True
+        self.deliver(self.mux.packetizer.make_fin_packet(), self.peer)
+
+
+class StreamMultiplexer:
+    """
+    Varios archivos a la vez sobre una sola conexión ya establecida: cada uno en su
+    stream, con su propio motor (seqs, ventana, RTT y control de congestión), así una
+    pérdida en uno no frena a los demás. Un hilo lee el socket de la conexión y reparte
+    por id de stream, como ConnectionMultiplexer por connection ID; lo que no lleva
+    cabecera (el FIN del cierre) no es de ningún stream.
+    """
+    def __init__(self, conn, packetizer):
+        self.conn = conn
+        self.sock = conn.socket
+        self.packetizer = packetizer
+        self.streams = {}
+        self.finished = {}
+        self.lock = threading.Lock()
+        self.running = True
+        # Timeout corto: stop() espera a que el despachador suelte el socket
+        self.sock.settimeout(ConnectionConfig.STREAM_POLL)
+        self.receiver = BatchReceiver(self.sock, 65535)
+        self.thread = threading.Thread(target=self._run, name="stream-dispatcher", daemon=True)
+        self.thread.start()
+
+    def open(self, stream_id: int) -> ConnectionSocket:
+        """La vista de la conexión para el motor del stream: su socket, su RTT, las mismas opciones."""
+        stream = StreamSocket(self, stream_id, self.conn.destination_address)
+        with self.lock:
+            self.streams[stream_id] = stream
+        view = ConnectionSocket(self.conn.destination_address, sock=stream)
+        view.rtt = RttEstimator(initial_rto=self.conn.rtt.rto)
+        view.options = self.conn.options
+        return view
+
+    def unregister(self, stream: StreamSocket):
+        with self.lock:
+            self.streams.pop(stream.cid, None)
+            if stream.last_sent is not None and self.packetizer.is_terminate_ack(stream.last_sent):
+                self.finished[stream.cid] = stream.last_sent
+
+    def run(self, jobs: list, window: int) -> int:
+        """
+        jobs: [(stream_id, transfer)], donde transfer(view) corre el motor del stream.
+        Todos los streams se abren de entrada: lo que llega de uno que todavía no
+        arrancó espera en su cola. Corren hasta window a la vez; devuelve cuántos fallaron.
+        """
+        views = {stream_id: self.open(stream_id) for stream_id, _ in jobs}
+
+        def run_one(job):
+            stream_id, transfer = job
+            try:
+                transfer(views[stream_id])
+                return True
+            except Exception as e:
+                Logger.error(f"Stream {stream_id} failed: {e}")
+                return False
+            finally:
+                views[stream_id].socket.close()
+
+        with ThreadPoolExecutor(max_workers=max(1, window), thread_name_prefix="stream") as pool:
+            return list(pool.map(run_one, jobs)).count(False)
+
+    def _run(self):
+        while self.running:
+            try:
+                packets, addr = self.receiver.recv()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            for data in packets:
+                self._dispatch(bytes(data), addr)
+
+    def _dispatch(self, data, addr):
+        stream_id, payload = unframe(data)
+        if stream_id is None:
+            if self.packetizer.is_fin(data):
+                # El par ya terminó sus streams: los que siguen esperando no van a recibir nada
+                with self.lock:
+                    streams = list(self.streams.values())
+                for stream in streams:
+                    stream.abort()
+            return
+        with self.lock:
+            stream = self.streams.get(stream_id)
+            last = self.finished.get(stream_id)
+        if stream is not None and addr != stream.peer:
+            Logger.debug(who=self.sock.getsockname(), message=f"Dropped datagram for stream {stream_id} from {addr}, not the peer")
+        elif stream is not None:
+            if not stream.deliver(payload, addr):
+                Logger.debug(who=self.sock.getsockname(), message=f"Queue full for stream {stream_id}, datagram dropped")
+        elif last is not None and self.packetizer.is_terminate(payload):
+            # El emisor no recibió el TERM_ACK y repite el TERM de un stream ya cerrado
+            self.sock.sendto(frame(stream_id, last), addr)
+        else:
+            Logger.debug(who=self.sock.getsockname(), message=f"Dropped datagram for unknown stream {stream_id}")
+
+    def stop(self):
+        # Desde acá el socket vuelve a ser de la conexión (el cierre lee el FIN directo)
+        self.running = False
+        self.thread.join()
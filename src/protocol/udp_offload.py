@@ -0,0 +1,176 @@
+# protocol/udp_offload.py
+import socket
+import struct
+from utils import Logger, ConnectionConfig
+
+# Constantes de Linux (>= 4.18 para GSO, >= 5.0 para GRO); Python no siempre las expone
+SOL_UDP = getattr(socket, 'SOL_UDP', 17)
+UDP_SEGMENT = getattr(socket, 'UDP_SEGMENT', 103)
+UDP_GRO = getattr(socket, 'UDP_GRO', 104)
+
+# Límites del kernel para un envío segmentado
+UDP_MAX_SEGMENTS = 64
+MAX_GSO_PAYLOAD = 65507
+
+
+class BatchSender:
+    """
+    Envía varios paquetes del mismo largo con un solo sendmsg usando UDP_SEGMENT (GSO):
+    el kernel los corta en datagramas de `segment` bytes (el último puede ser menor).
+    Si el socket no lo soporta (otro SO, socket envuelto, kernel viejo) se usa sendto.
+    """
+    def __init__(self, sock, enabled: bool = True):
+        self.sock = sock
+        self.enabled = enabled and self._enable()
+        # Con sendmsg la cabecera y el payload viajan como buffers separados (scatter-gather)
+        self.vectored = hasattr(sock, 'sendmsg')
+
+    def _enable(self):
+        if not (hasattr(self.sock, 'sendmsg') and hasattr(self.sock, 'setsockopt')):
+            return False
+        try:
+            # 0 deja el GSO por defecto apagado; el tamaño va en cada sendmsg
+            self.sock.setsockopt(SOL_UDP, UDP_SEGMENT, 0)
+            return True
+        except OSError:
+            return False
+
+    def batch_limit(self, packet_size: int) -> int:
+        """Cuántos paquetes de packet_size entran en un envío."""
+        if not self.enabled:
+            return 1
+        return max(1, min(UDP_MAX_SEGMENTS, MAX_GSO_PAYLOAD // packet_size))
+
+    def send_vectored(self, packets: list, dest: tuple):
+        """
+        Cada paquete es una lista de buffers (cabecera, memoryview del payload) que el
+        kernel junta: el payload no se copia en Python. Los paquetes no tienen que medir
+        lo mismo. Sin sendmsg (socket envuelto) se concatena y se usa sendto.
+        """
+        sizes = [sum(map(len, packet)) for packet in packets] if self.enabled else None
+        start = 0
+        while start < len(packets):
+            end = self._same_size_run(sizes, start) if self.enabled else len(packets)
+            if end - start > 1 and self.enabled and self._send_segments(packets[start:end], sizes[start], dest):
+                start = end
+                continue
+            for packet in packets[start:end]:
+                if self.vectored:
+                    self.sock.sendmsg(packet, [], 0, dest)
+                else:
+                    self.sock.sendto(b''.join(packet), dest)
+            start = end
+
+    @staticmethod
+    def _same_size_run(sizes: list, start: int) -> int:
+        # GSO corta en segmentos iguales y solo el último puede ser menor: con payloads
+        # de largo variable (comprimidos) la tanda se manda en tramos de igual largo
+        size = sizes[start]
+        end = start + 1
+        while end < len(sizes):
+            if sizes[end] > size:
+                break
+            end += 1
+            if sizes[end - 1] < size:
+                break
+        return end
+
+    def _send_segments(self, packets: list, segment: int, dest: tuple) -> bool:
+        try:
+            self.sock.sendmsg([buffer for packet in packets for buffer in packet],
+                              [(SOL_UDP, UDP_SEGMENT, struct.pack('H', segment))], 0, dest)
+            return True
+        except OSError as e:
+            Logger.debug(who=self.sock.getsockname(), message=f"GSO send failed ({e}), falling back to sendmsg")
+            self.enabled = False
+            return False
+
+
+class BufferPool:
+    """
+    Buffers de recepción preasignados que se entregan en rueda. Lo leído en uno
+    sigue válido hasta que la rueda vuelve a él, count - 1 recepciones después.
+    """
+    def __init__(self, count: int, size: int):
+        self.views = [memoryview(bytearray(size)) for _ in range(max(1, count))]
+        self.index = 0
+
+    def next(self) -> memoryview:
+        view = self.views[self.index]
+        self.index = (self.index + 1) % len(self.views)
+        return view
+
+
+class BatchReceiver:
+    """
+    Recibe con UDP_GRO: el kernel puede entregar varios datagramas del mismo emisor
+    pegados en uno solo, con el tamaño de segmento en un mensaje de control.
+    recv() devuelve siempre una lista de paquetes individuales y la dirección.
+    Los paquetes son memoryviews sobre un buffer del pool (recvmsg_into/recvfrom_into),
+    sin copias: quien necesite conservarlos más allá de la rueda debe copiarlos.
+    """
+    def __init__(self, sock, bufsize: int, enabled: bool = True, pool_size: int = None):
+        self.sock = sock
+        self.bufsize = bufsize
+        self.enabled = enabled and self._enable()
+        if self.enabled:
+            self.bufsize = max(bufsize, MAX_GSO_PAYLOAD)
+        # Los sockets envueltos (pérdidas simuladas, multiplexado) solo tienen recvfrom
+        self.into = hasattr(sock, 'recvmsg_into') and hasattr(sock, 'recvfrom_into')
+        if self.into:
+            self.pool = BufferPool(pool_size or ConnectionConfig.RECV_POOL_SIZE, self.bufsize)
+
+    def _enable(self):
+        if not (hasattr(self.sock, 'recvmsg_into') and hasattr(self.sock, 'setsockopt')):
+            return False
+        try:
+            self.sock.setsockopt(SOL_UDP, UDP_GRO, 1)
+            return True
+        except OSError:
+            return False
+
+    def recv(self):
+        if not self.into:
+            packet, addr = self.sock.recvfrom(self.bufsize)
+            return [packet], addr
+        buffer = self.pool.next()
+        if not self.enabled:
+            nbytes, addr = self.sock.recvfrom_into(buffer)
+            return [buffer[:nbytes]], addr
+        nbytes, ancdata, _, addr = self.sock.recvmsg_into([buffer], socket.CMSG_SPACE(4))
+        for level, kind, value in ancdata:
+            if level == SOL_UDP and kind == UDP_GRO:
+                segment = struct.unpack('i', value[:4])[0]
+                return [buffer[i:min(i + segment, nbytes)] for i in range(0, nbytes, segment)], addr
+        return [buffer[:nbytes]], addr
+
+    def recv_packet(self):
+        """Un solo datagrama como (paquete, dirección), para quien no usa GRO."""
+        packets, addr = self.recv()
+        return packets[0], addr
+
+
+def payload_bytes(packets) -> int:
+    """Bytes de payload de una tanda de paquetes [cabecera, payload]: lo que cuenta el pacing."""
+    return sum(len(packet[-1]) for packet in packets)
+
+
+def tune_socket_buffers(sock, bdp: int) -> tuple:
+    """
+    Ajusta SO_SNDBUF/SO_RCVBUF al doble del producto ancho de banda × demora (en bytes),
+    dentro de [MIN_SOCKET_BUFFER, MAX_SOCKET_BUFFER]. El kernel puede recortarlo
+    a net.core.{w,r}mem_max; devuelve los tamaños que efectivamente quedaron.
+    """
+    if not hasattr(sock, 'setsockopt'):
+        return None
+    size = max(ConnectionConfig.MIN_SOCKET_BUFFER, min(2 * int(bdp), ConnectionConfig.MAX_SOCKET_BUFFER))
+    for option in (socket.SO_SNDBUF, socket.SO_RCVBUF):
+        try:
+            if sock.getsockopt(socket.SOL_SOCKET, option) < size:
+                sock.setsockopt(socket.SOL_SOCKET, option, size)
+        except OSError:
+            pass
+    sizes = (sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF),
+             sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF))
+    Logger.debug(who=sock.getsockname(), message=f"Socket buffers for BDP {int(bdp)}: snd={sizes[0]} rcv={sizes[1]}")
+    return sizes
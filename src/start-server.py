@@ -1,18 +1,294 @@
 import os
+import socket
 import sys
 import argparse
+import shutil
+import tempfile
 import threading
+import time
+import multiprocessing
+from protocol.ack_policy import make_ack_policy
+from protocol.chunk_store import ChunkStore, read_manifest
+from protocol.codec import WireCodec, make_packetizer
+from protocol.compression import ChunkCompressor, make_compressor
+from protocol.delta import apply_delta, write_signatures
+from protocol.congestion_control import CONGESTION_CONTROLLERS, make_congestion_controller
+from protocol.pacer import parse_rate
+from protocol.ranges import RangeError, agreed_range, format_range, options_range
+from protocol.resume import ResumeState, agreed_resume, receiver_resume
+from protocol.go_back_n import GoBackNProtocol, GoBackNReceiver
 from protocol.selective_repeat import SelectiveRepeatProtocol,SelectiveRepeatReceiver
 from protocol.server_listener import ServerManager
+from protocol.streams import REJECTED, StreamMultiplexer, answer_listing
 from protocol.stop_and_wait import StopAndWaitProtocol, StopAndWaitReceiver
 from argparse import Namespace
 from protocol.connection_closing import ConnectionClosingProtocol
 from utils import VerbosityLevel, Logger, ConnectionConfig, CustomHelpFormatter
 
-def handle_client(conn, mode, file_path, protocol_choice):
+def make_sender(conn, file_path, args, resume=None, file_range=None):
+    """El motor que manda file_path (o solo file_range, (inicio, fin)) según el protocolo del servidor."""
+    offset, length = (file_range[0], file_range[1] - file_range[0]) if file_range else (0, None)
+    rate = float(conn.options["rate"]) if "rate" in conn.options else None
+    chunk_size = int(conn.options.get("chunk", ConnectionConfig.CHUNK_SIZE))
+    packetizer = make_packetizer(conn.options)
+    compressor = make_compressor(conn.options)
+    if args.protocol == "sw":
+        return StopAndWaitProtocol(
+            sock=conn.socket,
+            dest=conn.destination_address,
+            file_path=file_path,
+            timeout=ConnectionConfig.TIMEOUT,
+            rtt=conn.rtt,
+            rate=rate,
+            chunk_size=chunk_size,
+            packetizer=packetizer,
+            compressor=compressor,
+            resume=resume,
+            offset=offset,
+            length=length
+        )
+    elif args.protocol == "gbn":
+        return GoBackNProtocol(
+            sock=conn.socket,
+            dest=conn.destination_address,
+            file_path=file_path,
+            timeout=ConnectionConfig.TIMEOUT,
+            window_size=ConnectionConfig.GBN_WINDOW_SIZE,
+            rtt=conn.rtt,
+            congestion=make_congestion_controller(
+                conn.options.get("cc", args.congestion),
+                ConnectionConfig.GBN_WINDOW_SIZE
+            ),
+            rate=rate,
+            chunk_size=chunk_size,
+            packetizer=packetizer,
+            compressor=compressor,
+            resume=resume,
+            offset=offset,
+            length=length
+        )
+    return SelectiveRepeatProtocol(
+        sock=conn.socket,
+        dest=conn.destination_address,
+        file_path=file_path,
+        timeout=ConnectionConfig.TIMEOUT,
+        window_size=ConnectionConfig.SR_WINDOW_SIZE,
+        rtt=conn.rtt,
+        # El cliente puede pedir un algoritmo; si no, se usa el del servidor
+        congestion=make_congestion_controller(
+            conn.options.get("cc", args.congestion),
+            ConnectionConfig.SR_WINDOW_SIZE
+        ),
+        rate=rate,
+        chunk_size=chunk_size,
+        packetizer=packetizer,
+        compressor=compressor,
+        resume=resume,
+        offset=offset,
+        length=length
+    )
+
+
+def make_receiver(conn, output_path, args, resume=None, file_size=None):
+    """El motor que recibe en output_path, con la política de ACKs que pidió el cliente."""
+    chunk_size = int(conn.options.get("chunk", ConnectionConfig.CHUNK_SIZE))
+    packetizer = make_packetizer(conn.options)
+    compressor = make_compressor(conn.options)
+    # El cliente puede pedir otra política de ACKs para su conexión
+    ack_policy = make_ack_policy(
+        args.protocol,
+        conn.options.get("ack_every", args.ack_every),
+        conn.options.get("ack_delay", args.ack_delay)
+    )
+    if args.protocol == "sw":
+        return StopAndWaitReceiver(
+            sock=conn.socket,
+            output_path=output_path,
+            timeout=ConnectionConfig.TIMEOUT,
+            ack_policy=ack_policy,
+            chunk_size=chunk_size,
+            packetizer=packetizer,
+            compressor=compressor,
+            resume=resume
+        )
+    elif args.protocol == "gbn":
+        return GoBackNReceiver(
+            sock=conn.socket,
+            output_path=output_path,
+            timeout=ConnectionConfig.TIMEOUT,
+            ack_policy=ack_policy,
+            chunk_size=chunk_size,
+            packetizer=packetizer,
+            compressor=compressor,
+            resume=resume
+        )
+    return SelectiveRepeatReceiver(
+        sock=conn.socket,
+        output_path=output_path,
+        timeout=ConnectionConfig.TIMEOUT,
+        window_size=ConnectionConfig.SR_WINDOW_SIZE,
+        ack_policy=ack_policy,
+        chunk_size=chunk_size,
+        packetizer=packetizer,
+        compressor=compressor,
+        file_size=file_size,
+        resume=resume
+    )
+
+
+def complete_file(file_path):
+    """Un archivo del storage que se puede servir: existe y no es un parcial que espera que lo retomen."""
+    return os.path.isfile(file_path) and not ResumeState.pending(file_path)
+
+
+def reserved_name(name):
+    """Lo que el servidor guarda en el storage para sí: el estado de los parciales y el storage de chunks."""
+    return name == ChunkStore.DIR or ResumeState.is_state_file(name)
+
+
+def storage_name(name, storage):
+    """
+    Un nombre que el cliente puede pedir: un archivo simple dentro del storage. Nada
+    de directorios ni ocultos (índice, temporales) ni lo que el servidor guarda para sí,
+    y el archivo tiene que quedar en el storage aunque sea un enlace.
+    """
+    if not name or os.path.basename(name) != name or name.startswith(".") or reserved_name(name):
+        return False
+    storage = os.path.realpath(storage)
+    return os.path.dirname(os.path.realpath(os.path.join(storage, name))) == storage
+
+
+def upload_size(size, file_path, reserved=0):
+    """
+    El tamaño que anuncia quien sube, si entra en el storage; REJECTED si no. El
+    receptor lo reserva de entrada: no se acepta uno negativo ni más que el espacio
+    libre (más lo que ya ocupa un parcial que se retoma, menos lo ya reservado).
+    """
+    try:
+        size = int(size)
+    except ValueError:
+        return REJECTED
+    available = shutil.disk_usage(os.path.dirname(file_path) or ".").free - reserved
+    if os.path.isfile(file_path):
+        available += os.path.getsize(file_path)
+    return size if 0 <= size <= available else REJECTED
+
+
+def receive_delta(conn, file_path, args):
+    """
+    Subida delta sobre una copia existente: se mandan las firmas de sus bloques, se
+    recibe el delta que arma el cliente y se rearma el archivo al lado. La copia vieja
+    se reemplaza recién cuando el resultado coincide con el digest del cliente.
+    """
+    block_size = int(conn.options["delta"])
+    storage = os.path.dirname(file_path) or "."
+    fd, signature_path = tempfile.mkstemp(dir=storage, prefix=".", suffix=".sig")
+    os.close(fd)
+    fd, delta_path = tempfile.mkstemp(dir=storage, prefix=".", suffix=".delta")
+    os.close(fd)
+    try:
+        write_signatures(file_path, signature_path, block_size)
+        make_sender(conn, signature_path, args).start()
+        make_receiver(conn, delta_path, args).start()
+        apply_delta(file_path, delta_path, file_path)
+        Logger.info(f"Delta de {os.path.getsize(delta_path)} bytes aplicado sobre {file_path}")
+    finally:
+        for path in (signature_path, delta_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def receive_dedup(conn, file_path, args, store):
+    """
+    Subida con dedup: el cliente manda el manifiesto (hash de cada chunk), se le
+    contesta con el bitmap de los que el storage no tiene y se reciben solo esos. El
+    archivo se rearma con los demás chunks tomados de los archivos que ya los tienen.
+    """
+    storage = os.path.dirname(file_path) or "."
+    paths = []
+    for suffix in (".manifest", ".wanted", ".chunks"):
+        fd, path = tempfile.mkstemp(dir=storage, prefix=".", suffix=suffix)
+        os.close(fd)
+        paths.append(path)
+    manifest_path, wanted_path, data_path = paths
+    try:
+        make_receiver(conn, manifest_path, args).start()
+        manifest = read_manifest(manifest_path)
+        wanted = store.missing(manifest)
+        with open(wanted_path, 'wb') as f:
+            f.write(wanted.bits)
+        make_sender(conn, wanted_path, args).start()
+        make_receiver(conn, data_path, args).start()
+        store.assemble(manifest, wanted, data_path, file_path)
+        Logger.info(f"Dedup: {wanted.count} de {len(manifest.hashes)} chunks recibidos para {file_path}")
+    finally:
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def serve_streams(conn, mode, args, store=None):
+    """
+    Varios archivos en una conexión: se recibe el pedido (nombre y tamaño de cada uno),
+    se contesta qué se acepta y cada archivo aceptado viaja en su propio stream.
+    """
+    requested = set()
+    reserved = [0]
+
+    def decide(name, size):
+        file_path = os.path.join(args.storage, name)
+        if not storage_name(name, args.storage) or name in requested:
+            return REJECTED
+        requested.add(name)
+        if mode == "download":
+            return os.path.getsize(file_path) if complete_file(file_path) else REJECTED
+        if os.path.exists(file_path):
+            return REJECTED
+        # Los archivos del pedido se reservan todos: cada uno cuenta contra el espacio libre
+        size = upload_size(size, file_path, reserved[0])
+        if size != REJECTED:
+            reserved[0] += size
+        return size
+
+    answer = answer_listing(
+        lambda path: make_receiver(conn, path, args).start(),
+        lambda path: make_sender(conn, path, args).start(),
+        decide, args.storage
+    )
+    jobs = []
+    for stream_id, (name, size) in enumerate(answer, 1):
+        if size == REJECTED:
+            continue
+        file_path = os.path.join(args.storage, name)
+        if mode == "download":
+            jobs.append((stream_id, lambda view, path=file_path: make_sender(view, path, args).start()))
+        else:
+            jobs.append((stream_id, lambda view, path=file_path, size=size: receive_stream(view, path, args, size, store)))
+    Logger.info(f"Streams: {len(jobs)} de {len(answer)} archivos aceptados")
+    mux = StreamMultiplexer(conn, make_packetizer(conn.options))
+    try:
+        failed = mux.run(jobs, int(conn.options["streams"]))
+    finally:
+        mux.stop()
+    if failed:
+        Logger.error(f"Streams: fallaron {failed} de {len(jobs)} archivos")
+
+
+def receive_stream(conn, file_path, args, size, store=None):
+    # Sin retomar por stream: lo que no llegó completo no queda en el storage
+    try:
+        make_receiver(conn, file_path, args, file_size=size).start()
+    except Exception:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    if store is not None:
+        store.add(os.path.basename(file_path))
+
+
+def handle_client(conn, mode, file_path, args, store=None):
     """Handle a single client connection in a separate thread."""
     try:
-        raw_sock = conn.socket
         #output_path = os.path.join(storage, filename)
 
         # Validar que el nombre del archivo no esté vacío
@@ -20,46 +296,44 @@ def handle_client(conn, mode, file_path, protocol_choice):
             Logger.error("El cliente no proporcionó un nombre de archivo válido.")
             return
 
-        # Select protocol based on mode and protocol choice
-        if mode == "download":
-            if not os.path.isfile(file_path):
-                Logger.error(f"No existe el archivo {file_path}")
+        # Con streams cada nombre del pedido se valida aparte
+        if "streams" in conn.options:
+            transfer = lambda: serve_streams(conn, mode, args, store)
+        elif not storage_name(os.path.relpath(file_path, args.storage), args.storage):
+            Logger.error(f"El archivo {file_path} no es un nombre válido del storage")
+            return
+        elif mode == "upload" and int(conn.options.get("size", 0)) == REJECTED:
+            Logger.error(f"El tamaño anunciado para {file_path} no entra en el storage")
+            return
+        elif mode == "download":
+            # Un parcial de una subida cortada no se sirve como si estuviera completo
+            if not complete_file(file_path):
+                Logger.error(f"No existe el archivo {file_path} o su subida no terminó")
                 return
-            if protocol_choice == "sw":
-                protocol = StopAndWaitProtocol(
-                    sock=raw_sock,
-                    dest=conn.destination_address,
-                    file_path=file_path,
-                    timeout=ConnectionConfig.TIMEOUT
-                )
-            else:
-                protocol = SelectiveRepeatProtocol(
-                    sock=raw_sock,
-                    dest=conn.destination_address,
-                    file_path=file_path,
-                    timeout=ConnectionConfig.TIMEOUT,
-                    window_size=ConnectionConfig.SR_WINDOW_SIZE
-                )
+            transfer = make_sender(conn, file_path, args, resume=agreed_resume(conn.options),
+                                   file_range=options_range(conn.options)).start
+        elif "delta" in conn.options:
+            transfer = lambda: receive_delta(conn, file_path, args)
+        elif "dedup" in conn.options:
+            transfer = lambda: receive_dedup(conn, file_path, args, store)
         else:
-            if os.path.isfile(file_path):
+            # Un parcial solo se acepta si se acordó retomarlo
+            if os.path.isfile(file_path) and "resume" not in conn.options:
                 Logger.error(f"Ya existe el archivo {file_path}")#(f"El archivo {sourcefile} ya existe. Por favor seleccione otra ruta.")
                 return
-            if protocol_choice == "sw":
-                protocol = StopAndWaitReceiver(
-                    sock=raw_sock,
-                    output_path=file_path,
-                    timeout=ConnectionConfig.TIMEOUT
-                )
-            else:
-                protocol = SelectiveRepeatReceiver(
-                    sock=raw_sock,
-                    output_path=file_path,
-                    timeout=ConnectionConfig.TIMEOUT,
-                    window_size=ConnectionConfig.SR_WINDOW_SIZE
-                )
+            # Si se corta, el estado queda junto al parcial para retomarlo con --resume
+            transfer = make_receiver(
+                conn, file_path, args,
+                resume=receiver_resume(conn.options),
+                file_size=int(conn.options["size"]) if "size" in conn.options else None
+            ).start
 
         try:
-            protocol.start()
+            transfer()
+            # Lo subido queda indexado para que otras subidas lo reutilicen (dedup ya lo indexa al rearmar)
+            if store is not None and mode == "upload" and "dedup" not in conn.options and "streams" not in conn.options \
+                    and not ResumeState.pending(file_path):
+                store.add(os.path.basename(file_path))
         except Exception as e:
             Logger.error(f"Error durante la transferencia: {e}")
     finally:
@@ -71,18 +345,187 @@ def handle_client(conn, mode, file_path, protocol_choice):
         Logger.info(f"Conexión con cliente {conn.destination_address} finalizada.")
 
 
+def negotiate(args):
+    """Opciones que el servidor acepta o impone a cada conexión."""
+    def agree(mode, filename, options):
+        agreed = dict(options)
+        # Tope de tasa por conexión: el cliente puede pedir menos, nunca más
+        if args.rate:
+            requested = float(options["rate"]) if "rate" in options else args.rate
+            agreed["rate"] = min(requested, args.rate)
+        # El chunk lo propone el cliente y el servidor lo acota
+        if "chunk" in options:
+            agreed["chunk"] = max(1, min(int(options["chunk"]), ConnectionConfig.MAX_CHUNK_SIZE))
+        # Formato de los datos: la versión más alta que entienden los dos
+        if "wire" in options:
+            agreed["wire"] = min(int(options["wire"]), WireCodec.VERSION)
+        # Compresión por chunk: solo con un algoritmo que este servidor conozca
+        if "compress" in options and options["compress"] not in ChunkCompressor.ALGORITHMS:
+            del agreed["compress"]
+        # Varios archivos en streams: cada uno se acuerda en el pedido, sin retomar ni delta/dedup
+        if "streams" in options:
+            agreed["streams"] = max(1, min(int(options["streams"]), ConnectionConfig.STREAM_WINDOW))
+            for option in ("resume", "delta", "dedup", "size", "range"):
+                agreed.pop(option, None)
+            return agreed
+        # Lo que depende del archivo se acuerda solo para un nombre del storage (handle_client rechaza el resto)
+        if not storage_name(filename, args.storage):
+            for option in ("resume", "delta", "dedup", "range"):
+                agreed.pop(option, None)
+            return agreed
+        # Al que descarga se le anuncia el tamaño para que reserve el archivo
+        file_path = os.path.join(args.storage, filename)
+        # El de quien sube lo reserva el servidor: si no entra, handle_client rechaza la subida
+        if mode == "upload" and "size" in options:
+            agreed["size"] = upload_size(options["size"], file_path)
+        if mode == "download" and complete_file(file_path):
+            agreed["size"] = os.path.getsize(file_path)
+        # Rango: una parte de una descarga en paralelo. Se contesta en bytes; no se retoma
+        if "range" in options:
+            try:
+                if mode != "download" or not complete_file(file_path):
+                    raise RangeError("Only an existing file can be downloaded by ranges")
+                chunk_size = int(agreed.get("chunk", ConnectionConfig.CHUNK_SIZE))
+                agreed["range"] = format_range(*agreed_range(options["range"], agreed["size"], chunk_size))
+                agreed.pop("resume", None)
+            except RangeError as e:
+                Logger.error(f"Rango rechazado: {e}")
+                del agreed["range"]
+        # Delta: solo al subir sobre una copia completa (no un parcial a retomar)
+        if "delta" in options:
+            if mode == "upload" and complete_file(file_path):
+                agreed["delta"] = max(1, min(int(options["delta"]), ConnectionConfig.MAX_DELTA_BLOCK))
+                agreed.pop("resume", None)
+            else:
+                del agreed["delta"]
+        # Dedup: solo al subir un archivo nuevo a un servidor con --chunk-store; el chunk lo fija el servidor
+        if "dedup" in options:
+            if mode == "upload" and args.chunk_store and not os.path.exists(file_path):
+                agreed["dedup"] = ConnectionConfig.DEDUP_CHUNK_SIZE
+                agreed.pop("resume", None)
+            else:
+                del agreed["dedup"]
+        if "resume" in agreed:
+            state = resume_state(mode, file_path, options)
+            if state is None:
+                del agreed["resume"]
+            else:
+                agreed["resume"] = state.token()
+        return agreed
+    return agree
+
+
+def resume_state(mode, file_path, options):
+    """
+    El estado desde el que se retoma, o None para arrancar de cero. Al subir lo tiene el
+    servidor junto al parcial; al bajar lo manda el cliente. En los dos casos tiene que
+    ser del mismo tamaño que el archivo: si cambió, el digest final lo detectaría igual.
+    """
+    if not os.path.isfile(file_path):
+        return None
+    if mode == "upload":
+        state = ResumeState.load(file_path)
+        size = int(options.get("size", -1))
+    else:
+        try:
+            state = agreed_resume(options)
+        except ValueError:
+            state = None
+        size = os.path.getsize(file_path)
+    if state is None or state.size != size:
+        return None
+    return state
+
+
+class SharedStopEvent:
+    """Adapta un multiprocessing.Event a la interfaz stop_event.running que usa serve()."""
+    def __init__(self, event):
+        self.event = event
+
+    @property
+    def running(self):
+        return not self.event.is_set()
+
+    @running.setter
+    def running(self, value):
+        if not value:
+            self.event.set()
+
+
+def run_worker(args, index, stop):
+    """Un worker: fija su CPU si se pidió y atiende clientes en el puerto compartido."""
+    if args.cpu_affinity and hasattr(os, "sched_setaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, {cpus[index % len(cpus)]})
+    Logger.setup_name(f'start-server.py[worker {index}]')
+    serve(args, SharedStopEvent(stop), reuse_port=True)
+
+
+def run_workers(args, stop_event):
+    """
+    N procesos escuchando el mismo puerto con SO_REUSEPORT: el kernel reparte
+    los datagramas por dirección de origen, así que cada cliente queda siempre
+    en el mismo worker y cada worker tiene su propio GIL.
+    """
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise SystemExit("--workers necesita SO_REUSEPORT, que este sistema no tiene")
+    if args.chunk_store:
+        start_indexer(ChunkStore(args.storage))
+    stop = multiprocessing.Event()
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(args, i, stop), name=f"worker-{i}", daemon=True)
+        for i in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+    Logger.info(f"Started {args.workers} workers on {args.host}:{args.port}")
+    try:
+        while stop_event.running and any(worker.is_alive() for worker in workers):
+            time.sleep(ConnectionConfig.TIMEOUT)
+    except KeyboardInterrupt:
+        Logger.info("Keyboard interrupt, shutting down workers.")
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join(timeout=2 * ConnectionConfig.TIMEOUT)
+            if worker.is_alive():
+                worker.terminate()
+        Logger.info("Server stopped.")
+
+
 def behaviour(args, stop_event=None):
     """Run the server, stopping when stop_event is set."""
     if not os.path.isdir(args.storage):
         raise SystemExit(f"{args.storage} no es un directorio válido")
 
-    server = ServerManager.start_server(host=args.host, port=args.port)
-    Logger.info(f"Server listening on {args.host}:{args.port}")
-    clients = []
-
     if stop_event is None:
         stop_event = Namespace(running=True)
 
+    if args.workers > 1:
+        run_workers(args, stop_event)
+    else:
+        serve(args, stop_event)
+
+
+def start_indexer(store):
+    """Lo que ya estaba en el storage se indexa de fondo; mientras tanto no se reutiliza."""
+    threading.Thread(target=store.index_storage, name="chunk-indexer", daemon=True).start()
+
+
+def serve(args, stop_event, reuse_port=False):
+    server = ServerManager.start_server(
+        host=args.host, port=args.port, negotiate=negotiate(args),
+        single_port=args.single_port, reuse_port=reuse_port
+    )
+    Logger.info(f"Server listening on {args.host}:{args.port}")
+    clients = []
+    store = None
+    if args.chunk_store:
+        store = ChunkStore(args.storage)
+        # Con varios workers lo indexa una sola vez el proceso principal
+        if not reuse_port:
+            start_indexer(store)
+
     try:
         while stop_event.running:
             try:
@@ -98,7 +541,7 @@ def behaviour(args, stop_event=None):
                 # Create a new thread for each client
                 client_thread = threading.Thread(
                     target=handle_client,
-                    args=(conn, mode, output_path, args.protocol)
+                    args=(conn, mode, output_path, args, store)
                 )
                 client_thread.daemon = True  # Threads terminate when main thread exits
                 client_thread.start()
@@ -129,7 +572,15 @@ if __name__ == '__main__':
     parser.add_argument('-H', '--host'    , metavar='ADDR'     , type=str, default="127.0.0.1", help="service IP address")
     parser.add_argument('-p', '--port'    , metavar='PORT'     , type=int, default=8080, help="service port")
     parser.add_argument('-s', '--storage' , metavar='DIRPATH'  , type=str, default="", help="storage dir path")
-    parser.add_argument('-r', '--protocol', metavar='protocol' , choices=["sw","sr"],default="sw", help="error recovery protocol")
+    parser.add_argument('-r', '--protocol', metavar='protocol' , choices=["sw","sr","gbn"],default="sw", help="error recovery protocol")
+    parser.add_argument('-c', '--congestion', metavar='ALGO'   , choices=list(CONGESTION_CONTROLLERS), default=ConnectionConfig.CONGESTION_CONTROL, help="default congestion control for sr/gbn (none, reno, cubic)")
+    parser.add_argument('--rate'          , metavar='BYTES/S'  , type=parse_rate, default=None, help="per-connection rate limit, e.g. 500K or 10M")
+    parser.add_argument('--ack-every'     , metavar='N'        , type=int, default=None, help="default: acknowledge every N packets on uploads")
+    parser.add_argument('--ack-delay'     , metavar='SECONDS'  , type=float, default=None, help="default max delay before acknowledging a packet")
+    parser.add_argument('--single-port'   , action='store_true', help="serve every connection on the listening port, demultiplexed by connection ID")
+    parser.add_argument('-w', '--workers' , metavar='N'        , type=int, default=1, help="worker processes sharing the port with SO_REUSEPORT")
+    parser.add_argument('--cpu-affinity'  , action='store_true', help="pin each worker to its own CPU")
+    parser.add_argument('--chunk-store'   , action='store_true', help="index stored files by chunk hash so uploads skip chunks the server already has")
     # Parse the arguments
     args = parser.parse_args()
 
@@ -1,45 +1,267 @@
 import argparse
 import os
-from protocol.selective_repeat import SelectiveRepeatProtocol
-from protocol.stop_and_wait import StopAndWaitProtocol
+import tempfile
+from protocol.ack_policy import make_ack_policy
+from protocol.chunk_store import write_manifest, write_wanted
+from protocol.codec import make_packetizer
+from protocol.compression import ChunkCompressor, make_compressor
+from protocol.congestion_control import CONGESTION_CONTROLLERS, make_congestion_controller
+from protocol.delta import write_delta
+from protocol.go_back_n import GoBackNProtocol, GoBackNReceiver
+from protocol.pacer import parse_rate
+from protocol.resume import ResumeState, agreed_resume
+from protocol.selective_repeat import SelectiveRepeatProtocol, SelectiveRepeatReceiver
+from protocol.stop_and_wait import StopAndWaitProtocol, StopAndWaitReceiver
 from protocol.server_listener import ServerManager
-from utils import Logger, VerbosityLevel, CustomHelpFormatter, ConnectionConfig
+from protocol.streams import REJECTED, StreamMultiplexer, request_listing
+from utils import Bitmap, Logger, VerbosityLevel, CustomHelpFormatter, ConnectionConfig
+
+def transfer_options(args):
+    """Lo que se propone en el handshake para cualquier subida."""
+    # Con --pmtu se propone el chunk máximo y el sondeo lo ajusta al camino
+    options = {"chunk": args.chunk_size or (ConnectionConfig.MAX_CHUNK_SIZE if args.pmtu else ConnectionConfig.CHUNK_SIZE)}
+    if args.rate:
+        options["rate"] = args.rate
+    # El servidor es quien recibe: se le pide la política de ACKs
+    if args.ack_every is not None:
+        options["ack_every"] = args.ack_every
+    if args.ack_delay is not None:
+        options["ack_delay"] = args.ack_delay
+    if args.compress:
+        options["compress"] = args.compress
+    return options
+
 
 def behaviour(args):
     
     if not os.path.isfile(args.src):
         raise SystemExit(f"No existe el archivo {args.src}")
     
-    connection, mode, filename = ServerManager.connect_to_server((args.host, args.port), "upload", args.name)
+    options = transfer_options(args)
+    # El servidor reserva el archivo con este tamaño antes de recibirlo
+    options["size"] = os.path.getsize(args.src)
+    # El servidor contesta con lo que ya tiene del archivo, si guardó un parcial
+    if args.resume:
+        options["resume"] = ResumeState.ASK
+    # Si el servidor ya tiene una versión del archivo, manda solo lo que cambió
+    if args.delta:
+        options["delta"] = ConnectionConfig.DELTA_BLOCK_SIZE
+    # Si el servidor indexa sus archivos por contenido, no se mandan los chunks que ya tiene
+    if args.dedup:
+        options["dedup"] = 1
+
+    connection, mode, filename = ServerManager.connect_to_server((args.host, args.port), "upload", args.name, options, args.pmtu)
     Logger.info(f"Handshake completado con servidor en {args.host}:{args.port}, con modo {mode}")
 
-    udp_socket = connection.socket
-    
+    if args.resume and "resume" not in connection.options:
+        Logger.info("El servidor no tiene un parcial para retomar: se envía el archivo completo")
+
     Logger.debug(f"Nombre de archivo enviado en handshake: {filename}")
 
+    try:
+        if "delta" in connection.options:
+            send_delta(args, connection)
+        elif "dedup" in connection.options:
+            send_dedup(args, connection)
+        else:
+            make_sender(args, connection, args.src, resume=agreed_resume(connection.options)).start()
+    finally:
+        # Cerrar el protocolo y la conexión
+        connection.close()
+        Logger.info("Upload completed and connection closed.")
+
+
+def upload_many(args, files):
+    """
+    Sube varios archivos [(ruta local, nombre en el servidor)] por una sola conexión:
+    un handshake y un cierre para todos, y cada archivo en su propio stream.
+    """
+    for src, _ in files:
+        if not os.path.isfile(src):
+            raise SystemExit(f"No existe el archivo {src}")
+    options = transfer_options(args)
+    options["streams"] = ConnectionConfig.STREAM_WINDOW
+
+    connection, mode, _ = ServerManager.connect_to_server((args.host, args.port), "upload", files[0][1], options, args.pmtu)
+    Logger.info(f"Handshake completado con servidor en {args.host}:{args.port}, con modo {mode}")
+    try:
+        if "streams" not in connection.options:
+            raise SystemExit("El servidor no acepta varios archivos por conexión")
+        answer = request_listing(
+            [(name, os.path.getsize(src)) for src, name in files],
+            lambda path: make_sender(args, connection, path).start(),
+            lambda path: make_receiver(args, connection, path).start()
+        )
+        jobs = []
+        for stream_id, ((src, name), (_, size)) in enumerate(zip(files, answer), 1):
+            if size == REJECTED:
+                Logger.error(f"El servidor rechazó {name} (ya existe o el nombre no es válido)")
+            else:
+                jobs.append((stream_id, lambda view, src=src: make_sender(args, view, src).start()))
+        mux = StreamMultiplexer(connection, make_packetizer(connection.options))
+        try:
+            failed = mux.run(jobs, int(connection.options["streams"]))
+        finally:
+            mux.stop()
+        Logger.info(f"Subidos {len(jobs) - failed} de {len(files)} archivos")
+    finally:
+        connection.close()
+        Logger.info("Upload completed and connection closed.")
+
+
+def upload_files(sources, names):
+    """Los pares (ruta local, nombre en el servidor) de los -s/-n; un directorio aporta sus archivos."""
+    files = []
+    for src in sources:
+        if os.path.isdir(src):
+            files += sorted(os.path.join(src, entry) for entry in os.listdir(src)
+                            if os.path.isfile(os.path.join(src, entry)))
+        else:
+            files.append(src)
+    if not files:
+        raise SystemExit("No existe el archivo: no se indicó ninguno para subir")
+    if names and len(names) != len(files):
+        raise SystemExit(f"Se indicaron {len(names)} nombres para {len(files)} archivos")
+    return list(zip(files, names or [os.path.basename(src) for src in files]))
+
+
+def make_sender(args, connection, file_path, resume=None):
+    """El motor que manda file_path con lo acordado en el handshake."""
+    # El servidor puede imponer un tope menor al pedido
+    rate = float(connection.options["rate"]) if "rate" in connection.options else None
+    chunk_size = int(connection.options.get("chunk", ConnectionConfig.CHUNK_SIZE))
+    packetizer = make_packetizer(connection.options)
+    compressor = make_compressor(connection.options)
+
     # Check if the protocol is specified
     if args.protocol == "sw":
-        protocol = StopAndWaitProtocol(
-            sock=udp_socket,
+        return StopAndWaitProtocol(
+            sock=connection.socket,
             dest=connection.destination_address,
-            file_path=args.src,
-            timeout=ConnectionConfig.TIMEOUT
+            file_path=file_path,
+            timeout=ConnectionConfig.TIMEOUT,
+            rtt=connection.rtt,
+            rate=rate,
+            chunk_size=chunk_size,
+            packetizer=packetizer,
+            compressor=compressor,
+            resume=resume
         )
-    else:
-        protocol = SelectiveRepeatProtocol(
-            sock=udp_socket,
+    elif args.protocol == "gbn":
+        return GoBackNProtocol(
+            sock=connection.socket,
             dest=connection.destination_address,
-            file_path=args.src,
+            file_path=file_path,
+            timeout=ConnectionConfig.TIMEOUT,
+            window_size=ConnectionConfig.GBN_WINDOW_SIZE,
+            rtt=connection.rtt,
+            congestion=make_congestion_controller(args.congestion, ConnectionConfig.GBN_WINDOW_SIZE),
+            rate=rate,
+            chunk_size=chunk_size,
+            packetizer=packetizer,
+            compressor=compressor,
+            resume=resume
+        )
+    return SelectiveRepeatProtocol(
+        sock=connection.socket,
+        dest=connection.destination_address,
+        file_path=file_path,
+        timeout=ConnectionConfig.TIMEOUT,
+        window_size=ConnectionConfig.SR_WINDOW_SIZE,
+        rtt=connection.rtt,
+        congestion=make_congestion_controller(args.congestion, ConnectionConfig.SR_WINDOW_SIZE),
+        rate=rate,
+        chunk_size=chunk_size,
+        packetizer=packetizer,
+        compressor=compressor,
+        resume=resume
+    )
+
+
+def make_receiver(args, connection, output_path):
+    """El motor que recibe lo que contesta el servidor en una subida delta o con dedup."""
+    chunk_size = int(connection.options.get("chunk", ConnectionConfig.CHUNK_SIZE))
+    packetizer = make_packetizer(connection.options)
+    compressor = make_compressor(connection.options)
+    ack_policy = make_ack_policy(args.protocol, None, None)
+    if args.protocol == "sw":
+        return StopAndWaitReceiver(
+            sock=connection.socket,
+            output_path=output_path,
+            timeout=ConnectionConfig.TIMEOUT,
+            ack_policy=ack_policy,
+            chunk_size=chunk_size,
+            packetizer=packetizer,
+            compressor=compressor
+        )
+    elif args.protocol == "gbn":
+        return GoBackNReceiver(
+            sock=connection.socket,
+            output_path=output_path,
             timeout=ConnectionConfig.TIMEOUT,
-            window_size=ConnectionConfig.SR_WINDOW_SIZE
+            ack_policy=ack_policy,
+            chunk_size=chunk_size,
+            packetizer=packetizer,
+            compressor=compressor
         )
+    return SelectiveRepeatReceiver(
+        sock=connection.socket,
+        output_path=output_path,
+        timeout=ConnectionConfig.TIMEOUT,
+        window_size=ConnectionConfig.SR_WINDOW_SIZE,
+        ack_policy=ack_policy,
+        chunk_size=chunk_size,
+        packetizer=packetizer,
+        compressor=compressor
+    )
+
 
+def send_delta(args, connection):
+    """
+    Subida delta: se reciben las firmas de la copia del servidor, se arma el delta
+    (referencias a sus bloques más los bytes nuevos) y se manda eso en lugar del archivo.
+    """
+    fd, signature_path = tempfile.mkstemp(suffix=".sig")
+    os.close(fd)
+    fd, delta_path = tempfile.mkstemp(suffix=".delta")
+    os.close(fd)
     try:
-        protocol.start()
+        make_receiver(args, connection, signature_path).start()
+        stats = write_delta(args.src, signature_path, delta_path)
+        Logger.info(f"Delta: {stats.copied} bytes reutilizados del servidor, {stats.literal} bytes nuevos")
+        make_sender(args, connection, delta_path).start()
     finally:
-        # Cerrar el protocolo y la conexión
-        connection.close()
-        Logger.info("Upload completed and connection closed.")
+        for path in (signature_path, delta_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def send_dedup(args, connection):
+    """
+    Subida con dedup: se manda el manifiesto con el hash de cada chunk, se recibe el
+    bitmap de los que el servidor no tiene y se mandan solo esos, uno tras otro.
+    """
+    chunk_size = int(connection.options["dedup"])
+    paths = []
+    for suffix in (".manifest", ".wanted", ".chunks"):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        os.close(fd)
+        paths.append(path)
+    manifest_path, wanted_path, data_path = paths
+    try:
+        manifest = write_manifest(args.src, manifest_path, chunk_size)
+        make_sender(args, connection, manifest_path).start()
+        make_receiver(args, connection, wanted_path).start()
+        with open(wanted_path, 'rb') as f:
+            wanted = Bitmap.from_bytes(f.read())
+        sent = write_wanted(args.src, manifest, wanted, data_path)
+        Logger.info(f"Dedup: el servidor ya tiene {len(manifest.hashes) - wanted.count} de "
+                    f"{len(manifest.hashes)} chunks, se envían {sent} bytes")
+        make_sender(args, connection, data_path).start()
+    finally:
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
@@ -52,9 +274,19 @@ if __name__ == '__main__':
     parser.add_argument('-q', '--quiet'    , action='store_true', help="decrease output verbosity")
     parser.add_argument('-H', '--host'     , metavar='ADDR'     , type=str, default="127.0.0.1", help="Server IP address")
     parser.add_argument('-p', '--port'     , metavar='PORT'     , type=int, default=12345, help="Server port")
-    parser.add_argument('-s', '--src'      , metavar='DIRPATH'  , type=str, default="", help="Source file path")
-    parser.add_argument('-n', '--name'     , metavar='FILENAME' , type=str, default="", help="File name")
-    parser.add_argument('-r', '--protocol' , metavar='protocol' , choices=["sw","sr"], default="sw" ,help="error recovery protocol")
+    parser.add_argument('-s', '--src'      , metavar='DIRPATH'  , type=str, action='append', default=[], help="Source file path (repeat, or give a directory, to send several files over one connection)")
+    parser.add_argument('-n', '--name'     , metavar='FILENAME' , type=str, action='append', default=[], help="File name (one per source file)")
+    parser.add_argument('-r', '--protocol' , metavar='protocol' , choices=["sw","sr","gbn"], default="sw" ,help="error recovery protocol")
+    parser.add_argument('-c', '--congestion', metavar='ALGO'    , choices=list(CONGESTION_CONTROLLERS), default=ConnectionConfig.CONGESTION_CONTROL, help="congestion control for sr/gbn (none, reno, cubic)")
+    parser.add_argument('--rate'           , metavar='BYTES/S'  , type=parse_rate, default=None, help="send rate limit, e.g. 500K or 10M")
+    parser.add_argument('--ack-every'      , metavar='N'        , type=int, default=None, help="ask the server to acknowledge every N packets")
+    parser.add_argument('--ack-delay'      , metavar='SECONDS'  , type=float, default=None, help="max delay before the server acknowledges a packet")
+    parser.add_argument('--chunk-size'     , metavar='BYTES'    , type=int, default=None, help=f"payload bytes per packet (default {ConnectionConfig.CHUNK_SIZE})")
+    parser.add_argument('--compress'       , metavar='ALGO'     , choices=ChunkCompressor.ALGORITHMS, default=None, help="compress chunks on the fly (zlib, lzma) if the server agrees")
+    parser.add_argument('--pmtu'           , action='store_true', help="probe the path MTU and use the largest chunk that fits")
+    parser.add_argument('--resume'         , action='store_true', help="continue an interrupted upload, sending only what the server is missing")
+    parser.add_argument('--delta'          , action='store_true', help="replace the server's copy sending only the blocks that changed")
+    parser.add_argument('--dedup'          , action='store_true', help="skip chunks the server already stores in other files (needs --chunk-store)")
 
     # Parse the arguments
     args = parser.parse_args()
@@ -68,6 +300,11 @@ if __name__ == '__main__':
     else:
         Logger.setup_verbosity(VerbosityLevel.NORMAL)
 
-    behaviour(args)
+    if len(args.src) == 1 and not os.path.isdir(args.src[0]) and len(args.name) <= 1:
+        args.src = args.src[0]
+        args.name = args.name[0] if args.name else os.path.basename(args.src)
+        behaviour(args)
+    else:
+        upload_many(args, upload_files(args.src, args.name))
 
 
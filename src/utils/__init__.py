@@ -1,4 +1,7 @@
 from utils.logger import Logger, VerbosityLevel
 from utils.custom_help_formatter import CustomHelpFormatter
 from .retry_handler import RetryHandler
-from .connection_config import ConnectionConfig
\ No newline at end of file
+from .connection_config import ConnectionConfig
+from .timer_scheduler import TimerScheduler
+from .bitmap import Bitmap
+from .bloom import BloomFilter
@@ -0,0 +1,81 @@
+class Bitmap:
+    """
+    Conjunto de enteros no negativos guardado como un bit por posición.
+    Crece solo al marcar posiciones más allá del final.
+    """
+    def __init__(self, size: int = 0):
+        self.bits = bytearray((size + 7) // 8)
+        self.count = 0
+
+    def add(self, index: int) -> bool:
+        """Marca index; devuelve False si ya estaba marcado."""
+        byte, mask = index >> 3, 1 << (index & 7)
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(byte + 1 - len(self.bits)))
+        elif self.bits[byte] & mask:
+            return False
+        self.bits[byte] |= mask
+        self.count += 1
+        return True
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        bitmap = cls()
+        bitmap.bits = bytearray(data)
+        bitmap.count = int.from_bytes(bitmap.bits, 'little').bit_count()
+        return bitmap
+
+    def fill(self, end: int):
+        """Marca todo [0, end) de una vez."""
+        full, rest = divmod(end, 8)
+        if len(self.bits) <= full:
+            self.bits.extend(bytes(full + 1 - len(self.bits)))
+        self.bits[:full] = b'\xff' * full
+        if rest:
+            self.bits[full] |= (1 << rest) - 1
+        self.count = int.from_bytes(self.bits, 'little').bit_count()
+
+    def __contains__(self, index: int) -> bool:
+        byte = index >> 3
+        return byte < len(self.bits) and bool(self.bits[byte] & (1 << (index & 7)))
+
+    def __len__(self):
+        return self.count
+
+    def first_missing(self, start: int = 0) -> int:
+        """Primera posición >= start sin marcar."""
+        byte = start >> 3
+        while start in self:
+            # Salta de a bytes completos cuando se puede
+            if start & 7 == 0 and byte < len(self.bits) and self.bits[byte] == 0xFF:
+                start += 8
+            else:
+                start += 1
+            byte = start >> 3
+        return start
+
+    def next_marked(self, start: int, end: int) -> int:
+        """Primera posición marcada en [start, end), o end si no hay ninguna."""
+        while start < end:
+            byte = start >> 3
+            if byte >= len(self.bits):
+                return end
+            if start & 7 == 0 and self.bits[byte] == 0:
+                start += 8
+            elif self.bits[byte] & (1 << (start & 7)):
+                return start
+            else:
+                start += 1
+        return end
+
+    def runs(self, start: int, end: int, limit: int = None) -> list:
+        """Rangos [a, b) marcados dentro de [start, end), a lo sumo limit."""
+        runs = []
+        while limit is None or len(runs) < limit:
+            start = self.next_marked(start, end)
+            if start >= end:
+                break
+            stop = min(self.first_missing(start), end)
+            runs.append([start, stop])
+            start = stop
+        return runs
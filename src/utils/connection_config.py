@@ -2,3 +2,46 @@ class ConnectionConfig:
     TIMEOUT = 0.5
     MAX_RETRIES = 5
     SR_WINDOW_SIZE = 1000
+    # Ante una pérdida GBN reenvía toda la ventana: se la mantiene más chica que la de SR
+    GBN_WINDOW_SIZE = 256
+    MIN_RTO = 0.05
+    MAX_RTO = 3.0
+    INITIAL_CWND = 4
+    CONGESTION_CONTROL = "reno"
+    PACING_GAIN = 2.0
+    PACING_BURST = 4
+    SR_ACK_EVERY = 4
+    SW_ACK_EVERY = 1
+    ACK_DELAY = 0.005
+    CHUNK_SIZE = 1024
+    # Jumbo frame (9000) menos cabeceras IP/UDP y DATA (la de WireCodec, la más grande)
+    MAX_CHUNK_SIZE = 8956
+    PMTU_CANDIDATES = (1280, 1500, 4352, 9000)
+    UDP_OFFLOAD = True
+    # Hash del archivo que se compara al terminar: "crc32" (zlib, casi gratis) alcanza para
+    # corrupción accidental; cualquier nombre de hashlib ("blake2b") si se quiere uno criptográfico.
+    # None lo desactiva
+    DIGEST = "crc32"
+    # Nivel de zlib para la compresión por chunk: el más rápido, los chunks son chicos
+    COMPRESSION_LEVEL = 1
+    # El receptor SR hashea lo ya escrito en orden de a bloques de este tamaño
+    DIGEST_BLOCK = 262144
+    # Cada cuánto (segundos) el receptor guarda el estado para poder retomar con --resume
+    RESUME_SAVE_INTERVAL = 1.0
+    # Bloques de la subida delta: el cliente propone DELTA_BLOCK_SIZE y el servidor lo acota
+    DELTA_BLOCK_SIZE = 4096
+    MAX_DELTA_BLOCK = 1048576
+    # Almacén de chunks por contenido del servidor (--chunk-store): tamaño fijo de chunk
+    # y claves que el filtro de Bloom en memoria cubre antes de rearmarse más grande
+    DEDUP_CHUNK_SIZE = 65536
+    DEDUP_BLOOM_CAPACITY = 1000000
+    # Datagramas que esperan en la cola de una conexión multiplexada (unas dos ventanas
+    # de SR); si el motor no alcanza a leerlos se descartan, como en el buffer del kernel
+    MUX_QUEUE_SIZE = 2048
+    # Archivos que viajan a la vez, cada uno en su stream, en una conexión con varios
+    STREAM_WINDOW = 8
+    STREAM_POLL = 0.02
+    # Buffers de recepción reutilizables por socket
+    RECV_POOL_SIZE = 4
+    MIN_SOCKET_BUFFER = 262144
+    MAX_SOCKET_BUFFER = 8388608
@@ -0,0 +1,78 @@
+import heapq
+import itertools
+import threading
+import time
+from .logger import Logger
+
+
+class ScheduledTimer:
+    __slots__ = ('deadline', 'callback', 'args', 'cancelled')
+
+    def __init__(self, deadline, callback, args):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerScheduler:
+    """
+    Un único hilo por proceso que dispara todos los timers de retransmisión.
+    Los timers viven en un min-heap ordenado por deadline; en cada vuelta se
+    extraen todos los vencidos y se ejecutan en lote. Cancelar es O(1): la
+    entrada queda marcada y se descarta cuando llega al tope del heap.
+    """
+    _default = None
+    _default_lock = threading.Lock()
+
+    @classmethod
+    def default(cls):
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def schedule(self, delay: float, callback: callable, *args) -> ScheduledTimer:
+        timer = ScheduledTimer(time.monotonic() + delay, callback, args)
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="timer-scheduler", daemon=True)
+                self._thread.start()
+            heapq.heappush(self._heap, (timer.deadline, next(self._counter), timer))
+            if self._heap[0][2] is timer:
+                self._cond.notify()
+        return timer
+
+    def pending(self):
+        with self._cond:
+            return sum(1 for _, _, timer in self._heap if not timer.cancelled)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                now = time.monotonic()
+                if self._heap[0][0] > now:
+                    self._cond.wait(self._heap[0][0] - now)
+                    continue
+                expired = []
+                while self._heap and self._heap[0][0] <= now:
+                    _, _, timer = heapq.heappop(self._heap)
+                    if not timer.cancelled:
+                        expired.append(timer)
+
+            for timer in expired:
+                try:
+                    timer.callback(*timer.args)
+                except Exception as e:
+                    Logger.error(who="timer-scheduler", message=f"Timer callback failed: {e}")
@@ -0,0 +1,42 @@
+"""
+Compara encode/decode de DefaultPacketizer y CodecPacketizer (no corre con test.run).
+
+    PYTHONPATH=src:. python -m test.bench_codec
+"""
+import timeit
+from protocol.codec import CodecPacketizer
+from protocol.packet import DefaultPacketizer
+
+NUMBER = 200_000
+PAYLOAD = bytes(1024)
+
+
+def cases(packetizer):
+    data = packetizer.make_data_packet(123456, PAYLOAD, 987654, 1)
+    view = memoryview(data)
+    sack = packetizer.make_sack_packet(100, [(102, 110), (120, 121), (130, 140)], 55, 900)
+    header = bytearray(packetizer.HEADER_SIZE)
+    return {
+        "make_data_packet": lambda: packetizer.make_data_packet(123456, PAYLOAD, 987654, 1),
+        "pack_data_header": lambda: packetizer.pack_data_header(header, 0, 123456, 987654, 1),
+        "parse data (view)": lambda: (packetizer.is_data(view), packetizer.extract_seq(view),
+                                      packetizer.extract_timestamp(view), packetizer.extract_flags(view),
+                                      packetizer.extract_data(view)),
+        "make_ack_packet": lambda: packetizer.make_ack_packet(123456, 987654),
+        "make_sack_packet": lambda: packetizer.make_sack_packet(100, [(102, 110), (120, 121), (130, 140)], 55, 900),
+        "parse sack": lambda: (packetizer.is_sack(sack), packetizer.extract_sack(sack),
+                               packetizer.extract_timestamp(sack), packetizer.extract_window(sack)),
+    }
+
+
+def main():
+    default, codec = cases(DefaultPacketizer()), cases(CodecPacketizer(cid=7))
+    print(f"{'':20} {'default ns':>11} {'codec ns':>10} {'ratio':>6}")
+    for name in default:
+        a = min(timeit.repeat(default[name], number=NUMBER, repeat=3)) / NUMBER * 1e9
+        b = min(timeit.repeat(codec[name], number=NUMBER, repeat=3)) / NUMBER * 1e9
+        print(f"{name:20} {a:11.0f} {b:10.0f} {b / a:6.2f}")
+
+
+if __name__ == '__main__':
+    main()
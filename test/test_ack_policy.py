@@ -0,0 +1,35 @@
+import time
+import unittest
+from protocol.ack_policy import AckPolicy, make_ack_policy
+from utils import ConnectionConfig
+
+
+class TestAckPolicy(unittest.TestCase):
+    def test_every_n_packets(self):
+        policy = AckPolicy(every=3, delay=10.0)
+        self.assertFalse(policy.on_packet(100))
+        self.assertFalse(policy.on_packet(200))
+        self.assertTrue(policy.on_packet(300))
+        # Se devuelve el timestamp del paquete más viejo sin confirmar
+        self.assertEqual(policy.on_ack_sent(), 100)
+        self.assertFalse(policy.due())
+
+    def test_immediate(self):
+        policy = AckPolicy(every=8, delay=10.0)
+        self.assertTrue(policy.on_packet(1, immediate=True))
+
+    def test_delay(self):
+        policy = AckPolicy(every=8, delay=0.01)
+        self.assertFalse(policy.on_packet(1))
+        self.assertLessEqual(policy.time_left(1.0), 0.01)
+        time.sleep(0.02)
+        self.assertTrue(policy.due())
+
+    def test_idle_time_left(self):
+        self.assertEqual(AckPolicy(every=4).time_left(2.0), 2.0)
+
+    def test_factory_defaults(self):
+        self.assertEqual(make_ack_policy("sw").every, ConnectionConfig.SW_ACK_EVERY)
+        self.assertEqual(make_ack_policy("sr").every, ConnectionConfig.SR_ACK_EVERY)
+        policy = make_ack_policy("sr", "2", "0.1")
+        self.assertEqual((policy.every, policy.delay), (2, 0.1))
@@ -0,0 +1,138 @@
+import asyncio
+import hashlib
+import importlib
+import os
+import tempfile
+import socket
+import threading
+import unittest
+from argparse import Namespace
+from librerias.client import Client, DatagramEndpoint, terminate as async_terminate
+from protocol.codec import CodecPacketizer
+from protocol.integrity import IntegrityError, StreamDigest, terminate
+from protocol.rtt_estimator import RttEstimator
+from utils.logger import Logger
+
+start_server = importlib.import_module('start-server')
+
+
+class TestAsyncClient(unittest.TestCase):
+    TRANSFERS = 8
+
+    def setUp(self):
+        Logger.setup_name('test_async_client.py')
+        self.server_storage = tempfile.mkdtemp()
+        self.client_dir = tempfile.mkdtemp()
+        self.host = "127.0.0.1"
+        self.port = 54322
+        self.sources = []
+        for i in range(self.TRANSFERS):
+            path = os.path.join(self.client_dir, f"input{i}.bin")
+            with open(path, 'wb') as f:
+                f.write(os.urandom(100_000 + i * 1000))
+            self.sources.append(path)
+
+    def tearDown(self):
+        for temp_dir in [self.server_storage, self.client_dir]:
+            for name in os.listdir(temp_dir):
+                os.remove(os.path.join(temp_dir, name))
+            os.rmdir(temp_dir)
+
+    def _hash(self, path):
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def _run_server(self, protocol, single_port=False, workers=1):
+        self.stop_event = Namespace(running=True)
+        args = Namespace(
+            host=self.host, port=self.port, storage=self.server_storage, protocol=protocol,
+            congestion="reno", rate=None, ack_every=None, ack_delay=None, single_port=single_port,
+            workers=workers, cpu_affinity=False, chunk_store=False
+        )
+        thread = threading.Thread(target=start_server.behaviour, args=(args, self.stop_event), daemon=True)
+        thread.start()
+        return thread
+
+    def _concurrent_roundtrip(self, protocol, single_port=False, workers=1):
+        server = self._run_server(protocol, single_port, workers)
+        client = Client(self.host, self.port, protocol, chunk_size=4096)
+
+        async def roundtrip():
+            await asyncio.gather(*(client.upload(src, f"file{i}") for i, src in enumerate(self.sources)))
+            await asyncio.gather(*(
+                client.download(f"file{i}", os.path.join(self.client_dir, f"output{i}.bin"))
+                for i in range(self.TRANSFERS)
+            ))
+
+        try:
+            asyncio.run(asyncio.wait_for(roundtrip(), 20))
+        finally:
+            self.stop_event.running = False
+            server.join(timeout=5)
+
+        for i, src in enumerate(self.sources):
+            self.assertEqual(self._hash(src), self._hash(os.path.join(self.server_storage, f"file{i}")))
+            self.assertEqual(self._hash(src), self._hash(os.path.join(self.client_dir, f"output{i}.bin")))
+
+    def test_concurrent_transfers_sr(self):
+        self._concurrent_roundtrip("sr")
+
+    def test_concurrent_transfers_sw(self):
+        self._concurrent_roundtrip("sw")
+
+    def test_concurrent_transfers_single_port(self):
+        self._concurrent_roundtrip("sr", single_port=True)
+
+    def test_concurrent_transfers_workers(self):
+        self._concurrent_roundtrip("sr", workers=2)
+
+
+class TestSharedExchange(unittest.TestCase):
+    """El TERM del cliente asyncio y el de los motores sincrónicos dan el mismo veredicto."""
+    def setUp(self):
+        self.packetizer = CodecPacketizer(cid=3)
+        self.peer = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.peer.bind(("127.0.0.1", 0))
+        self.peer.settimeout(1)
+
+    def tearDown(self):
+        self.peer.close()
+
+    def _answer(self, ok):
+        # Primero un ACK rezagado, que no cuenta como respuesta, y después el veredicto
+        try:
+            data, addr = self.peer.recvfrom(2048)
+            if self.packetizer.is_terminate(data):
+                self.peer.sendto(self.packetizer.make_ack_packet(1), addr)
+                self.peer.sendto(self.packetizer.make_terminate_ack_packet(ok), addr)
+        except socket.timeout:
+            pass
+
+    def _sync(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(("127.0.0.1", 0))
+        try:
+            return terminate(sock, self.peer.getsockname(), self.packetizer, lambda: sock.recvfrom(2048),
+                             RttEstimator(initial_rto=0.5), StreamDigest())
+        finally:
+            sock.close()
+
+    def _async(self):
+        async def run():
+            loop = asyncio.get_running_loop()
+            _, endpoint = await loop.create_datagram_endpoint(DatagramEndpoint, local_addr=("127.0.0.1", 0))
+            try:
+                return await async_terminate(endpoint, self.peer.getsockname(), self.packetizer,
+                                             RttEstimator(initial_rto=0.5), StreamDigest())
+            finally:
+                endpoint.close()
+        return asyncio.run(run())
+
+    def test_same_verdict(self):
+        for run in (self._sync, self._async):
+            with self.subTest(run.__name__):
+                threading.Thread(target=self._answer, args=(True,), daemon=True).start()
+                self.assertTrue(run())
+                threading.Thread(target=self._answer, args=(False,), daemon=True).start()
+                with self.assertRaises(IntegrityError):
+                    run()
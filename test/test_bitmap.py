@@ -0,0 +1,37 @@
+import unittest
+
+from utils.bitmap import Bitmap
+
+
+class TestBitmap(unittest.TestCase):
+    def test_add_and_contains(self):
+        bitmap = Bitmap(4)
+        self.assertTrue(bitmap.add(3))
+        self.assertFalse(bitmap.add(3))
+        self.assertTrue(bitmap.add(100))
+        self.assertIn(3, bitmap)
+        self.assertIn(100, bitmap)
+        self.assertNotIn(4, bitmap)
+        self.assertNotIn(10_000, bitmap)
+        self.assertEqual(len(bitmap), 2)
+
+    def test_first_missing(self):
+        bitmap = Bitmap()
+        for index in range(0, 37):
+            bitmap.add(index)
+        bitmap.add(38)
+        self.assertEqual(bitmap.first_missing(), 37)
+        self.assertEqual(bitmap.first_missing(38), 39)
+
+    def test_runs(self):
+        bitmap = Bitmap()
+        for index in (2, 3, 4, 9, 20, 21, 40):
+            bitmap.add(index)
+        self.assertEqual(bitmap.runs(0, 41), [[2, 5], [9, 10], [20, 22], [40, 41]])
+        self.assertEqual(bitmap.runs(3, 21), [[3, 5], [9, 10], [20, 21]])
+        self.assertEqual(bitmap.runs(0, 41, limit=2), [[2, 5], [9, 10]])
+        self.assertEqual(bitmap.runs(41, 100), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
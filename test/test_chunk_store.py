@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+
+from protocol.chunk_store import ChunkStore, ManifestError, read_manifest, write_manifest, write_wanted
+from protocol.integrity import IntegrityError
+from utils.bitmap import Bitmap
+from utils.bloom import BloomFilter
+from utils.connection_config import ConnectionConfig
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_no_false_negatives_and_few_false_positives(self):
+        bloom = BloomFilter(2000, 0.01)
+        keys = [os.urandom(16) for _ in range(2000)]
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(os.urandom(16) in bloom for _ in range(5000))
+        self.assertLess(false_positives, 150)
+        self.assertFalse(bloom.full)
+        bloom.add(os.urandom(16))
+        self.assertTrue(bloom.full)
+
+
+class TestChunkStore(unittest.TestCase):
+    CHUNK = ConnectionConfig.DEDUP_CHUNK_SIZE
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.storage = os.path.join(self.dir.name, "storage")
+        os.mkdir(self.storage)
+        self.tmp = lambda name: os.path.join(self.dir.name, name)
+        self.store = ChunkStore(self.storage)
+
+    def tearDown(self):
+        self.store.close()
+        self.dir.cleanup()
+
+    def _stored(self, name, data):
+        with open(os.path.join(self.storage, name), 'wb') as f:
+            f.write(data)
+
+    def _upload(self, name, data):
+        """Lo que hacen cliente y servidor en una subida con dedup, sin la red en el medio."""
+        with open(self.tmp("src"), 'wb') as f:
+            f.write(data)
+        write_manifest(self.tmp("src"), self.tmp("manifest"), self.CHUNK)
+        manifest = read_manifest(self.tmp("manifest"))
+        wanted = self.store.missing(manifest)
+        sent = write_wanted(self.tmp("src"), manifest, Bitmap.from_bytes(bytes(wanted.bits)), self.tmp("data"))
+        self.store.assemble(manifest, wanted, self.tmp("data"), os.path.join(self.storage, name))
+        with open(os.path.join(self.storage, name), 'rb') as f:
+            self.assertEqual(f.read(), data)
+        return wanted, sent
+
+    def test_reuses_chunks_from_indexed_files(self):
+        old = os.urandom(10 * self.CHUNK + 500)
+        self._stored("old.bin", old)
+        self.store.index_storage()
+        new = old[:4 * self.CHUNK] + os.urandom(self.CHUNK) + old[5 * self.CHUNK:]
+        wanted, sent = self._upload("new.bin", new)
+        self.assertEqual(sorted(i for i in range(11) if i in wanted), [4])
+        self.assertEqual(sent, self.CHUNK)
+        # La subida quedó indexada: otra con los mismos chunks nuevos no manda nada
+        wanted, sent = self._upload("again.bin", new[4 * self.CHUNK:5 * self.CHUNK])
+        self.assertEqual((wanted.count, sent), (0, 0))
+        self.assertEqual(sorted(os.listdir(self.storage)), [".chunks", "again.bin", "new.bin", "old.bin"])
+
+    def test_identical_file_is_linked(self):
+        data = os.urandom(3 * self.CHUNK)
+        self._stored("a.bin", data)
+        self.store.index_storage()
+        wanted, _ = self._upload("b.bin", data)
+        self.assertEqual(wanted.count, 0)
+        self.assertTrue(os.path.samefile(os.path.join(self.storage, "a.bin"), os.path.join(self.storage, "b.bin")))
+
+    def test_changed_files_are_forgotten(self):
+        data = os.urandom(4 * self.CHUNK)
+        self._stored("a.bin", data)
+        self.store.index_storage()
+        with open(self.tmp("src"), 'wb') as f:
+            f.write(data)
+        manifest = write_manifest(self.tmp("src"), self.tmp("manifest"), self.CHUNK)
+        wanted = self.store.missing(manifest)
+        self.assertEqual(wanted.count, 0)
+        # Cambia después de pedir los chunks: el rearmado lo detecta y no deja nada a medias
+        self._stored("a.bin", os.urandom(5 * self.CHUNK))
+        open(self.tmp("data"), 'wb').close()
+        with self.assertRaises(IntegrityError):
+            self.store.assemble(manifest, wanted, self.tmp("data"), os.path.join(self.storage, "b.bin"))
+        self.assertEqual(sorted(os.listdir(self.storage)), [".chunks", "a.bin"])
+        self.assertEqual(self.store.missing(manifest).count, 4)
+
+    def test_bad_manifest(self):
+        with open(self.tmp("src"), 'wb') as f:
+            f.write(os.urandom(3 * self.CHUNK))
+        write_manifest(self.tmp("src"), self.tmp("manifest"), self.CHUNK)
+        with open(self.tmp("manifest"), 'r+b') as f:
+            f.truncate(os.path.getsize(self.tmp("manifest")) - 1)
+        with self.assertRaises(ManifestError):
+            read_manifest(self.tmp("manifest"))
+
+
+if __name__ == '__main__':
+    unittest.main()
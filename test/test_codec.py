@@ -0,0 +1,94 @@
+import unittest
+from protocol.codec import WireCodec, CodecPacketizer, CodecError, make_packetizer
+from protocol.packet import DefaultPacketizer
+
+
+class TestWireCodec(unittest.TestCase):
+    def test_control_roundtrip(self):
+        options = {"chunk": 1024, "range": "0-4096", "digest": "a:b"}
+        data = WireCodec.encode(WireCodec.CONFIRM, cid=9, options=options)
+        self.assertEqual(len(data) % 4, 0)
+        message = WireCodec.decode(data)
+        self.assertEqual(message.type, WireCodec.CONFIRM)
+        self.assertEqual(message.cid, 9)
+        # Los valores viajan como texto, igual que en el handshake
+        self.assertEqual(message.options, {"chunk": "1024", "range": "0-4096", "digest": "a:b"})
+        self.assertEqual(message.payload, b"")
+
+    def test_payload_follows_options(self):
+        data = WireCodec.encode(WireCodec.DATA, seq=3, timestamp=7, flags=1, options={"size": 5}, payload=b"hello")
+        message = WireCodec.decode(data)
+        self.assertEqual((message.seq, message.timestamp, message.flags), (3, 7, 1))
+        self.assertEqual(message.payload, b"hello")
+
+    def test_rejects_other_formats(self):
+        with self.assertRaises(CodecError):
+            WireCodec.decode(b"LOGIN:upload:file.bin")
+        with self.assertRaises(CodecError):
+            WireCodec.decode(DefaultPacketizer().make_data_packet(1, b"x" * 20))
+        future = bytearray(WireCodec.encode(WireCodec.FIN))
+        future[0] = WireCodec.first_byte(WireCodec.VERSION + 1)
+        with self.assertRaises(CodecError):
+            WireCodec.decode(bytes(future))
+
+
+class TestCodecPacketizer(unittest.TestCase):
+    def setUp(self):
+        self.packetizer = CodecPacketizer(cid=0xABCDEF01)
+
+    def test_data_roundtrip(self):
+        packet = self.packetizer.make_data_packet(7, b"hola", timestamp=42, flags=CodecPacketizer.FLAG_ACK_NOW)
+        self.assertTrue(self.packetizer.is_data(packet))
+        self.assertFalse(self.packetizer.is_ack(packet))
+        self.assertEqual(self.packetizer.extract_seq(packet), 7)
+        self.assertEqual(self.packetizer.extract_timestamp(packet), 42)
+        self.assertEqual(self.packetizer.extract_flags(packet), CodecPacketizer.FLAG_ACK_NOW)
+        self.assertEqual(WireCodec.connection_id(packet), 0xABCDEF01)
+        self.assertEqual(self.packetizer.extract_data(packet), b"hola")
+        buffer = bytearray(CodecPacketizer.HEADER_SIZE)
+        self.packetizer.pack_data_header(buffer, 0, 7, timestamp=42, flags=CodecPacketizer.FLAG_ACK_NOW)
+        self.assertEqual(bytes(buffer) + b"hola", packet)
+
+    def test_sack_roundtrip(self):
+        packet = self.packetizer.make_sack_packet(10, [(12, 14), (20, 21)], timestamp=5, window=64)
+        self.assertTrue(self.packetizer.is_sack(packet))
+        self.assertEqual(self.packetizer.extract_sack(packet), (10, [(12, 14), (20, 21)]))
+        self.assertEqual(self.packetizer.extract_window(packet), 64)
+        self.assertEqual(self.packetizer.extract_timestamp(packet), 5)
+
+    def test_truncated_sack_keeps_whole_blocks(self):
+        packet = self.packetizer.make_sack_packet(10, [(12, 14), (20, 21), (30, 40)], window=64)
+        # Sin el último bloque (y con uno cortado a la mitad) se leen solo los que llegaron enteros
+        self.assertEqual(self.packetizer.extract_sack(packet[:-8]), (10, [(12, 14), (20, 21)]))
+        self.assertEqual(self.packetizer.extract_sack(packet[:-12]), (10, [(12, 14)]))
+
+    def test_messages_decode_with_the_codec(self):
+        message = WireCodec.decode(self.packetizer.make_terminate_packet())
+        self.assertEqual(message.type, WireCodec.TERM)
+        self.assertTrue(self.packetizer.is_terminate(self.packetizer.make_terminate_packet()))
+
+    def test_control_messages(self):
+        fin, fin_ack = self.packetizer.make_fin_packet(), self.packetizer.make_fin_ack_packet()
+        self.assertEqual(WireCodec.decode(fin).type, WireCodec.FIN)
+        self.assertEqual(WireCodec.decode(fin).cid, 0xABCDEF01)
+        self.assertTrue(self.packetizer.is_fin(fin))
+        self.assertFalse(self.packetizer.is_fin(fin_ack))
+        self.assertTrue(self.packetizer.is_fin_ack(fin_ack))
+        self.assertFalse(self.packetizer.is_fin(b"FIN"))
+        # La sonda ocupa exactamente el largo pedido y la respuesta lo devuelve
+        probe = self.packetizer.make_probe_packet(1500)
+        self.assertEqual(len(probe), 1500)
+        self.assertTrue(self.packetizer.is_probe(probe))
+        reply = self.packetizer.make_probe_ack_packet(len(probe))
+        self.assertFalse(self.packetizer.is_probe(reply))
+        self.assertEqual(self.packetizer.extract_probe_ack(reply), 1500)
+        self.assertIsNone(self.packetizer.extract_probe_ack(probe))
+
+    def test_negotiated_packetizer(self):
+        self.assertIsInstance(make_packetizer({}), DefaultPacketizer)
+        self.assertIsInstance(make_packetizer({"wire": "1", "cid": "5"}), CodecPacketizer)
+        self.assertEqual(make_packetizer({"wire": "1", "cid": "5"}).cid, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import os
+import socket
+import threading
+import unittest
+
+from protocol.compression import ChunkCompressor, CompressionError, extract_payload, make_compressor
+from protocol.integrity import StreamDigest
+from protocol.packet import DefaultPacketizer
+from protocol.go_back_n import GoBackNProtocol, GoBackNReceiver
+from protocol.selective_repeat import SelectiveRepeatProtocol, SelectiveRepeatReceiver
+from protocol.stop_and_wait import StopAndWaitProtocol, StopAndWaitReceiver
+from test.utils_test import TransferTestCase
+
+LOG = b"".join(b"2025-05-01 12:00:%02d INFO request id=%d status=200\n" % (i % 60, i) for i in range(8000))
+
+
+class TestChunkCompressor(unittest.TestCase):
+    def test_roundtrip(self):
+        for algorithm in ChunkCompressor.ALGORITHMS:
+            compressor = ChunkCompressor(algorithm, 1024)
+            chunk = memoryview(LOG)[:1024]
+            packed = compressor.compress(chunk)
+            self.assertLess(len(packed), 1024)
+            self.assertEqual(compressor.decompress(packed), bytes(chunk))
+
+    def test_incompressible_goes_raw(self):
+        compressor = ChunkCompressor("zlib", 1024)
+        self.assertIsNone(compressor.compress(os.urandom(1024)))
+        self.assertEqual((compressor.compressed, compressor.raw), (0, 1))
+        # Después de un chunk crudo el siguiente sale crudo sin mirarlo
+        self.assertIsNone(compressor.compress(LOG[:1024]))
+        self.assertIsNotNone(compressor.compress(LOG[:1024]))
+
+    def test_decompression_is_bounded(self):
+        packed = ChunkCompressor("zlib", 4096).compress(bytes(4096))
+        with self.assertRaises(ValueError):
+            ChunkCompressor("zlib", 1024).decompress(packed)
+
+    def test_truncated_or_corrupt_chunk(self):
+        for algorithm in ChunkCompressor.ALGORITHMS:
+            compressor = ChunkCompressor(algorithm, 1024)
+            packed = compressor.compress(LOG[:1024])
+            # Cortado, zlib devolvería solo el principio del chunk sin quejarse
+            for payload in (packed[:-3], packed[:len(packed) // 2], b"\xff" * 20):
+                with self.assertRaises(CompressionError):
+                    compressor.decompress(payload)
+
+    def test_flag_selects_decompression(self):
+        packetizer = DefaultPacketizer()
+        compressor = make_compressor({"compress": "zlib", "chunk": "1024"})
+        chunk = LOG[:1024]
+        packed = packetizer.make_data_packet(0, compressor.compress(chunk), flags=packetizer.FLAG_COMPRESSED)
+        raw = packetizer.make_data_packet(1, chunk)
+        self.assertEqual(extract_payload(packed, packetizer, compressor), chunk)
+        self.assertEqual(extract_payload(raw, packetizer, compressor), chunk)
+        self.assertIsNone(make_compressor({}))
+
+
+class TestCompressedTransfer(TransferTestCase):
+    def setUp(self):
+        super().setUp()
+        # Texto y ruido mezclados: unos chunks van comprimidos y otros crudos
+        self.write_source(LOG[:200_000] + os.urandom(100_000) + LOG[:100_001])
+
+    def test_lossy_mixed_transfer(self):
+        chunks = (len(self.data) + 1023) // 1024
+        for sender_class, receiver_class in ((SelectiveRepeatProtocol, SelectiveRepeatReceiver),
+                                             (GoBackNProtocol, GoBackNReceiver),
+                                             (StopAndWaitProtocol, StopAndWaitReceiver)):
+            with self.subTest(sender_class.__name__):
+                compressor = ChunkCompressor("zlib", 1024)
+                self.transfer(sender_class, receiver_class,
+                              sender_kwargs={"compressor": compressor, "chunk_size": 1024},
+                              receiver_kwargs={"compressor": ChunkCompressor("zlib", 1024), "chunk_size": 1024},
+                              sender_loss=0.05, receiver_loss=0.05)
+                self.assertReceived()
+                self.assertGreater(compressor.compressed, 0)
+                self.assertGreater(compressor.raw, 0)
+                # Las retransmisiones reusan lo ya comprimido: una decisión por chunk
+                self.assertEqual(compressor.compressed + compressor.raw, chunks)
+
+
+class TestCorruptCompressedData(TransferTestCase):
+    def _receive(self, receiver_class):
+        packetizer = DefaultPacketizer()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(('127.0.0.1', 0))
+        peer = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        peer.settimeout(0.3)
+        receiver = receiver_class(sock, self.dst, timeout=self.TIMEOUT, chunk_size=1024,
+                                  compressor=ChunkCompressor("zlib", 1024))
+        errors = []
+
+        def run():
+            try:
+                receiver.start()
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        chunk = LOG[:1024]
+        packed = ChunkCompressor("zlib", 1024).compress(chunk)
+        flags = packetizer.FLAG_COMPRESSED | packetizer.FLAG_ACK_NOW
+        try:
+            # El DATA cortado se descarta sin confirmarlo; el bueno que sigue se escribe
+            peer.sendto(packetizer.make_data_packet(0, packed[:len(packed) // 2], flags=flags), sock.getsockname())
+            with self.assertRaises(socket.timeout):
+                peer.recvfrom(2048)
+            peer.sendto(packetizer.make_data_packet(0, packed, flags=flags), sock.getsockname())
+            peer.recvfrom(2048)
+            digest = StreamDigest()
+            digest.update(chunk)
+            peer.sendto(packetizer.make_terminate_packet(digest.digest()), sock.getsockname())
+            reply, _ = peer.recvfrom(2048)
+            while not packetizer.is_terminate_ack(reply):
+                reply, _ = peer.recvfrom(2048)
+            self.assertTrue(packetizer.extract_verdict(reply))
+        finally:
+            thread.join(5)
+            peer.close()
+            sock.close()
+        self.assertEqual(errors, [])
+        with open(self.dst, 'rb') as f:
+            self.assertEqual(f.read(), chunk)
+
+    def test_truncated_data_is_dropped(self):
+        for receiver_class in (SelectiveRepeatReceiver, GoBackNReceiver, StopAndWaitReceiver):
+            with self.subTest(receiver_class.__name__):
+                self._receive(receiver_class)
+
+
+if __name__ == '__main__':
+    unittest.main()
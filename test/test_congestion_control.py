@@ -0,0 +1,48 @@
+import unittest
+from protocol.congestion_control import (
+    RenoController, CubicController, NoCongestionControl, make_congestion_controller
+)
+
+
+class TestCongestionControl(unittest.TestCase):
+    def test_reno_slow_start_and_avoidance(self):
+        cc = RenoController(max_window=100, initial_window=2)
+        self.assertEqual(cc.window, 2)
+        cc.on_ack(2)
+        self.assertEqual(cc.window, 4)
+
+        cc.ssthresh = 4
+        cc.on_ack(4)
+        self.assertEqual(cc.window, 5)
+
+    def test_reno_loss(self):
+        cc = RenoController(max_window=100, initial_window=2)
+        cc.cwnd = 40
+        cc.on_loss()
+        self.assertEqual(cc.window, 20)
+        cc.on_loss(timeout=True)
+        self.assertEqual(cc.window, 2)
+        self.assertEqual(cc.ssthresh, 10)
+
+    def test_cubic_reduction_and_regrowth(self):
+        cc = CubicController(max_window=1000, initial_window=2)
+        cc.cwnd = 100
+        cc.ssthresh = 50
+        cc.on_loss()
+        self.assertEqual(cc.window, 70)
+        for _ in range(200):
+            cc.on_ack(1, rtt=0.01)
+        self.assertGreater(cc.cwnd, 70)
+        self.assertLessEqual(cc.window, 1000)
+
+    def test_window_is_capped(self):
+        cc = RenoController(max_window=8, initial_window=2)
+        for _ in range(10):
+            cc.on_ack(8)
+        self.assertEqual(cc.window, 8)
+
+    def test_factory(self):
+        self.assertIsInstance(make_congestion_controller("none", 16), NoCongestionControl)
+        self.assertEqual(make_congestion_controller("none", 16).window, 16)
+        with self.assertRaises(ValueError):
+            make_congestion_controller("vegas", 16)
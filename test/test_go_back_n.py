@@ -0,0 +1,30 @@
+import os
+import unittest
+
+from protocol.go_back_n import GoBackNProtocol, GoBackNReceiver
+from test.utils_test import TransferTestCase
+
+
+class TestGoBackN(TransferTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write_source(os.urandom(300_000))
+
+    def _transfer(self, loss_rate=None):
+        # Sin pérdidas se usan sockets comunes, con buffers ajustados y GSO/GRO
+        sender, _, _ = self.transfer(GoBackNProtocol, GoBackNReceiver, sender_loss=loss_rate, receiver_loss=loss_rate)
+        self.assertReceived()
+        return sender
+
+    def test_clean_link_never_goes_back(self):
+        sender = self._transfer()
+        self.assertEqual(sender.high_water, sender.total)
+        self.assertEqual(sender.go_back_seq, -1)
+
+    def test_recovers_from_loss(self):
+        sender = self._transfer(0.05)
+        self.assertEqual(sender.base, sender.total)
+
+
+if __name__ == '__main__':
+    unittest.main()
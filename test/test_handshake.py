@@ -0,0 +1,117 @@
+import socket
+import threading
+import unittest
+from unittest.mock import patch
+from protocol.codec import CodecPacketizer
+from protocol.connection_socket import ConnectionSocket
+from protocol.handshake import Handshake
+from protocol.multiplexer import ConnectionMultiplexer
+from protocol.packet import DefaultPacketizer
+from protocol.pmtu import PathMtuProbe
+from utils import ConnectionConfig
+
+
+class TestHandshakeOptions(unittest.TestCase):
+    def test_encode_decode(self):
+        msg = Handshake.encode("LOGIN", "upload", "a b.txt", {"chunk": 4096, "rate": 1.5})
+        self.assertEqual(Handshake.decode(msg), ("LOGIN", "upload", "a b.txt", {"chunk": "4096", "rate": "1.5"}))
+
+    def test_confirmation(self):
+        packetizer = DefaultPacketizer()
+        self.assertEqual(packetizer.extract_confirm(b"ALL:OK"), {})
+        self.assertEqual(packetizer.extract_confirm(packetizer.make_confirm_packet({"chunk": 1400})), {"chunk": "1400"})
+        self.assertIsNone(packetizer.extract_confirm(b"ALL:OKAY"))
+        self.assertIsNone(packetizer.extract_confirm(b"DATA"))
+
+    def test_codec_confirmation(self):
+        # Con el formato binario acordado el ALL:OK viaja como CONFIRM
+        packetizer = CodecPacketizer(cid=5)
+        self.assertEqual(packetizer.extract_confirm(packetizer.make_confirm_packet()), {})
+        self.assertEqual(packetizer.extract_confirm(packetizer.make_confirm_packet({"chunk": 1400})), {"chunk": "1400"})
+        self.assertIsNone(packetizer.extract_confirm(b"ALL:OK"))
+        self.assertIsNone(packetizer.extract_confirm(packetizer.make_fin_packet()))
+
+
+class TestSinglePortHandshake(unittest.TestCase):
+    def setUp(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.settimeout(0.05)
+        self.mux = ConnectionMultiplexer(self.server)
+
+    def tearDown(self):
+        self.mux.stop()
+        self.server.close()
+
+    def test_lost_confirmation_unregisters_the_connection(self):
+        login = Handshake.encode("LOGIN", "upload", "a.txt", {"wire": 1})
+        # El ALL:OK no llega nunca: la conexión a medio abrir no queda en la tabla
+        with patch.object(ConnectionSocket, "get_message", side_effect=TimeoutError):
+            with self.assertRaises(TimeoutError):
+                Handshake.server(client_addr=('127.0.0.1', 9), login_msg=login, mux=self.mux)
+        self.assertEqual(self.mux.connections, {})
+        self.assertEqual(self.mux.by_peer, {})
+
+    def test_codec_probes_do_not_count_the_mux_header(self):
+        # Camino con MTU 1500: el servidor solo contesta las sondas que entran en él
+        answer = PathMtuProbe.answer
+
+        def answer_within_mtu(sock, data, addr, packetizer):
+            if len(data) <= 1500 - 28:
+                answer(sock, data, addr, packetizer)
+
+        def serve():
+            data, addr = self.mux.accept(2)
+            conn, _, _ = Handshake.server(client_addr=addr, login_msg=data, mux=self.mux)
+            conn.socket.close()
+
+        with patch.object(PathMtuProbe, "answer", side_effect=answer_within_mtu):
+            server = threading.Thread(target=serve, daemon=True)
+            server.start()
+            conn, _, _ = Handshake.client(self.server.getsockname(), "upload", "a.txt",
+                                          {"chunk": ConnectionConfig.MAX_CHUNK_SIZE}, probe_mtu=True)
+            server.join(5)
+        conn.socket.close()
+        # El codec lleva el connection ID en su cabecera: no se descuentan los 5 bytes de multiplexado
+        self.assertEqual(int(conn.options["chunk"]), 1500 - 28 - CodecPacketizer.HEADER_SIZE)
+
+
+class TestPathMtuProbe(unittest.TestCase):
+    packetizer = DefaultPacketizer()
+
+    def setUp(self):
+        self.client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.client.bind(('127.0.0.1', 0))
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.settimeout(0.5)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.close()
+
+    def _answer(self, limit):
+        # Simula un camino que descarta los datagramas más grandes que limit
+        try:
+            while True:
+                data, addr = self.server.recvfrom(65535)
+                if self.packetizer.is_probe(data) and len(data) <= limit:
+                    PathMtuProbe.answer(self.server, data, addr, self.packetizer)
+        except (socket.timeout, OSError):
+            pass
+
+    def test_largest_probe_that_arrives(self):
+        probe = PathMtuProbe(self.client, self.server.getsockname(), 0.05,
+                             self.packetizer.HEADER_SIZE, self.packetizer)
+        threading.Thread(target=self._answer, args=(1500,), daemon=True).start()
+        self.assertEqual(probe.probe(ConnectionConfig.MAX_CHUNK_SIZE), probe.chunk_for_mtu(1500))
+
+    def test_probe_capped_by_agreed_chunk(self):
+        probe = PathMtuProbe(self.client, self.server.getsockname(), 0.05,
+                             self.packetizer.HEADER_SIZE, self.packetizer)
+        threading.Thread(target=self._answer, args=(65535,), daemon=True).start()
+        self.assertEqual(probe.probe(2000), 2000)
+
+
+class TestPathMtuProbeCodec(TestPathMtuProbe):
+    packetizer = CodecPacketizer(cid=5)
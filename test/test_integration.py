@@ -1,6 +1,7 @@
 import unittest
 import threading
 import os
+import shutil
 import tempfile
 import time
 import hashlib
@@ -10,6 +11,8 @@ from utils.logger import Logger, VerbosityLevel
 
 import upload
 import download
+from protocol.resume import ResumeState
+from utils import ConnectionConfig
 import importlib
 start_server = importlib.import_module('start-server')
 # Assume LossySocket is available and mimics socket.socket with packet loss
@@ -50,6 +53,15 @@ class TestServerClientIntegration(unittest.TestCase):
         
         self.host = "127.0.0.1"
         self.port = 54321
+        self.single_port = False
+        self.compress = None
+        self.resume = False
+        self.delta = False
+        self.dedup = False
+        self.parallel = 1
+        # Opciones de upload.py/download.py distintas de las de la línea de comandos
+        self.upload_options = {}
+        self.download_options = {}
 
     def _make_test_file(self, dirpath, name):
         """Create a test file with some content."""
@@ -96,6 +108,230 @@ class TestServerClientIntegration(unittest.TestCase):
         )
         self.server_stop_event.running = False
     
+    def test_upload_and_download_gbn(self):
+        self.protocol = "gbn"
+        utils.setup_test_threads(
+            self._test_upload_and_download_SERVER,
+            self._test_upload_and_download_CLIENT,
+            15
+        )
+        self.server_stop_event.running = False
+
+    def test_upload_and_download_sr_pmtu_and_chunk_size(self):
+        # La subida sondea el MTU del camino; la bajada pide un chunk propio
+        self.protocol = "sr"
+        self.upload_options = {"pmtu": True}
+        self.download_options = {"chunk_size": 4096}
+        utils.setup_test_threads(
+            self._test_upload_and_download_SERVER,
+            self._test_upload_and_download_CLIENT,
+            15
+        )
+        self.server_stop_event.running = False
+
+    def test_upload_and_download_sr_cubic(self):
+        # El que descarga le pide al servidor otro control de congestión
+        self.protocol = "sr"
+        self.download_options = {"congestion": "cubic"}
+        utils.setup_test_threads(
+            self._test_upload_and_download_SERVER,
+            self._test_upload_and_download_CLIENT,
+            15
+        )
+        self.server_stop_event.running = False
+
+    def test_upload_and_download_sr_ack_policy(self):
+        # ACKs cada dos paquetes al subir y demorados al bajar
+        self.protocol = "sr"
+        self.upload_options = {"ack_every": 2}
+        self.download_options = {"ack_delay": 0.01}
+        utils.setup_test_threads(
+            self._test_upload_and_download_SERVER,
+            self._test_upload_and_download_CLIENT,
+            15
+        )
+        self.server_stop_event.running = False
+
+    def test_upload_and_download_sr_single_port(self):
+        self.protocol = "sr"
+        self.single_port = True
+        utils.setup_test_threads(
+            self._test_upload_and_download_SERVER,
+            self._test_upload_and_download_CLIENT,
+            15
+        )
+        self.server_stop_event.running = False
+
+    def test_upload_and_download_sr_compressed(self):
+        self.protocol = "sr"
+        self.compress = "zlib"
+        utils.setup_test_threads(
+            self._test_upload_and_download_SERVER,
+            self._test_upload_and_download_CLIENT,
+            15
+        )
+        self.server_stop_event.running = False
+
+    def test_upload_and_download_sr_resumed(self):
+        # Los dos lados arrancan con un parcial y su estado, como tras un corte
+        self.protocol = "sr"
+        self.resume = True
+        utils.setup_test_threads(
+            self._test_upload_and_download_SERVER,
+            self._test_upload_and_download_CLIENT,
+            15
+        )
+        self.server_stop_event.running = False
+
+    def test_upload_delta_gbn(self):
+        # La segunda subida de un archivo apenas cambiado reusa los bloques del servidor
+        self.protocol = "gbn"
+        self.delta = True
+        utils.setup_test_threads(
+            self._test_upload_and_download_SERVER,
+            self._test_upload_and_download_CLIENT,
+            15
+        )
+        self.server_stop_event.running = False
+
+    def test_upload_dedup_sr(self):
+        # Una copia subida con otro nombre reusa los chunks que el servidor ya indexó
+        self.protocol = "sr"
+        self.dedup = True
+        utils.setup_test_threads(
+            self._test_upload_and_download_SERVER,
+            self._test_upload_and_download_CLIENT,
+            15
+        )
+        self.server_stop_event.running = False
+
+    def test_upload_and_download_sr_parallel(self):
+        # La descarga va en cuatro rangos, cada uno por su conexión
+        self.protocol = "sr"
+        self.parallel = 4
+        utils.setup_test_threads(
+            self._test_upload_and_download_SERVER,
+            self._test_upload_and_download_CLIENT,
+            15
+        )
+        self.server_stop_event.running = False
+
+    def test_upload_and_download_streams_gbn_single_port(self):
+        # Varios archivos por una sola conexión, cada uno en su stream
+        self.protocol = "gbn"
+        self.single_port = True
+        utils.setup_test_threads(
+            self._test_upload_and_download_SERVER,
+            self._test_streams_CLIENT,
+            15
+        )
+        self.server_stop_event.running = False
+
+    def test_aborted_upload_is_not_downloadable(self):
+        # Una subida cortada deja el parcial y su estado en el storage: no se sirve ninguno
+        self.protocol = "sr"
+        utils.setup_test_threads(
+            self._test_upload_and_download_SERVER,
+            self._test_aborted_upload_CLIENT,
+            15
+        )
+        self.server_stop_event.running = False
+
+    def test_delta_outside_storage_is_rejected(self):
+        # Un archivo completo fuera del storage no se acuerda como base de un delta
+        victim = os.path.join(self.client_dir, "ajeno.txt")
+        with open(victim, 'wb') as f:
+            f.write(b"no se toca")
+        agree = start_server.negotiate(Namespace(storage=self.server_storage, rate=None, chunk_store=False))
+        outside = os.path.join("..", os.path.basename(self.client_dir), "ajeno.txt")
+        for name in (outside, victim, "." + self.server_file_name):
+            self.assertNotIn("delta", agree("upload", name, {"delta": "4096"}))
+            self.assertFalse(start_server.storage_name(name, self.server_storage))
+        os.symlink(victim, os.path.join(self.server_storage, "enlace.txt"))
+        self.assertFalse(start_server.storage_name("enlace.txt", self.server_storage))
+        self.assertTrue(start_server.storage_name(self.server_file_name, self.server_storage))
+
+    def test_upload_size_must_fit_in_storage(self):
+        # El servidor reserva lo que anuncia quien sube: un tamaño absurdo se rechaza antes
+        agree = start_server.negotiate(Namespace(storage=self.server_storage, rate=None, chunk_store=False))
+        free = shutil.disk_usage(self.server_storage).free
+        self.assertEqual(agree("upload", "nuevo.txt", {"size": "5000"})["size"], 5000)
+        for size in ("-1", str(free + 1), "mucho"):
+            self.assertEqual(agree("upload", "nuevo.txt", {"size": size})["size"], start_server.REJECTED)
+
+    def _test_aborted_upload_CLIENT(self):
+        upload_args = Namespace(
+            verbose=False, quiet=True, host=self.host, port=self.port, src=self.client_input_file,
+            name=self.server_file_name, protocol=self.protocol, congestion="reno", rate=None,
+            ack_every=None, ack_delay=None, chunk_size=None, compress=None, pmtu=False,
+            resume=False, delta=False, dedup=False
+        )
+        # El cliente se corta antes del TERM: el servidor guarda el estado en cada chunk
+        with patch.object(ConnectionConfig, "RESUME_SAVE_INTERVAL", 0), \
+                patch("protocol.selective_repeat.terminate", side_effect=ConnectionAbortedError):
+            with self.assertRaises(ConnectionAbortedError):
+                upload.behaviour(upload_args)
+        server_file_path = os.path.join(self.server_storage, self.server_file_name)
+        self.assertTrue(os.path.isfile(server_file_path))
+        self.assertTrue(ResumeState.pending(server_file_path))
+
+        downloads = os.path.join(self.client_dir, "bajados")
+        os.mkdir(downloads)
+        download_args = Namespace(
+            verbose=False, quiet=True, host=self.host, port=self.port, protocol=self.protocol,
+            congestion=None, rate=None, ack_every=None, ack_delay=None, chunk_size=None,
+            compress=None, pmtu=False
+        )
+        names = [self.server_file_name, self.server_file_name + ResumeState.SUFFIX]
+        download.download_many(download_args, download.download_files(names, [downloads]))
+        self.assertEqual(os.listdir(downloads), [])
+        self.server_stop_event.running = False
+
+    def _test_streams_CLIENT(self):
+        sources = os.path.join(self.client_dir, "varios")
+        os.mkdir(sources)
+        for i in range(12):
+            with open(os.path.join(sources, f"archivo{i}.bin"), 'wb') as f:
+                f.write(os.urandom(3000 * i))
+        names = sorted(os.listdir(sources))
+        upload_args = Namespace(
+            verbose=False, quiet=True, host=self.host, port=self.port, protocol=self.protocol,
+            congestion="reno", rate=None, ack_every=None, ack_delay=None, chunk_size=None,
+            compress=None, pmtu=False
+        )
+        upload.upload_many(upload_args, upload.upload_files([sources], []))
+        self.assertEqual(sorted(os.listdir(self.server_storage)), names)
+
+        downloads = os.path.join(self.client_dir, "bajados")
+        os.mkdir(downloads)
+        download_args = Namespace(
+            verbose=False, quiet=True, host=self.host, port=self.port, protocol=self.protocol,
+            congestion=None, rate=None, ack_every=None, ack_delay=None, chunk_size=4096,
+            compress="zlib", pmtu=False
+        )
+        # Uno que el servidor no tiene se rechaza sin frenar a los demás
+        download.download_many(download_args, download.download_files(names + ["no_existe.bin"], [downloads]))
+        self.assertEqual(sorted(os.listdir(downloads)), names)
+        for name in names:
+            self.assertEqual(
+                self._compute_file_hash(os.path.join(sources, name)),
+                self._compute_file_hash(os.path.join(downloads, name)),
+                f"Stream file {name} hash mismatch"
+            )
+        self.server_stop_event.running = False
+
+    def _make_partial(self, path):
+        """La mitad del archivo más un tramo suelto, con chunks de 1000 bytes."""
+        with open(self.client_input_file, 'rb') as f:
+            data = f.read()
+        state = ResumeState(len(data), 1000, prefix=len(data) // 2000, bits=b'\x00\xf0\x0f')
+        partial = bytearray(len(data))
+        for seq in state.completed(1000).runs(0, len(data) // 1000 + 1):
+            partial[seq[0] * 1000:seq[1] * 1000] = data[seq[0] * 1000:seq[1] * 1000]
+        with open(path, 'wb') as f:
+            f.write(partial)
+        state.save(path)
+
     def _test_upload_and_download_SERVER(self):
         # Mock server arguments
         self.server_args = Namespace(
@@ -104,7 +340,15 @@ class TestServerClientIntegration(unittest.TestCase):
             host=self.host,
             port=self.port,
             storage=self.server_storage,
-            protocol=self.protocol
+            protocol=self.protocol,
+            congestion="reno",
+            rate=None,
+            ack_every=None,
+            ack_delay=None,
+            single_port=self.single_port,
+            workers=1,
+            cpu_affinity=False,
+            chunk_store=self.dedup
         )
         
         self.server_stop_event = Namespace(
@@ -126,14 +370,29 @@ class TestServerClientIntegration(unittest.TestCase):
             port=self.port,
             src=self.client_input_file,
             name=self.server_file_name,
-            protocol=self.protocol
+            protocol=self.protocol,
+            congestion="reno",
+            rate=None,
+            ack_every=None,
+            ack_delay=None,
+            chunk_size=None,
+            compress=self.compress,
+            pmtu=False,
+            resume=self.resume,
+            delta=False,
+            dedup=False
         )
+        vars(upload_args).update(self.upload_options)
+
+        server_file_path = os.path.join(self.server_storage, self.server_file_name)
+        if self.resume:
+            self._make_partial(server_file_path)
+            self._make_partial(self.client_output_file)
         
         # Perform upload
         upload.behaviour(upload_args)
         
         # Verify uploaded file on server
-        server_file_path = os.path.join(self.server_storage, self.server_file_name)
         self.assertTrue(os.path.isfile(server_file_path), f"Uploaded file not found on server '{server_file_path}'")
         
         self.assertEqual(
@@ -141,6 +400,38 @@ class TestServerClientIntegration(unittest.TestCase):
             self._compute_file_hash(server_file_path),
             "Uploaded file hash mismatch"
         )
+
+        if self.delta:
+            with open(self.client_input_file, 'r+b') as f:
+                f.seek(100_000)
+                f.write(b"una linea nueva en el medio del archivo")
+            upload_args.delta = True
+            upload.behaviour(upload_args)
+            self.assertEqual(
+                self._compute_file_hash(self.client_input_file),
+                self._compute_file_hash(server_file_path),
+                "Delta upload hash mismatch"
+            )
+            self.assertEqual(sorted(os.listdir(self.server_storage)), [self.server_file_name])
+
+        if self.dedup:
+            copy_args = Namespace(**vars(upload_args))
+            copy_args.src = os.path.join(self.client_dir, "copia.txt")
+            copy_args.name = "copia_" + self.server_file_name
+            copy_args.dedup = True
+            with open(self.client_input_file, 'rb') as f:
+                data = bytearray(f.read())
+            data[200_000:200_032] = b"cambia un solo chunk de la copia"
+            with open(copy_args.src, 'wb') as f:
+                f.write(data)
+            upload.behaviour(copy_args)
+            self.assertEqual(
+                self._compute_file_hash(copy_args.src),
+                self._compute_file_hash(os.path.join(self.server_storage, copy_args.name)),
+                "Dedup upload hash mismatch"
+            )
+            self.assertEqual(sorted(os.listdir(self.server_storage)),
+                             [".chunks", copy_args.name, self.server_file_name])
         
         # Mock download arguments
         download_file_path = os.path.join(self.client_dir, "downloaded_" + self.server_file_name)
@@ -151,13 +442,25 @@ class TestServerClientIntegration(unittest.TestCase):
             port=self.port,
             dst=self.client_output_file,
             name=self.server_file_name,
-            protocol=self.protocol
+            protocol=self.protocol,
+            congestion=None,
+            rate=None,
+            ack_every=None,
+            ack_delay=None,
+            chunk_size=None,
+            compress=self.compress,
+            pmtu=False,
+            resume=self.resume
         )
+        vars(download_args).update(self.download_options)
         
         # Perform download
 
         Logger.debug(who="TEST", message="BEGIN WITH DOWNLOAD")
-        download.behaviour(download_args)
+        if self.parallel > 1:
+            download.download_parallel(download_args, self.parallel)
+        else:
+            download.behaviour(download_args)
         Logger.debug(who="TEST", message="-------------END WITH DOWNLOAD----------------")
 
 
@@ -168,6 +471,8 @@ class TestServerClientIntegration(unittest.TestCase):
             self._compute_file_hash(self.client_output_file),
             "Downloaded file hash mismatch"
         )
+        self.assertFalse(os.path.exists(self.client_output_file + ResumeState.SUFFIX))
+        self.assertFalse(os.path.exists(server_file_path + ResumeState.SUFFIX))
 
         Logger.debug(who="TEST", message="TELL SERVER TO STOP")
         self.server_stop_event.running = False
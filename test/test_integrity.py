@@ -0,0 +1,90 @@
+import os
+import unittest
+
+from protocol.codec import CodecPacketizer
+from protocol.exchange import PENDING
+from protocol.integrity import IntegrityError, StreamDigest, TermExchange
+from protocol.packet import DefaultPacketizer
+from protocol.selective_repeat import SelectiveRepeatProtocol, SelectiveRepeatReceiver
+from test.utils_test import TransferTestCase
+
+
+class TestTerminatePackets(unittest.TestCase):
+    def test_streaming_equals_one_shot(self):
+        data = os.urandom(10_000)
+        for algorithm in ("crc32", "blake2b"):
+            streamed, whole = StreamDigest(algorithm), StreamDigest(algorithm)
+            for i in range(0, len(data), 1024):
+                streamed.update(data[i:i + 1024])
+            whole.update(data)
+            self.assertEqual(streamed.digest(), whole.digest())
+
+    def test_digest_and_verdict_roundtrip(self):
+        for packetizer in (DefaultPacketizer(), CodecPacketizer(cid=7)):
+            term = packetizer.make_terminate_packet(b"\x01" * 64)
+            self.assertTrue(packetizer.is_terminate(term))
+            self.assertEqual(packetizer.extract_digest(term), b"\x01" * 64)
+            self.assertEqual(packetizer.extract_digest(packetizer.make_terminate_packet()), b"")
+            for ok in (True, False):
+                reply = packetizer.make_terminate_ack_packet(ok)
+                self.assertTrue(packetizer.is_terminate_ack(reply))
+                self.assertFalse(packetizer.is_terminate(reply))
+                self.assertEqual(packetizer.extract_verdict(reply), ok)
+
+    def test_missing_digest_is_not_a_mismatch(self):
+        for algorithm in ("crc32", "blake2b"):
+            digest = StreamDigest(algorithm)
+            digest.update(b"hola")
+            self.assertTrue(digest.matches(b""))
+            self.assertFalse(digest.matches(bytes(len(digest.digest()))))
+        self.assertTrue(StreamDigest("").matches(digest.digest()))
+
+
+class TestTermExchange(unittest.TestCase):
+    def test_verdicts(self):
+        for packetizer in (DefaultPacketizer(), CodecPacketizer(cid=7)):
+            exchange = TermExchange(packetizer, ("127.0.0.1", 9), None, StreamDigest("crc32"))
+            self.assertTrue(packetizer.is_terminate(exchange.request))
+            self.assertTrue(exchange.on_reply(packetizer.make_terminate_ack_packet(True)))
+            with self.assertRaises(IntegrityError):
+                exchange.on_reply(packetizer.make_terminate_ack_packet(False))
+            # Un ACK rezagado no contesta el TERM; un FIN sí, aunque sin veredicto
+            self.assertIs(exchange.on_reply(packetizer.make_ack_packet(3)), PENDING)
+            self.assertIsNone(exchange.on_reply(packetizer.make_fin_packet()))
+
+
+class TestEndToEndDigest(TransferTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write_source(os.urandom(300_000))
+
+    def _transfer(self, corrupt=False):
+        def prepare(sender, receiver):
+            if corrupt:
+                # Un byte que el receptor nunca vio: los digests no pueden coincidir
+                sender.digest.update(b"x")
+
+        # Si se pierde el TERM_ACK el emisor no conoce el veredicto: con corrupt el receptor no pierde nada
+        _, receiver, _ = self.transfer(
+            SelectiveRepeatProtocol, SelectiveRepeatReceiver,
+            receiver_kwargs={"file_size": len(self.data)},
+            sender_loss=0.05, receiver_loss=0.0 if corrupt else 0.05, prepare=prepare
+        )
+        return receiver
+
+    def test_lossy_transfer_verifies(self):
+        # Con pérdidas el receptor hashea chunks que llegaron fuera de orden releyéndolos del archivo
+        receiver = self._transfer()
+        self.assertTrue(receiver.verified)
+        self.assertEqual(self.errors, [])
+        self.assertReceived()
+
+    def test_mismatch_fails_both_sides(self):
+        with self.assertRaises(IntegrityError):
+            self._transfer(corrupt=True)
+        self.assertEqual(len(self.errors), 1)
+        self.assertFalse(os.path.exists(self.dst))
+
+
+if __name__ == '__main__':
+    unittest.main()
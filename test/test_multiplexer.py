@@ -0,0 +1,78 @@
+import socket
+import unittest
+from unittest.mock import patch
+
+from protocol.codec import CodecPacketizer
+from protocol.multiplexer import ConnectionMultiplexer, frame
+from utils import ConnectionConfig
+
+
+class TestConnectionMultiplexer(unittest.TestCase):
+    def setUp(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.settimeout(0.05)
+        self.client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.client.bind(("127.0.0.1", 0))
+        self.other = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.other.bind(("127.0.0.1", 0))
+        self.mux = ConnectionMultiplexer(self.server)
+
+    def tearDown(self):
+        self.mux.stop()
+        for sock in (self.server, self.client, self.other):
+            sock.close()
+
+    def test_datagram_from_another_host_is_dropped(self):
+        conn = self.mux.open(self.client.getsockname())
+        conn.settimeout(0.5)
+        # Un tercero que conoce el connection ID no llega a la cola de la conexión
+        self.other.sendto(frame(conn.cid, b"spoofed"), self.server.getsockname())
+        self.client.sendto(frame(conn.cid, b"data"), self.server.getsockname())
+        self.assertEqual(conn.recvfrom(1024), (b"data", self.client.getsockname()))
+        conn.settimeout(0.1)
+        with self.assertRaises(socket.timeout):
+            conn.recvfrom(1024)
+
+    def test_codec_packets_use_their_own_connection_id(self):
+        conn = self.mux.open(self.client.getsockname())
+        conn.settimeout(0.5)
+        packet = CodecPacketizer(conn.cid).make_data_packet(1, b"data")
+        # Sin cabecera de multiplexado: el despachador usa el connection ID del codec
+        self.client.sendto(packet, self.server.getsockname())
+        self.assertEqual(conn.recvfrom(1024), (packet, self.client.getsockname()))
+        self.client.settimeout(0.5)
+        conn.sendto(packet, self.client.getsockname())
+        self.assertEqual(self.client.recvfrom(1024)[0], packet)
+        conn.sendto(b"FIN", self.client.getsockname())
+        self.assertEqual(self.client.recvfrom(1024)[0], frame(conn.cid, b"FIN"))
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        with patch.object(ConnectionConfig, "MUX_QUEUE_SIZE", 4):
+            conn = self.mux.open(self.client.getsockname())
+        for seq in range(10):
+            self.mux._dispatch(frame(conn.cid, bytes([seq])), conn.peer)
+        conn.settimeout(0)
+        received = []
+        while True:
+            try:
+                received.append(conn.recvfrom(1024)[0])
+            except socket.timeout:
+                break
+        self.assertEqual(received, [bytes([seq]) for seq in range(4)])
+
+    def test_full_queue_without_mux_header_keeps_dispatching(self):
+        with patch.object(ConnectionConfig, "MUX_QUEUE_SIZE", 1):
+            conn = self.mux.open(self.client.getsockname())
+        # Un LOGIN repetido no trae connection ID: va por el par, y la cola ya está llena
+        for _ in range(3):
+            self.client.sendto(b"LOGIN", self.server.getsockname())
+        self.other.sendto(b"LOGIN", self.server.getsockname())
+        self.assertEqual(self.mux.accept(1), (b"LOGIN", self.other.getsockname()))
+        self.assertTrue(self.mux.thread.is_alive())
+        conn.settimeout(0)
+        self.assertEqual(conn.recvfrom(1024), (b"LOGIN", self.client.getsockname()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import socket
+import tempfile
+import unittest
+from unittest.mock import patch
+from protocol.packet import DefaultPacketizer
+from protocol.selective_repeat import SelectiveRepeatProtocol
+
+
+class TestDefaultPacketizer(unittest.TestCase):
+    def setUp(self):
+        self.packetizer = DefaultPacketizer()
+
+    def test_data_roundtrip(self):
+        packet = self.packetizer.make_data_packet(7, b"hola", timestamp=42, flags=DefaultPacketizer.FLAG_ACK_NOW)
+        self.assertTrue(self.packetizer.is_data(packet))
+        self.assertEqual(self.packetizer.extract_seq(packet), 7)
+        self.assertEqual(self.packetizer.extract_timestamp(packet), 42)
+        self.assertEqual(self.packetizer.extract_flags(packet), DefaultPacketizer.FLAG_ACK_NOW)
+        self.assertEqual(self.packetizer.extract_data(packet), b"hola")
+
+    def test_header_matches_packet(self):
+        buffer = bytearray(2 * DefaultPacketizer.HEADER_SIZE)
+        self.packetizer.pack_data_header(buffer, DefaultPacketizer.HEADER_SIZE, 7, timestamp=42, flags=1)
+        packet = self.packetizer.make_data_packet(7, b"hola", timestamp=42, flags=1)
+        self.assertEqual(bytes(buffer[DefaultPacketizer.HEADER_SIZE:]) + b"hola", packet)
+
+    def test_sack_roundtrip(self):
+        packet = self.packetizer.make_sack_packet(10, [(12, 14), (20, 21)], timestamp=5, window=64)
+        self.assertTrue(self.packetizer.is_sack(packet))
+        self.assertEqual(self.packetizer.extract_sack(packet), (10, [(12, 14), (20, 21)]))
+        self.assertEqual(self.packetizer.extract_timestamp(packet), 5)
+        self.assertEqual(self.packetizer.extract_window(packet), 64)
+
+    def test_truncated_sack_keeps_whole_blocks(self):
+        packet = self.packetizer.make_sack_packet(10, [(12, 14), (20, 21), (30, 40)], window=64)
+        # Un bloque incompleto no se lee como (0, 0)
+        self.assertEqual(self.packetizer.extract_sack(packet[:-8]), (10, [(12, 14), (20, 21)]))
+        self.assertEqual(self.packetizer.extract_sack(packet[:-12]), (10, [(12, 14)]))
+
+    def test_sack_block_limit(self):
+        blocks = [(i * 2, i * 2 + 1) for i in range(100)]
+        packet = self.packetizer.make_sack_packet(0, blocks)
+        _, decoded = self.packetizer.extract_sack(packet)
+        self.assertEqual(len(decoded), DefaultPacketizer.MAX_SACK_BLOCKS)
+
+
+class TestFastRetransmit(unittest.TestCase):
+    def setUp(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        fd, self.path = tempfile.mkstemp()
+        os.write(fd, bytes(100 * 16))
+        os.close(fd)
+        self.sender = SelectiveRepeatProtocol(self.sock, ("127.0.0.1", 9), self.path, chunk_size=16, pacing=False)
+        self.sender.next_seq = 20
+        self.packetizer = DefaultPacketizer()
+
+    def tearDown(self):
+        self.sender.file.close()
+        self.sock.close()
+        os.remove(self.path)
+
+    def _sack(self, cum_ack, blocks):
+        with patch.object(self.sender, "_send") as send:
+            self.sender._on_ack(self.packetizer.make_sack_packet(cum_ack, blocks, window=100))
+        return [call.args[0] for call in send.call_args_list]
+
+    def test_gap_below_three_sacked_is_retransmitted_once(self):
+        self.assertEqual(self._sack(2, [(5, 7)]), [])
+        # Tres confirmados por encima de 2..4: se retransmiten sin esperar el timeout
+        self.assertEqual(self._sack(2, [(5, 8)]), [2, 3, 4])
+        self.assertEqual(self._sack(2, [(5, 8), (10, 12)]), [])
+        self.assertEqual(self._sack(2, [(5, 8), (10, 13)]), [8, 9])
+        self.assertEqual(self._sack(9, [(10, 14)]), [])
@@ -0,0 +1,73 @@
+import os
+import unittest
+
+from protocol.go_back_n import GoBackNProtocol, GoBackNReceiver
+from protocol.integrity import IntegrityError, check_received
+from protocol.ranges import RangeError, agreed_range, split_range
+from protocol.selective_repeat import SelectiveRepeatProtocol, SelectiveRepeatReceiver
+from protocol.stop_and_wait import StopAndWaitProtocol, StopAndWaitReceiver
+from test.utils_test import TransferTestCase
+
+
+class TestRanges(unittest.TestCase):
+    def test_split_covers_file_on_chunk_boundaries(self):
+        size, chunk = 100 * 1000 + 123, 1000
+        parts = [split_range(size, chunk, part, 7) for part in range(7)]
+        self.assertEqual(parts[0][0], 0)
+        self.assertEqual(parts[-1][1], size)
+        for (_, end), (start, _) in zip(parts, parts[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(start % chunk, 0)
+        # Más partes que chunks: las que sobran quedan vacías
+        self.assertEqual([split_range(2500, 1000, part, 5) for part in range(5)],
+                         [(0, 0), (0, 1000), (1000, 1000), (1000, 2000), (2000, 2500)])
+
+    def test_agreed_range(self):
+        self.assertEqual(agreed_range("1/2", 10_000, 1000), (5000, 10_000))
+        self.assertEqual(agreed_range("300-20000", 10_000, 1000), (300, 10_000))
+        for value in ("2/2", "x/2", "5-3", "20000-30000", "300"):
+            with self.assertRaises(RangeError):
+                agreed_range(value, 10_000, 1000)
+
+
+class TestRangedTransfer(TransferTestCase):
+    CHUNK = 1000
+
+    def setUp(self):
+        super().setUp()
+        self.write_source(os.urandom(60 * self.CHUNK + 77))
+
+    def _transfer(self, sender_class, receiver_class, start, end, **receiver_kwargs):
+        _, _, errors = self.transfer(
+            sender_class, receiver_class,
+            sender_kwargs={"chunk_size": self.CHUNK, "offset": start, "length": end - start},
+            receiver_kwargs={"chunk_size": self.CHUNK, "offset": start, **receiver_kwargs}
+        )
+        return errors
+
+    def test_ranges_land_at_their_offset(self):
+        # Las partes, en cualquier orden, arman el archivo sin pisarse entre sí
+        for sender_class, receiver_class in ((SelectiveRepeatProtocol, SelectiveRepeatReceiver),
+                                             (GoBackNProtocol, GoBackNReceiver),
+                                             (StopAndWaitProtocol, StopAndWaitReceiver)):
+            with self.subTest(sender_class.__name__):
+                open(self.dst, 'wb').close()
+                for part in (2, 0, 1):
+                    start, end = split_range(len(self.data), self.CHUNK, part, 3)
+                    kwargs = {"file_size": end - start} if receiver_class is SelectiveRepeatReceiver else {}
+                    self.assertEqual(self._transfer(sender_class, receiver_class, start, end, **kwargs), [])
+                with open(self.dst, 'rb') as f:
+                    self.assertEqual(f.read(), self.data)
+
+    def test_bad_range_keeps_shared_file(self):
+        # Otras partes siguen escribiendo en el mismo archivo: el receptor del rango no lo borra
+        with self.assertRaises(IntegrityError):
+            check_received(self.src, False, offset=20 * self.CHUNK)
+        self.assertTrue(os.path.exists(self.src))
+        with self.assertRaises(IntegrityError):
+            check_received(self.src, False)
+        self.assertFalse(os.path.exists(self.src))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import socket
+import tempfile
+import unittest
+
+from protocol.go_back_n import GoBackNProtocol, GoBackNReceiver
+from protocol.resume import ResumeState
+from protocol.selective_repeat import SelectiveRepeatProtocol, SelectiveRepeatReceiver
+from protocol.stop_and_wait import StopAndWaitProtocol, StopAndWaitReceiver
+from utils.bitmap import Bitmap
+from test.utils_test import TransferTestCase
+
+
+class TestResumeState(unittest.TestCase):
+    def test_token_roundtrip(self):
+        state = ResumeState(10_000, 1000, prefix=3, bits=b'\x05\x00')
+        again = ResumeState.from_token(state.token())
+        self.assertEqual((again.size, again.chunk_size, again.prefix), (10_000, 1000, 3))
+        self.assertEqual(again.bits, b'\x05')
+        self.assertEqual(sorted(seq for seq in range(10) if seq in again.completed(1000)), [0, 1, 2, 3, 5])
+        with self.assertRaises(ValueError):
+            ResumeState.from_token("10:0:0:")
+
+    def test_record_keeps_window(self):
+        received = Bitmap()
+        for seq in (0, 1, 2, 5, 6, 9):
+            received.add(seq)
+        state = ResumeState(10_000, 500)
+        state.record(1000, 3, received, 9)
+        self.assertEqual((state.chunk_size, state.prefix), (1000, 3))
+        self.assertEqual(sorted(seq for seq in range(10) if seq in state.completed(1000)), [0, 1, 2, 5, 6, 9])
+
+    def test_completed_with_other_chunk_size(self):
+        # Chunks viejos de 1000: [0, 4000) y [5000, 6000). Los nuevos de 1500 que entran enteros
+        state = ResumeState(7_200, 1000, prefix=4, bits=b'\x02')
+        self.assertEqual(sorted(seq for seq in range(5) if seq in state.completed(1500)), [0, 1])
+        # El último chunk es corto: cuenta si sus bytes están
+        state = ResumeState(2_500, 1000, prefix=3)
+        self.assertEqual(state.first_missing(1000), 3)
+        self.assertEqual(state.first_missing(2000), 2)
+
+    def test_save_load_discard(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "file.bin")
+            self.assertIsNone(ResumeState.load(path))
+            ResumeState(100, 10, prefix=4).save(path)
+            self.assertEqual(ResumeState.load(path).prefix, 4)
+            ResumeState.discard(path)
+            self.assertIsNone(ResumeState.load(path))
+
+
+class CountingSocket(socket.socket):
+    """Cuenta los seqs de DATA que salen: los que el receptor ya tenía no deberían aparecer."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sent = 0
+
+    def sendto(self, data, *args):
+        self.sent += 1
+        return super().sendto(data, *args)
+
+    def sendmsg(self, buffers, *args):
+        self.sent += 1
+        return super().sendmsg(buffers, *args)
+
+
+class TestResumedTransfer(TransferTestCase):
+    CHUNK = 1000
+
+    def setUp(self):
+        super().setUp()
+        self.write_source(os.urandom(100 * self.CHUNK + 123))
+
+    def _partial(self, state):
+        # Lo que falta queda en cero: si el emisor no lo manda el archivo no coincide
+        partial = bytearray(len(self.data))
+        for start, end in state.completed(self.CHUNK).runs(0, 101):
+            partial[start * self.CHUNK:end * self.CHUNK] = self.data[start * self.CHUNK:end * self.CHUNK]
+        with open(self.dst, 'wb') as f:
+            f.write(partial)
+        state.save(self.dst)
+
+    def _transfer(self, sender_class, receiver_class, state, sender_kwargs=None, **receiver_kwargs):
+        self._partial(state)
+        sender_sock = CountingSocket(socket.AF_INET, socket.SOCK_DGRAM)
+        _, receiver, _ = self.transfer(
+            sender_class, receiver_class,
+            sender_kwargs={"chunk_size": self.CHUNK, "resume": ResumeState.from_token(state.token()),
+                           **(sender_kwargs or {})},
+            receiver_kwargs={"chunk_size": self.CHUNK, "resume": ResumeState.load(self.dst), **receiver_kwargs},
+            sender_sock=sender_sock
+        )
+        self.assertTrue(receiver.verified)
+        self.assertReceived()
+        self.assertIsNone(ResumeState.load(self.dst))
+        return sender_sock.sent
+
+    def test_sr_sends_only_missing_chunks(self):
+        # Prefijo de 40 y 4 chunks sueltos (41..44) de la ventana: faltan 101 - 44
+        state = ResumeState(len(self.data), self.CHUNK, prefix=40, bits=b'\x1e')
+        sent = self._transfer(SelectiveRepeatProtocol, SelectiveRepeatReceiver, state,
+                              sender_kwargs={"offload": False}, file_size=len(self.data))
+        # Más el TERM; sin pérdidas no debería haber retransmisiones
+        self.assertEqual(sent, 101 - 44 + 1)
+
+    def test_sr_everything_already_there(self):
+        state = ResumeState(len(self.data), self.CHUNK, prefix=101)
+        self.assertEqual(self._transfer(SelectiveRepeatProtocol, SelectiveRepeatReceiver, state,
+                                        file_size=len(self.data)), 1)
+
+    def test_in_order_engines_resume_from_prefix(self):
+        # Sin GSO cada DATA es un sendmsg y se pueden contar
+        for sender_class, receiver_class, sender_kwargs in ((GoBackNProtocol, GoBackNReceiver, {"offload": False}),
+                                                            (StopAndWaitProtocol, StopAndWaitReceiver, {})):
+            with self.subTest(sender_class.__name__):
+                state = ResumeState(len(self.data), self.CHUNK, prefix=70, bits=b'\xff')
+                sent = self._transfer(sender_class, receiver_class, state, sender_kwargs)
+                self.assertEqual(sent, 101 - 78 + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
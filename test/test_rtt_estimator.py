@@ -0,0 +1,47 @@
+import unittest
+from protocol.rtt_estimator import RttEstimator
+
+
+class TestRttEstimator(unittest.TestCase):
+    def setUp(self):
+        self.rtt = RttEstimator(initial_rto=1.0, min_rto=0.01, max_rto=8.0)
+
+    def test_initial_rto(self):
+        self.assertEqual(self.rtt.rto, 1.0)
+        self.assertIsNone(self.rtt.srtt)
+
+    def test_first_sample(self):
+        self.rtt.on_sample(0.1)
+        self.assertAlmostEqual(self.rtt.srtt, 0.1)
+        self.assertAlmostEqual(self.rtt.rttvar, 0.05)
+        self.assertAlmostEqual(self.rtt.rto, 0.1 + 4 * 0.05)
+
+    def test_smoothing(self):
+        self.rtt.on_sample(0.1)
+        self.rtt.on_sample(0.2)
+        self.assertAlmostEqual(self.rtt.rttvar, 0.75 * 0.05 + 0.25 * 0.1)
+        self.assertAlmostEqual(self.rtt.srtt, 0.875 * 0.1 + 0.125 * 0.2)
+        self.assertEqual(list(self.rtt.samples), [0.1, 0.2])
+
+    def test_backoff_until_new_sample(self):
+        self.rtt.on_sample(0.1)
+        rto = self.rtt.rto
+        self.rtt.on_timeout()
+        self.rtt.on_timeout()
+        self.assertAlmostEqual(self.rtt.rto, 4 * rto)
+        self.rtt.on_sample(0.1)
+        self.assertLess(self.rtt.rto, 2 * rto)
+
+    def test_rto_bounds(self):
+        self.rtt.on_sample(0.0001)
+        self.assertEqual(self.rtt.rto, 0.01)
+        for _ in range(20):
+            self.rtt.on_timeout()
+        self.assertEqual(self.rtt.rto, 8.0)
+
+    def test_timestamp_echo(self):
+        self.rtt.on_timestamp_echo(0)
+        self.assertEqual(len(self.rtt.samples), 0)
+        self.rtt.on_timestamp_echo(RttEstimator.timestamp())
+        self.assertEqual(len(self.rtt.samples), 1)
+        self.assertLess(self.rtt.samples[0], 0.5)
@@ -0,0 +1,102 @@
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+
+from protocol.codec import CodecPacketizer
+from protocol.connection_socket import ConnectionSocket
+from protocol.multiplexer import unframe
+from protocol.selective_repeat import SelectiveRepeatProtocol, SelectiveRepeatReceiver
+from protocol.streams import REJECTED, StreamMultiplexer, read_listing, write_listing
+import upload
+
+
+class BlackoutSocket(socket.socket):
+    """Descarta todo lo que sale por un stream hasta que pasa `until`."""
+    def __init__(self, *args, stream_id=None, until=0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stream_id = stream_id
+        self.until = until
+
+    def sendto(self, data, *args):
+        if unframe(data)[0] == self.stream_id and time.monotonic() < self.until:
+            return len(data)
+        return super().sendto(data, *args)
+
+
+class TestStreams(unittest.TestCase):
+    FILES = 4
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.sources = []
+        for i in range(self.FILES):
+            path = os.path.join(self.dir.name, f"src{i}.bin")
+            with open(path, 'wb') as f:
+                f.write(os.urandom(20_000 + 1000 * i))
+            self.sources.append(path)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _connection(self, sock, peer):
+        conn = ConnectionSocket(peer, sock=sock)
+        conn.options = {"wire": 1}
+        return conn
+
+    def test_listing_roundtrip(self):
+        path = os.path.join(self.dir.name, "listing")
+        entries = [("con espacios y\ttab.txt", 10), ("ñandú", REJECTED)]
+        write_listing(path, entries)
+        self.assertEqual(read_listing(path), entries)
+
+    def test_loss_on_one_stream_does_not_block_the_others(self):
+        blackout = time.monotonic() + 1.5
+        sender_sock = BlackoutSocket(socket.AF_INET, socket.SOCK_DGRAM, stream_id=1, until=blackout)
+        receiver_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sender_sock.bind(('127.0.0.1', 0))
+        receiver_sock.bind(('127.0.0.1', 0))
+        sender = StreamMultiplexer(self._connection(sender_sock, receiver_sock.getsockname()), CodecPacketizer())
+        receiver = StreamMultiplexer(self._connection(receiver_sock, sender_sock.getsockname()), CodecPacketizer())
+        done = {}
+
+        def receive(stream_id, path):
+            def transfer(view):
+                SelectiveRepeatReceiver(view.socket, path, packetizer=CodecPacketizer(), timeout=0.2).start()
+                done[stream_id] = time.monotonic()
+            return transfer
+
+        outputs = [os.path.join(self.dir.name, f"out{i}.bin") for i in range(self.FILES)]
+        thread = threading.Thread(target=lambda: receiver.run(
+            [(i + 1, receive(i + 1, outputs[i])) for i in range(self.FILES)], self.FILES), daemon=True)
+        thread.start()
+        try:
+            failed = sender.run([(i + 1, lambda view, src=src: SelectiveRepeatProtocol(
+                view.socket, view.destination_address, src, packetizer=CodecPacketizer(),
+                timeout=0.2, rtt=view.rtt, offload=False).start()) for i, src in enumerate(self.sources)], self.FILES)
+            thread.join(10)
+        finally:
+            sender.stop()
+            receiver.stop()
+            sender_sock.close()
+            receiver_sock.close()
+        self.assertEqual(failed, 0)
+        for src, out in zip(self.sources, outputs):
+            with open(src, 'rb') as a, open(out, 'rb') as b:
+                self.assertEqual(a.read(), b.read())
+        # Los streams sin pérdidas terminaron mientras el primero seguía cortado
+        self.assertGreaterEqual(done[1], blackout)
+        self.assertTrue(all(done[i] < blackout for i in range(2, self.FILES + 1)))
+
+
+    def test_upload_without_files_exits(self):
+        with tempfile.TemporaryDirectory() as empty:
+            for sources in ([], [empty]):
+                with self.assertRaises(SystemExit):
+                    upload.upload_files(sources, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
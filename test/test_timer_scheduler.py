@@ -0,0 +1,38 @@
+import unittest
+import threading
+import time
+from utils.timer_scheduler import TimerScheduler
+
+
+class TestTimerScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = TimerScheduler()
+
+    def test_fires_in_deadline_order(self):
+        fired = []
+        done = threading.Event()
+        self.scheduler.schedule(0.06, lambda: (fired.append(3), done.set()))
+        self.scheduler.schedule(0.02, fired.append, 1)
+        self.scheduler.schedule(0.04, fired.append, 2)
+
+        self.assertTrue(done.wait(1), "Timers did not fire in time")
+        self.assertEqual(fired, [1, 2, 3])
+
+    def test_cancelled_timer_does_not_fire(self):
+        fired = []
+        timer = self.scheduler.schedule(0.02, fired.append, "cancelled")
+        timer.cancel()
+        self.scheduler.schedule(0.04, fired.append, "kept")
+
+        time.sleep(0.1)
+        self.assertEqual(fired, ["kept"])
+        self.assertEqual(self.scheduler.pending(), 0)
+
+    def test_thread_count_is_flat(self):
+        self.scheduler.schedule(10, lambda: None)
+        before = threading.active_count()
+        timers = [self.scheduler.schedule(10, lambda: None) for _ in range(1000)]
+
+        self.assertEqual(threading.active_count(), before)
+        for timer in timers:
+            timer.cancel()
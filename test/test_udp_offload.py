@@ -0,0 +1,89 @@
+import socket
+import unittest
+from protocol.udp_offload import BatchSender, BatchReceiver, tune_socket_buffers
+from test.utils_test import LossySocket
+from utils import ConnectionConfig
+
+
+class TestUdpOffload(unittest.TestCase):
+    def setUp(self):
+        self.a = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.a.bind(('127.0.0.1', 0))
+        self.b = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.b.bind(('127.0.0.1', 0))
+        self.b.settimeout(1.0)
+        self.packets = [bytes([i]) * 100 for i in range(5)] + [b'fin']
+
+    def tearDown(self):
+        self.a.close()
+        self.b.close()
+
+    def _receive_all(self, receiver):
+        received = []
+        while len(received) < len(self.packets):
+            packets, _ = receiver.recv()
+            # Son vistas sobre el pool: se copian antes de que la rueda las pise
+            received += [bytes(packet) for packet in packets]
+        return received
+
+    def test_batch_roundtrip(self):
+        sender = BatchSender(self.a)
+        receiver = BatchReceiver(self.b, 100)
+        sender.send_vectored([[packet] for packet in self.packets], self.b.getsockname())
+        self.assertEqual(self._receive_all(receiver), self.packets)
+
+    def test_fallback_without_offload(self):
+        sender = BatchSender(self.a, enabled=False)
+        receiver = BatchReceiver(self.b, 100, enabled=False)
+        self.assertEqual(sender.batch_limit(100), 1)
+        sender.send_vectored([[packet] for packet in self.packets], self.b.getsockname())
+        self.assertEqual(self._receive_all(receiver), self.packets)
+
+    def test_vectored_roundtrip(self):
+        # Cabecera y payload separados, como los manda el emisor SR
+        payloads = [memoryview(packet) for packet in self.packets]
+        vectored = [[b'H', payload[:1], payload[1:]] for payload in payloads]
+        expected = [b'H' + packet for packet in self.packets]
+        for enabled in (True, False):
+            sender = BatchSender(self.a, enabled=enabled)
+            receiver = BatchReceiver(self.b, 101, enabled=enabled)
+            sender.send_vectored(vectored, self.b.getsockname())
+            received = []
+            while len(received) < len(expected):
+                received += [bytes(packet) for packet in receiver.recv()[0]]
+            self.assertEqual(received, expected)
+
+    def test_vectored_mixed_sizes(self):
+        # Payloads comprimidos: cada tramo de GSO tiene que ser de largo parejo
+        packets = [bytes([i]) * size for i, size in enumerate([100, 100, 40, 100, 60, 60, 100, 30])]
+        sizes = [len(packet) for packet in packets]
+        self.assertEqual(BatchSender._same_size_run(sizes, 0), 3)
+        self.assertEqual(BatchSender._same_size_run(sizes, 3), 5)
+        sender = BatchSender(self.a)
+        receiver = BatchReceiver(self.b, 100)
+        sender.send_vectored([[b'H', packet] for packet in packets], self.b.getsockname())
+        received = []
+        while len(received) < len(packets):
+            received += [bytes(packet) for packet in receiver.recv()[0]]
+        self.assertEqual(received, [b'H' + packet for packet in packets])
+
+    def test_pool_reuses_buffers(self):
+        receiver = BatchReceiver(self.b, 100, enabled=False, pool_size=2)
+        for packet in self.packets[:3]:
+            self.a.sendto(packet, self.b.getsockname())
+        first, _ = receiver.recv_packet()
+        self.assertEqual(first, self.packets[0])
+        receiver.recv_packet()
+        third, _ = receiver.recv_packet()
+        # La rueda volvió al primer buffer: la vista vieja ya muestra el paquete nuevo
+        self.assertEqual(third, self.packets[2])
+        self.assertTrue(first.obj is third.obj)
+
+    def test_wrapped_socket_uses_ordinary_path(self):
+        wrapped = LossySocket(sock=self.a, loss_rate=0.0)
+        self.assertFalse(BatchSender(wrapped).enabled)
+        self.assertIsNone(tune_socket_buffers(wrapped, 10**6))
+
+    def test_buffers_follow_bdp(self):
+        _, rcvbuf = tune_socket_buffers(self.b, 10**6)
+        self.assertGreaterEqual(rcvbuf, ConnectionConfig.MIN_SOCKET_BUFFER)
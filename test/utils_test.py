@@ -1,3 +1,5 @@
+import os
+import tempfile
 import unittest
 import threading
 import time
@@ -26,6 +28,7 @@ class UtilsFunction(unittest.TestCase):
 
 import random
 import socket as std_socket
+from protocol.integrity import IntegrityError
 from utils import Logger
 
 class SocketTestParams:
@@ -125,4 +128,71 @@ class ConsistentlyLossySocket:
         self.sock.settimeout(timeout)
     
     def getsockname(self):
-        return self.sock.getsockname()
\ No newline at end of file
+        return self.sock.getsockname()
+
+
+class TransferTestCase(unittest.TestCase):
+    """
+    Base para probar un motor punta a punta: src.bin y dst.bin en un directorio temporal,
+    y transfer() que corre un emisor contra un receptor por loopback.
+    """
+    TIMEOUT = 0.5
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.dir.name, "src.bin")
+        self.dst = os.path.join(self.dir.name, "dst.bin")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write_source(self, data: bytes):
+        self.data = data
+        with open(self.src, 'wb') as f:
+            f.write(data)
+
+    def transfer(self, sender_class, receiver_class, sender_kwargs=None, receiver_kwargs=None,
+                 sender_loss=None, receiver_loss=None, sender_sock=None, prepare=None):
+        """
+        Manda self.src a self.dst con sender_class -> receiver_class. Con sender_loss o
+        receiver_loss ese lado usa un LossySocket que pierde esa fracción; si no, un socket
+        común (con GSO/GRO). sender_sock reemplaza al socket del emisor y prepare(sender,
+        receiver) corre antes de arrancar. Devuelve (sender, receiver, errores): las
+        IntegrityError del receptor se juntan (también en self.errors, para cuando el emisor
+        falla), las del emisor se propagan.
+        """
+        def make_socket(loss):
+            if loss is None:
+                return std_socket.socket(std_socket.AF_INET, std_socket.SOCK_DGRAM)
+            return LossySocket(std_socket.AF_INET, std_socket.SOCK_DGRAM, loss_rate=loss)
+
+        sender_sock = sender_sock or make_socket(sender_loss)
+        receiver_sock = make_socket(receiver_loss)
+        sender_sock.bind(('127.0.0.1', 0))
+        receiver_sock.bind(('127.0.0.1', 0))
+        receiver = receiver_class(receiver_sock, self.dst, timeout=self.TIMEOUT, **(receiver_kwargs or {}))
+        sender = sender_class(sender_sock, receiver_sock.getsockname(), self.src, timeout=self.TIMEOUT,
+                              **(sender_kwargs or {}))
+        if prepare is not None:
+            prepare(sender, receiver)
+        errors = self.errors = []
+
+        def receive():
+            try:
+                receiver.start()
+            except IntegrityError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=receive, daemon=True)
+        thread.start()
+        try:
+            sender.start()
+        finally:
+            thread.join(10)
+            sender_sock.close()
+            receiver_sock.close()
+        return sender, receiver, errors
+
+    def assertReceived(self):
+        with open(self.src, 'rb') as a, open(self.dst, 'rb') as b:
+            self.assertEqual(a.read(), b.read())